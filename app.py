@@ -1,15 +1,112 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify
+from flask import Flask, Response, abort, g, make_response, render_template, request, redirect, url_for, session, flash, send_file, jsonify
 from flask_session import Session
 from config import Config
 from utils.auth import create_user, verify_user, login_required
-from utils.blob_manager import BlobManager
-import io
+from utils.batch_upload import BatchUpload
+from utils import metrics
+from utils.blob_manager import get_blob_manager
+from utils.indexer import get_index_queue
+from utils.search_backend import query_cache
+from utils.search_manager import get_search_manager
+from utils.session_store import SqliteSessionInterface
+from utils.text_cache import get_text_cache
+from utils.upload_stream import MultipartStream
+from werkzeug.datastructures import ContentRange
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import is_resource_modified
+from werkzeug.local import LocalProxy
+from functools import wraps
+from urllib.parse import quote
+import hashlib
+import os
+import time
 
 app = Flask(__name__)
 app.config.from_object(Config)
-Session(app)
+if Config.SESSION_BACKEND == "sqlite":
+    app.session_interface = SqliteSessionInterface(Config.SESSION_DB_PATH, Config.SESSION_SWEEP_INTERVAL)
+elif Config.SESSION_BACKEND == "filesystem":
+    Session(app)
+# "cookie" keeps Flask's default signed-cookie sessions
 
-blob_manager = BlobManager()
+# Shared per-process instances, created lazily so they are safe under forking servers
+blob_manager = LocalProxy(get_blob_manager)
+
+# Uploads only enqueue indexing; worker threads extract text and index
+index_queue = LocalProxy(get_index_queue)
+
+@app.before_request
+def start_background_workers():
+    # Make sure this worker process has its indexing threads running
+    get_index_queue()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics.start_trace()
+
+@app.after_request
+def record_request_metrics(response):
+    duration = time.perf_counter() - g.pop('request_started', time.perf_counter())
+    calls = metrics.end_trace()
+    # The URL rule, not the path, so each route is one series
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.HTTP_REQUEST_SECONDS.observe(duration, route=route, method=request.method, status=response.status_code)
+    if Config.SLOW_REQUEST_SECONDS and duration >= Config.SLOW_REQUEST_SECONDS:
+        print(f"Slow request: {request.method} {request.path} {response.status_code} {duration:.3f}s, "
+              f"{len(calls)} backend calls")
+        for backend, operation, seconds, failed in calls:
+            print(f"  {backend}.{operation} {seconds:.3f}s{' FAILED' if failed else ''}")
+    return response
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    flash(f'File exceeds the {Config.MAX_FILE_SIZE // (1024 * 1024)} MB limit', 'danger')
+    return redirect(url_for('upload'))
+
+# Part of every listing ETag, so deploying changed templates invalidates cached pages
+TEMPLATES_VERSION = max(
+    (entry.stat().st_mtime_ns for entry in os.scandir(app.jinja_loader.searchpath[0]) if entry.is_file()),
+    default=0
+)
+
+def conditional_listing(version_fn):
+    """Answer repeat views of a listing page with 304 Not Modified
+
+    version_fn gets the view's arguments and returns the version of the
+    data the page shows (or None to always render). The ETag also covers
+    the user, the query string and the templates; pages with flashed
+    messages waiting are always rendered so the messages get shown.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            version = version_fn(*args, **kwargs)
+            if version is None or '_flashes' in session:
+                return f(*args, **kwargs)
+            key = f"{TEMPLATES_VERSION}|{session.get('username')}|{request.full_path}|{version}"
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Per-user pages: browsers may keep them but must revalidate each time
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
+def folder_version(folder_name):
+    # A user's folder page also shows indexing status
+    username = session['username']
+    version = blob_manager.get_listing_version(username)
+    if version is None:
+        return None
+    return f"{version}-{index_queue.version(blob_manager._get_container_name(username))}"
 
 @app.route('/')
 def index():
@@ -20,36 +117,25 @@ def index():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    from utils.auth import load_users
+    from utils.auth import count_users
     
     # Get total users
-    users = load_users()
-    total_users = len(users)
-    
-    # Get total files and storage
-    all_files = blob_manager.list_all_files()
-    total_files = len(all_files)
-    total_storage = sum(file['size'] for file in all_files)
-    total_storage_mb = total_storage / (1024 * 1024)
+    total_users = count_users()
     
-    # Get user's stats
+    # Totals are maintained incrementally by BlobManager
     username = session['username']
-    user_files = blob_manager.list_user_files(username)
-    user_file_count = len(user_files)
-    user_storage = sum(file['size'] for file in user_files)
-    user_storage_mb = user_storage / (1024 * 1024)
+    stats = blob_manager.get_dashboard_stats(username)
     
-    # Get recent uploads (last 10)
-    recent_uploads = sorted(all_files, key=lambda x: x['created'], reverse=True)[:10]
+    total_files = stats['total_files']
+    total_storage_mb = stats['total_bytes'] / (1024 * 1024)
     
-    # Get most active folders
-    folder_counts = {}
-    for file in all_files:
-        if '/' in file['name']:
-            folder = file['name'].split('/')[0]
-            folder_counts[folder] = folder_counts.get(folder, 0) + 1
+    # Get user's stats
+    user_file_count = stats['user_files']
+    user_storage_mb = stats['user_bytes'] / (1024 * 1024)
     
-    top_folders = sorted(folder_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+    # Get recent uploads (last 10) and most active folders
+    recent_uploads = stats['recent_uploads']
+    top_folders = stats['top_folders']
     
     return render_template('dashboard.html',
                          total_users=total_users,
@@ -70,6 +156,10 @@ def register():
             flash('Username and password are required', 'danger')
             return redirect(url_for('register'))
         
+        if blob_manager._get_container_name(username) == Config.CONTENT_CONTAINER:
+            flash('That username is not available', 'danger')
+            return redirect(url_for('register'))
+        
         # Create user
         success, message = create_user(username, password)
         
@@ -117,60 +207,65 @@ def upload():
     username = session['username']
     
     if request.method == 'POST':
-        folder_name = request.form.get('folder_name')
-        
-        if not folder_name:
-            flash('Please select a folder', 'danger')
-            return redirect(url_for('upload'))
-        
-        if 'file' not in request.files:
+        boundary = request.mimetype_params.get('boundary')
+        if request.mimetype != 'multipart/form-data' or not boundary:
             flash('No file selected', 'danger')
             return redirect(url_for('upload'))
         
-        file = request.files['file']
-        
-        if file.filename == '':
-            flash('No file selected', 'danger')
-            return redirect(url_for('upload'))
-        
-        # Check if file is PDF
-        if not file.filename.lower().endswith('.pdf'):
-            flash('Only PDF files are allowed', 'danger')
-            return redirect(url_for('upload'))
-        
-        # Read file content for indexing
-        file_content = file.read()
-        file.seek(0)  # Reset file pointer for upload
-        
-        # Upload to blob storage
-        success, message = blob_manager.upload_file_to_folder(username, file, file.filename, folder_name)
-        
-        if success:
-            # Extract text and index for search
-            from utils.pdf_extractor import extract_text_from_pdf
-            from utils.search_manager import SearchManager
+        # Parse the body as it arrives; the form sends folder_name before the file
+        folder_name = None
+        for part in MultipartStream(request.stream, boundary).parts():
+            if part.filename is None:
+                if part.name == 'folder_name':
+                    folder_name = part.read()
+                continue
+            if part.name != 'file':
+                continue
+            
+            if not folder_name:
+                flash('Please select a folder', 'danger')
+                return redirect(url_for('upload'))
+            
+            if part.filename == '':
+                flash('No file selected', 'danger')
+                return redirect(url_for('upload'))
+            
+            # Check if file is PDF
+            if not part.filename.lower().endswith('.pdf'):
+                flash('Only PDF files are allowed', 'danger')
+                return redirect(url_for('upload'))
             
-            text_content = extract_text_from_pdf(file_content)
+            filename = part.filename
             
-            if text_content:
-                search_manager = SearchManager()
-                container_name = blob_manager._get_container_name(username)
-                filepath = f"{folder_name}/{file.filename}"
-                
-                search_manager.index_document(
-                    filename=file.filename,
-                    content=text_content,
+            # Upload to blob storage, copying the chunks to a spool file for the indexer
+            spool_path = index_queue.new_spool_path()
+            with open(spool_path, 'wb') as spool:
+                success, message = blob_manager.upload_file_to_folder(
+                    username, part.chunks(), filename, folder_name, spool=spool
+                )
+            
+            if success:
+                # Extraction and indexing happen in the background
+                index_queue.enqueue(
+                    container=blob_manager._get_container_name(username),
+                    filepath=f"{folder_name}/{filename}",
+                    filename=filename,
                     owner=username,
                     folder=folder_name,
-                    container=container_name,
-                    filepath=filepath
+                    spool_path=spool_path
                 )
-                flash('File uploaded and indexed successfully!', 'success')
+                flash('File uploaded successfully! It will be searchable once indexing finishes.', 'success')
             else:
-                flash('File uploaded but could not be indexed for search', 'warning')
-        else:
-            flash(f'Upload failed: {message}', 'danger')
+                os.remove(spool_path)
+                flash(f'Upload failed: {message}', 'danger')
+            
+            # Uploads can come from the My Files page or from a folder page
+            return redirect(request.referrer or url_for('upload'))
         
+        if not folder_name:
+            flash('Please select a folder', 'danger')
+        else:
+            flash('No file selected', 'danger')
         return redirect(url_for('upload'))
     
     # GET request - show user's folders
@@ -178,16 +273,71 @@ def upload():
     
     return render_template('upload.html', folders=folders)
 
+@app.route('/upload/batch', methods=['POST'])
+@login_required
+def upload_batch():
+    username = session['username']
+    # A batch may hold many files, so it gets its own request size limit
+    request.max_content_length = Config.BATCH_UPLOAD_MAX_BYTES
+    
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        flash('No files selected', 'danger')
+        return redirect(url_for('upload'))
+    
+    # Files are handed to the batch as they arrive; the form sends folder_name first
+    folder_name = None
+    batch = None
+    try:
+        for part in MultipartStream(request.stream, boundary).parts():
+            if part.filename is None:
+                if part.name == 'folder_name':
+                    folder_name = part.read()
+                continue
+            if part.name != 'files' or part.filename == '':
+                continue
+            
+            if not folder_name:
+                flash('Please select a folder', 'danger')
+                return redirect(url_for('upload'))
+            
+            if batch is None:
+                batch = BatchUpload(blob_manager, get_search_manager(), index_queue, username, folder_name)
+            if part.filename.lower().endswith('.zip'):
+                batch.add_archive(part.filename, part.chunks())
+            else:
+                batch.add_file(part.filename, part.chunks())
+    except BaseException:
+        if batch is not None:
+            batch.abort()
+        raise
+    
+    if batch is None:
+        flash('Please select a folder' if not folder_name else 'No files selected', 'danger')
+        return redirect(url_for('upload'))
+    
+    report = batch.finish()
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify({'folder': folder_name, 'files': report})
+    
+    stored = sum(result['status'] in ('indexed', 'queued') for result in report)
+    flash(f'{stored} of {len(report)} files uploaded to {folder_name}', 'success' if stored == len(report) else 'warning')
+    folders = blob_manager.list_user_folders(username)
+    return render_template('upload.html', folders=folders, report=report)
+
 @app.route('/create_folder', methods=['POST'])
 @login_required
 def create_folder():
     username = session['username']
     folder_name = request.form.get('folder_name')
+    parent = request.form.get('parent')
     
     if not folder_name:
         flash('Folder name is required', 'danger')
-        return redirect(url_for('upload'))
+        return redirect(url_for('view_folder', folder_name=parent) if parent else url_for('upload'))
     
+    if parent:
+        folder_name = f"{parent}/{folder_name}"
     success, message = blob_manager.create_folder(username, folder_name)
     
     if success:
@@ -195,23 +345,33 @@ def create_folder():
     else:
         flash(message, 'danger')
     
-    return redirect(url_for('upload'))
+    return redirect(url_for('view_folder', folder_name=parent) if parent else url_for('upload'))
 
-@app.route('/folder/<folder_name>')
+@app.route('/folder/<path:folder_name>')
 @login_required
+@conditional_listing(folder_version)
 def view_folder(folder_name):
     username = session['username']
-    files = blob_manager.list_files_in_folder(username, folder_name)
+    cursor = request.args.get('cursor')
+    files, next_cursor = blob_manager.list_files_in_folder_page(
+        username, folder_name, Config.LIST_PAGE_SIZE, cursor
+    )
+    index_status = index_queue.statuses_for(
+        blob_manager._get_container_name(username), [file['full_path'] for file in files]
+    )
+    subfolders = blob_manager.list_user_folders(username, parent=folder_name)
     
-    return render_template('folder.html', folder_name=folder_name, files=files)
+    return render_template('folder.html', folder_name=folder_name, files=files, index_status=index_status,
+                           subfolders=subfolders, cursor=cursor, next_cursor=next_cursor)
 
-@app.route('/delete/<folder_name>/<filename>')
+@app.route('/delete/<path:folder_name>/<filename>')
 @login_required
 def delete_file(folder_name, filename):
     username = session['username']
     success, message = blob_manager.delete_file_from_folder(username, folder_name, filename)
     
     if success:
+        index_queue.forget(blob_manager._get_container_name(username), f"{folder_name}/{filename}")
         flash('File deleted successfully!', 'success')
     else:
         flash(f'Delete failed: {message}', 'danger')
@@ -220,73 +380,200 @@ def delete_file(folder_name, filename):
 
 @app.route('/browse')
 @login_required
+@conditional_listing(lambda: blob_manager.get_listing_version())
 def browse():
     # List all users (containers)
-    containers = list(blob_manager.blob_service_client.list_containers())
-    users = [container.name for container in containers]
+    users = blob_manager.list_users()
     
     return render_template('browse.html', users=users)
 
 @app.route('/browse/<username>')
 @login_required
+@conditional_listing(lambda username: blob_manager.get_listing_version(username))
 def browse_user(username):
     # Show folders for a specific user
     folders = blob_manager.list_user_folders(username)
     
     return render_template('browse_user.html', username=username, folders=folders)
 
-@app.route('/browse/<username>/<folder_name>')
+@app.route('/browse/<username>/<path:folder_name>')
 @login_required
+@conditional_listing(lambda username, folder_name: blob_manager.get_listing_version(username))
 def browse_folder(username, folder_name):
-    # Show files in a user's folder
-    files = blob_manager.list_files_in_folder(username, folder_name)
+    # Show files in a user's folder, one page at a time
+    cursor = request.args.get('cursor')
+    files, next_cursor = blob_manager.list_files_in_folder_page(
+        username, folder_name, Config.LIST_PAGE_SIZE, cursor
+    )
+    subfolders = blob_manager.list_user_folders(username, parent=folder_name)
+    
+    return render_template('browse_folder.html', username=username, folder_name=folder_name, files=files,
+                           subfolders=subfolders, cursor=cursor, next_cursor=next_cursor)
+
+@app.route('/refresh_catalog', methods=['POST'])
+@login_required
+def refresh_catalog():
+    # Force the local listing catalog to resync from storage
+    success, message = blob_manager.refresh_catalog()
+    
+    if success:
+        flash(message, 'success')
+    else:
+        flash(message, 'danger')
     
-    return render_template('browse_folder.html', username=username, folder_name=folder_name, files=files)
+    return redirect(request.referrer or url_for('browse'))
+
+def set_download_validators(response, etag, last_modified):
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # A name can be re-uploaded with new content, so cached copies are revalidated
+    # (a cheap properties call and a 304) rather than trusted for a max-age
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
 
 @app.route('/download/<container>/<path:filepath>')
 @login_required
 def download_file(container, filepath):
-    file_data = blob_manager.download_file(container, filepath)
-    
-    if file_data:
-        filename = filepath.split('/')[-1]  # Get just the filename
-        return send_file(
-            io.BytesIO(file_data),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
+    props = blob_manager.get_file_properties(container, filepath)
+    
+    if props is None:
+        flash('File not found', 'danger')
+        return redirect(url_for('browse'))
+    
+    filename = filepath.split('/')[-1]  # Get just the filename
+    
+    # Local disk: hand the open file to the server (sendfile / wsgi.file_wrapper);
+    # send_file handles Range and conditional requests itself
+    local_path = blob_manager.get_local_path(container, filepath)
+    if local_path is not None:
+        response = send_file(local_path, mimetype='application/pdf', as_attachment=True,
+                             download_name=filename, conditional=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    
+    # The browser's copy is still current: answer from the properties alone
+    etag, last_modified = props['etag'], props['last_modified']
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+        set_download_validators(response, etag, last_modified)
+        return response
+    
+    size = props['size']
+    status = 200
+    start, stop = 0, size
+    
+    # Serve a single byte range so PDF viewers can fetch pages on demand. A range
+    # with If-Range is only served if the blob is still the version the client has.
+    range_current = 'If-Range' not in request.headers or not is_resource_modified(
+        request.environ, etag=etag, last_modified=last_modified, ignore_if_range=False
+    )
+    if request.range and len(request.range.ranges) == 1 and range_current:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f'bytes */{size}'
+            return response
+        start, stop = byte_range
+        status = 206
+    
+    if stop > start:
+        chunks = blob_manager.stream_file(container, filepath, offset=start, length=stop - start,
+                                          etag=props['etag'], content=props['content'])
     else:
+        chunks = iter(())
+    
+    if chunks is None:
         flash('File not found', 'danger')
         return redirect(url_for('browse'))
+    
+    response = Response(chunks, status=status, mimetype='application/pdf', direct_passthrough=True)
+    response.content_length = stop - start
+    response.accept_ranges = 'bytes'
+    set_download_validators(response, etag, last_modified)
+    if status == 206:
+        response.content_range = ContentRange('bytes', start, stop, size)
+    try:
+        filename.encode('ascii')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    except UnicodeEncodeError:
+        response.headers.set('Content-Disposition', 'attachment', **{'filename*': f"UTF-8''{quote(filename)}"})
+    return response
 
 @app.route('/search', methods=['GET', 'POST'])
 @login_required
 def search():
     results = []
-    query = ""
+    has_next = False
+    # POST submits the form; GET with ?query= pages through results
+    params = request.form if request.method == 'POST' else request.args
+    query = params.get('query', '')
+    only_mine = params.get('only_mine') == 'on'
+    page = max(params.get('page', 1, type=int), 1)
+    page_size = Config.SEARCH_PAGE_SIZE
     
-    if request.method == 'POST':
-        query = request.form.get('query', '')
-        
-        if query:
-            from utils.search_manager import SearchManager
-            search_manager = SearchManager()
-            results = search_manager.search_documents(query, top=20)
+    if query:
+        filters = None
+        if only_mine:
+            filters = {'container': blob_manager._get_container_name(session['username'])}
+        search_manager = get_search_manager()
+        # One extra result tells us whether there is a next page
+        results = search_manager.search_documents(
+            query, top=page_size + 1, filters=filters, skip=(page - 1) * page_size
+        )
+        has_next = len(results) > page_size
+        results = results[:page_size]
     
-    return render_template('search.html', results=results, query=query)
+    return render_template('search.html', results=results, query=query, only_mine=only_mine,
+                           page=page, has_next=has_next)
+
+@app.route('/search/stats')
+@login_required
+def search_stats():
+    # Query cache counters, for tuning SEARCH_CACHE_TTL
+    return jsonify(query_cache.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Scraped by Prometheus, so no session login; optionally guarded by a bearer token
+    if Config.METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {Config.METRICS_TOKEN}":
+        abort(401)
+    caches = {'search': query_cache.stats()}
+    text_cache = get_text_cache()
+    if text_cache is not None:
+        caches['text'] = text_cache.stats()
+    return Response(metrics.registry.render(caches), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs')
+@login_required
+def jobs():
+    # The user's indexing backlog: counts per status plus the jobs that need attention
+    status = request.args.get('status')
+    container = blob_manager._get_container_name(session['username'])
+    text_cache = get_text_cache()
+    return jsonify({
+        'counts': index_queue.counts(container=container),
+        'text_cache': text_cache.stats() if text_cache is not None else None,
+        'jobs': index_queue.list_jobs(status=status, limit=request.args.get('limit', 100, type=int),
+                                      container=container)
+    })
 
-@app.route('/delete_folder/<folder_name>')
+@app.route('/delete_folder/<path:folder_name>')
 @login_required
 def delete_folder(folder_name):
     username = session['username']
     success, message = blob_manager.delete_folder(username, folder_name)
     
     if success:
+        index_queue.forget_prefix(blob_manager._get_container_name(username), f"{folder_name}/")
         flash(message, 'success')
     else:
         flash(f'Delete failed: {message}', 'danger')
     
+    # Go back to the parent folder when deleting a sub-folder
+    if '/' in folder_name:
+        return redirect(url_for('view_folder', folder_name=folder_name.rsplit('/', 1)[0]))
     return redirect(url_for('upload'))
 
 if __name__ == '__main__':
@@ -0,0 +1,394 @@
+"""In-memory stand-ins for the Azure Blob Storage and Azure AI Search SDK clients
+
+Only the calls the app makes are implemented. Every call sleeps for the
+configured latency first, so benchmarks can model a nearby or a distant
+service without touching the network.
+"""
+import itertools
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.storage.blob import BlobPrefix
+
+_etags = itertools.count(1)
+
+
+class _FakePrefix(BlobPrefix):
+    """What walk_blobs yields for a sub-folder"""
+
+    def __init__(self, name):
+        self.name = name
+
+
+class _Blob:
+    def __init__(self, data, metadata=None):
+        self.data = bytes(data)
+        self.metadata = dict(metadata or {})
+        self.created = datetime.now(timezone.utc)
+        self.etag = f'"0x{next(_etags):x}"'
+
+    def properties(self, name):
+        return SimpleNamespace(
+            name=name, size=len(self.data), creation_time=self.created, last_modified=self.created,
+            metadata=dict(self.metadata), etag=self.etag
+        )
+
+
+class _PageIterator:
+    """by_page() result: yields lists of items and exposes continuation_token"""
+
+    def __init__(self, items, page_size, token):
+        self._items = items
+        self._page_size = page_size or 5000
+        self._position = int(token) if token else 0
+        self.continuation_token = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._position >= len(self._items):
+            raise StopIteration
+        page = self._items[self._position:self._position + self._page_size]
+        self._position += len(page)
+        self.continuation_token = str(self._position) if self._position < len(self._items) else None
+        return page
+
+
+class _Paged:
+    """ItemPaged stand-in: iterate items directly or page by page"""
+
+    def __init__(self, items, page_size=None):
+        self._items = items
+        self._page_size = page_size
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def by_page(self, continuation_token=None):
+        return _PageIterator(self._items, self._page_size, continuation_token)
+
+
+class _Downloader:
+    def __init__(self, data, chunk_size):
+        self._data = data
+        self._chunk_size = chunk_size
+
+    def readall(self):
+        return self._data
+
+    def chunks(self):
+        for i in range(0, len(self._data), self._chunk_size):
+            yield self._data[i:i + self._chunk_size]
+
+
+class FakeBlobServiceClient:
+    """BlobServiceClient over a dict of containers; thread-safe"""
+
+    def __init__(self, latency=0.0, chunk_size=4 * 1024 * 1024):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.containers = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def from_connection_string(self, connection_string, **kwargs):
+        # Installed in place of the class, so every client shares this store
+        return self
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _container(self, container):
+        try:
+            return self.containers[container]
+        except KeyError:
+            raise ResourceNotFoundError(f"Container not found: {container}")
+
+    def list_containers(self):
+        self._call()
+        return [SimpleNamespace(name=name) for name in sorted(self.containers)]
+
+    def create_container(self, container):
+        self._call()
+        with self._lock:
+            if container in self.containers:
+                raise ResourceExistsError(f"Container already exists: {container}")
+            self.containers[container] = {}
+
+    def get_container_client(self, container):
+        return _FakeContainerClient(self, container)
+
+    def get_blob_client(self, container, blob):
+        return _FakeBlobClient(self, container, blob)
+
+
+class _FakeContainerClient:
+    def __init__(self, service, container):
+        self.service = service
+        self.container = container
+
+    def _sorted(self, prefix):
+        blobs = self.service._container(self.container)
+        with self.service._lock:
+            items = [(name, blob) for name, blob in blobs.items() if name.startswith(prefix or '')]
+        return sorted(items, key=lambda item: item[0])
+
+    def list_blobs(self, name_starts_with=None, include=None, results_per_page=None):
+        self.service._call()
+        items = [blob.properties(name) for name, blob in self._sorted(name_starts_with)]
+        return _Paged(items, results_per_page)
+
+    def walk_blobs(self, name_starts_with=None, include=None, delimiter='/', results_per_page=None):
+        self.service._call()
+        prefix = name_starts_with or ''
+        items = []
+        seen = set()
+        for name, blob in self._sorted(prefix):
+            rest = name[len(prefix):]
+            if delimiter in rest:
+                folder = prefix + rest.split(delimiter, 1)[0] + delimiter
+                if folder not in seen:
+                    seen.add(folder)
+                    items.append(_FakePrefix(folder))
+            else:
+                items.append(blob.properties(name))
+        return _Paged(items, results_per_page)
+
+    def delete_blobs(self, *names, raise_on_any_failure=True):
+        self.service._call()
+        blobs = self.service._container(self.container)
+        responses = []
+        with self.service._lock:
+            for name in names:
+                responses.append(SimpleNamespace(status_code=202 if blobs.pop(name, None) else 404))
+        return responses
+
+
+class _FakeBlobClient:
+    def __init__(self, service, container, name):
+        self.service = service
+        self.container = container
+        self.name = name
+        self._blocks = {}
+
+    @property
+    def url(self):
+        return f"https://fake.blob.core.windows.net/{self.container}/{self.name}"
+
+    def _get(self):
+        blob = self.service._container(self.container).get(self.name)
+        if blob is None:
+            raise ResourceNotFoundError(f"Blob not found: {self.name}")
+        return blob
+
+    def _put(self, data, metadata=None, overwrite=True):
+        blobs = self.service._container(self.container)
+        with self.service._lock:
+            if not overwrite and self.name in blobs:
+                raise ResourceExistsError(f"Blob already exists: {self.name}")
+            blobs[self.name] = _Blob(data, metadata)
+
+    def upload_blob(self, data, overwrite=False, metadata=None, **kwargs):
+        self.service._call()
+        if hasattr(data, 'read'):
+            data = data.read()
+        elif not isinstance(data, (bytes, bytearray)):
+            data = b"".join(data)
+        self._put(data, metadata, overwrite)
+
+    def stage_block(self, block_id, data, length=None, **kwargs):
+        self.service._call()
+        self._blocks[block_id] = bytes(data)
+
+    def commit_block_list(self, block_list, **kwargs):
+        self.service._call()
+        self._put(b"".join(self._blocks.pop(block.id) for block in block_list))
+
+    def get_blob_properties(self, **kwargs):
+        self.service._call()
+        return self._get().properties(self.name)
+
+    def download_blob(self, offset=None, length=None, etag=None, match_condition=None, **kwargs):
+        self.service._call()
+        blob = self._get()
+        if etag and match_condition == MatchConditions.IfNotModified and blob.etag != etag:
+            raise ResourceModifiedError(f"Blob changed: {self.name}")
+        start = offset or 0
+        end = len(blob.data) if length is None else start + length
+        return _Downloader(blob.data[start:end], self.service.chunk_size)
+
+    def delete_blob(self, **kwargs):
+        self.service._call()
+        with self.service._lock:
+            if self.service._container(self.container).pop(self.name, None) is None:
+                raise ResourceNotFoundError(f"Blob not found: {self.name}")
+
+
+_CLAUSE_RE = re.compile(r"(\w+) eq '((?:[^']|'')*)'")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _parse_filter(expression):
+    """{field: {values}} from the eq/and/or filters the app builds
+
+    Clauses on the same field are alternatives (or), different fields must
+    all match (and), which is every shape build_odata_filter and
+    build_files_filter produce.
+    """
+    fields = {}
+    for field, value in _CLAUSE_RE.findall(expression or ''):
+        fields.setdefault(field, set()).add(value.replace("''", "'"))
+    return fields
+
+
+class FakeSearchIndex:
+    """Documents of one search index, shared by the fake clients"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.documents = {}
+        self.fields = None
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def call(self):
+        with self.lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeSearchIndexClient:
+    def __init__(self, index, endpoint=None, credential=None, **kwargs):
+        self.index = index
+
+    def get_index(self, name):
+        self.index.call()
+        if self.index.fields is None:
+            raise ResourceNotFoundError(f"Index not found: {name}")
+        return SimpleNamespace(name=name, fields=self.index.fields)
+
+    def get_alias(self, name):
+        self.index.call()
+        raise ResourceNotFoundError(f"Alias not found: {name}")
+
+    def create_index(self, index):
+        self.index.call()
+        self.index.fields = list(index.fields)
+
+    def create_or_update_index(self, index):
+        self.create_index(index)
+
+
+class FakeSearchClient:
+    """SearchClient with term-frequency scoring and highlights"""
+
+    def __init__(self, index, endpoint=None, index_name=None, credential=None, **kwargs):
+        self.index = index
+
+    @staticmethod
+    def _highlight(content, terms, pre_tag, post_tag, limit):
+        highlights = []
+        for match in _WORD_RE.finditer(content):
+            if match.group().lower() in terms:
+                start = max(match.start() - 60, 0)
+                snippet = content[start:match.start()] + pre_tag + match.group() + post_tag + \
+                    content[match.end():match.end() + 60]
+                highlights.append(snippet)
+                if len(highlights) >= limit:
+                    break
+        return highlights
+
+    def search(self, search_text, filter=None, top=None, skip=None, select=None, order_by=None,
+               highlight_fields=None, highlight_pre_tag="<em>", highlight_post_tag="</em>", **kwargs):
+        self.index.call()
+        fields = _parse_filter(filter)
+        with self.index.lock:
+            documents = [
+                document for document in self.index.documents.values()
+                if all(document.get(field) in values for field, values in fields.items())
+            ]
+
+        terms = {word.lower() for word in _WORD_RE.findall(search_text or '')}
+        scored = []
+        for document in documents:
+            if search_text.strip() == '*':
+                score = 1.0
+            else:
+                words = [word.lower() for word in _WORD_RE.findall(document.get('content') or '')]
+                score = sum(word in terms for word in words) / (len(words) or 1)
+                score += 2 * sum(word.lower() in terms for word in _WORD_RE.findall(document.get('filename') or ''))
+                if not score:
+                    continue
+            scored.append((score, document))
+
+        if order_by:
+            field, _, direction = order_by[0].partition(' ')
+            scored.sort(key=lambda item: item[1].get(field) or 0, reverse=direction == 'desc')
+        else:
+            scored.sort(key=lambda item: -item[0])
+        start = skip or 0
+        scored = scored[start:start + top] if top else scored[start:]
+
+        results = []
+        for score, document in scored:
+            result = dict(document) if not select else {field: document.get(field) for field in select}
+            result['@search.score'] = score
+            if highlight_fields and search_text.strip() != '*':
+                limit = int(highlight_fields.split('-')[1]) if '-' in highlight_fields else 5
+                highlights = self._highlight(document.get('content') or '', terms,
+                                             highlight_pre_tag, highlight_post_tag, limit)
+                if highlights:
+                    result['@search.highlights'] = {'content': highlights}
+            results.append(result)
+        return results
+
+    def merge_or_upload_documents(self, documents):
+        self.index.call()
+        with self.index.lock:
+            for document in documents:
+                self.index.documents.setdefault(document['id'], {}).update(document)
+        return [SimpleNamespace(key=document['id'], succeeded=True, status_code=200, error_message=None)
+                for document in documents]
+
+    def delete_documents(self, documents):
+        self.index.call()
+        results = []
+        with self.index.lock:
+            for document in documents:
+                found = self.index.documents.pop(document['id'], None) is not None
+                results.append(SimpleNamespace(key=document['id'], succeeded=found,
+                                               status_code=200 if found else 404, error_message=None))
+        return results
+
+    def get_document(self, key, selected_fields=None):
+        self.index.call()
+        document = self.index.documents.get(key)
+        if document is None:
+            raise ResourceNotFoundError(f"Document not found: {key}")
+        return dict(document)
+
+
+def install(storage_latency=0.0, search_latency=0.0):
+    """Swap the SDK clients used by the app for in-memory fakes
+
+    Call before the app creates its storage and search clients. Returns
+    (blob_service, search_index) so callers can inspect call counts.
+    """
+    import utils.azure_storage
+    import utils.search_manager
+
+    blob_service = FakeBlobServiceClient(storage_latency)
+    search_index = FakeSearchIndex(search_latency)
+    utils.azure_storage.BlobServiceClient = blob_service
+    utils.search_manager.SearchIndexClient = lambda *args, **kwargs: FakeSearchIndexClient(search_index)
+    utils.search_manager.SearchClient = lambda *args, **kwargs: FakeSearchClient(search_index)
+    return blob_service, search_index
@@ -0,0 +1,350 @@
+"""Offline benchmarks for the upload, download, dashboard, browse and search paths
+
+    python -m benchmarks.run                                  -> default corpus, print results
+    python -m benchmarks.run --users 20 --files 50 --output results.json
+    python -m benchmarks.run --storage-latency-ms 15 --baseline results.json
+
+The Flask app runs in-process against the in-memory storage and search
+clients from benchmarks/fakes.py, seeded with a synthetic corpus of
+users x folders x PDFs. Each scenario reports throughput and p50/p99
+latency; --output writes them as JSON (with the git commit) and
+--baseline compares this run against such a file.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD = "benchmark-password"
+
+VOCABULARY = (
+    "algebra analysis atom biology calculus cell chemistry circuit derivative differential "
+    "economics electron energy entropy enzyme equation evolution force function genetics "
+    "gradient gravity history integral kinetics language lattice linear logic machine "
+    "market matrix mechanics molecule momentum network neuron optics organism particle "
+    "physics polymer probability protein quantum reaction relativity semantics sequence "
+    "signal statistics theorem thermodynamics topology vector velocity wave"
+).split()
+
+
+def make_pdf(pages):
+    """A minimal valid PDF with one line of text per page"""
+    objects = []
+    kids = ' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))
+    objects.append(b'<< /Type /Catalog /Pages 2 0 R >>')
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'.encode())
+    font = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R '
+            f'/Resources << /Font << /F1 {font} 0 R >> >> >>'.encode()
+        )
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode()
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+    objects.append(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    out = b'%PDF-1.4\n'
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(out))
+        out += f'{i + 1} 0 obj\n'.encode() + obj + b'\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return out
+
+
+def random_pages(rng, page_count, words_per_page):
+    return [' '.join(rng.choice(VOCABULARY) for _ in range(words_per_page)) for _ in range(page_count)]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'errors': errors,
+        'throughput': round(len(values) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(workdir):
+    """Point every setting at the fakes and at files under workdir (before config is imported)"""
+    os.chdir(workdir)
+    os.environ.update({
+        'STORAGE_BACKEND': 'azure',
+        'SEARCH_BACKEND': 'azure',
+        'AZURE_STORAGE_CONNECTION_STRING': 'UseFakeStorage=true',
+        'AZURE_SEARCH_ENDPOINT': 'https://fake.search.windows.net',
+        'AZURE_SEARCH_API_KEY': 'fake',
+        'USERS_DB_PATH': 'users.db',
+        'CATALOG_DB_PATH': 'catalog.db',
+        'CONTENT_DB_PATH': 'content.db',
+        'JOBS_DB_PATH': 'jobs.db',
+        'JOB_SPOOL_DIR': 'job_spool',
+        'TEXT_CACHE_DIR': 'text_cache'
+    })
+
+
+def seed_corpus(args, rng):
+    """Create users, folders and PDFs; returns [(username, container, blob path)]"""
+    from utils.auth import create_user
+    from utils.blob_manager import get_blob_manager
+    from utils.search_manager import get_search_manager
+
+    blob_manager = get_blob_manager()
+    search_manager = get_search_manager()
+    files = []
+    documents = []
+    for u in range(args.users):
+        username = f"user{u}"
+        create_user(username, PASSWORD)
+        blob_manager.create_user_container(username)
+        container = blob_manager._get_container_name(username)
+        for f in range(args.folders):
+            folder = f"folder{f}"
+            blob_manager.create_folder(username, folder)
+            for k in range(args.files):
+                pages = random_pages(rng, args.pages, args.words)
+                filename = f"doc{k}.pdf"
+                success, message = blob_manager.upload_file_to_folder(
+                    username, io.BytesIO(make_pdf(pages)), filename, folder
+                )
+                if not success:
+                    raise RuntimeError(f"Seeding failed: {message}")
+                files.append((username, container, f"{folder}/{filename}"))
+                documents.append({
+                    'filename': filename, 'content': pages, 'owner': username,
+                    'folder': folder, 'container': container, 'filepath': f"{folder}/{filename}"
+                })
+    # Index directly; the queue would only add extraction time to the setup
+    for i in range(0, len(documents), 500):
+        search_manager.index_documents(documents[i:i + 500])
+    return files
+
+
+def build_scenarios(args, rng, files):
+    """{name: request function(client, i)} for every benchmarked path"""
+    users = sorted({username for username, _, _ in files})
+    upload_pdfs = [make_pdf(random_pages(rng, args.pages, args.words)) for _ in range(args.requests + 10)]
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+
+    def next_id():
+        with counter_lock:
+            return next(counter)
+
+    def upload(client, i):
+        n = next_id()
+        return client.post('/upload', data={
+            'folder_name': 'folder0',
+            'file': (io.BytesIO(upload_pdfs[n % len(upload_pdfs)]), f"bench-{n}.pdf")
+        }, content_type='multipart/form-data')
+
+    def download(client, i):
+        _, container, path = files[(i * 7919) % len(files)]
+        return client.get(f'/download/{container}/{path}')
+
+    def dashboard(client, i):
+        return client.get('/dashboard')
+
+    def browse(client, i):
+        return client.get('/browse')
+
+    def browse_user(client, i):
+        return client.get(f'/browse/{users[i % len(users)]}')
+
+    def browse_folder(client, i):
+        return client.get(f'/browse/{users[i % len(users)]}/folder{i % args.folders}')
+
+    def search(client, i):
+        return client.get('/search', query_string={'query': VOCABULARY[(i * 31) % len(VOCABULARY)]})
+
+    return {
+        'upload': upload,
+        'download': download,
+        'dashboard': dashboard,
+        'browse': browse,
+        'browse_user': browse_user,
+        'browse_folder': browse_folder,
+        'search': search
+    }
+
+
+def logged_in_client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'user0', 'password': PASSWORD})
+    if response.status_code >= 400:
+        raise RuntimeError("Benchmark login failed")
+    return client
+
+
+def run_scenario(app, request, requests, concurrency, warmup):
+    """Time `requests` calls of request(client, i) across `concurrency` clients"""
+    clients = [logged_in_client(app) for _ in range(concurrency)]
+    for i in range(warmup):
+        request(clients[0], i).close()
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(worker_index):
+        nonlocal errors
+        client = clients[worker_index]
+        for i in range(worker_index, requests, concurrency):
+            started = time.perf_counter()
+            try:
+                response = request(client, i)
+                response.get_data()  # drain streamed bodies
+                failed = response.status_code >= 400
+                response.close()
+            except Exception as e:
+                print(f"  request failed: {e}")
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def run_extraction(args, rng):
+    """extract_text_from_pdf on fresh PDFs, so the text cache never answers"""
+    from utils.pdf_extractor import extract_text_from_pdf
+
+    pdfs = [make_pdf(random_pages(rng, args.pages, args.words)) for _ in range(args.requests + 2)]
+    extract_text_from_pdf(pdfs[-1])  # start the worker pool outside the timing
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for pdf in pdfs[:args.requests]:
+        call_started = time.perf_counter()
+        if not extract_text_from_pdf(pdf):
+            errors += 1
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def print_results(results, baseline=None):
+    print(f"\n{'scenario':<16}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, result in results.items():
+        line = f"{name:<16}{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}"
+        previous = (baseline or {}).get(name)
+        if previous and previous['p50_ms'] and previous['p99_ms']:
+            line += (f"   p50 {(result['p50_ms'] / previous['p50_ms'] - 1) * 100:+.1f}%"
+                     f"  p99 {(result['p99_ms'] / previous['p99_ms'] - 1) * 100:+.1f}%")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app against in-memory storage and search")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--folders", type=int, default=3, help="folders per user")
+    parser.add_argument("--files", type=int, default=10, help="PDFs per folder")
+    parser.add_argument("--pages", type=int, default=3, help="pages per PDF")
+    parser.add_argument("--words", type=int, default=200, help="words per page")
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="clients issuing requests at once")
+    parser.add_argument("--storage-latency-ms", type=float, default=0.0, help="added to every storage call")
+    parser.add_argument("--search-latency-ms", type=float, default=0.0, help="added to every search call")
+    parser.add_argument("--only", help="comma-separated scenarios to run (extract for PDF extraction)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    output = os.path.abspath(args.output) if args.output else None
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_root)
+    workdir = tempfile.mkdtemp(prefix="cloudfolio-bench-")
+    configure_environment(workdir)
+
+    from benchmarks import fakes
+    from config import Config
+    # The aio listing client has no fake; list containers one by one instead
+    Config.STORAGE_LIST_CONCURRENCY = 1
+    blob_service, search_index = fakes.install(args.storage_latency_ms / 1000, args.search_latency_ms / 1000)
+    from app import app
+
+    rng = random.Random(args.seed)
+    try:
+        started = time.perf_counter()
+        files = seed_corpus(args, rng)
+        print(f"Seeded {len(files)} PDFs for {args.users} users in {time.perf_counter() - started:.1f}s")
+
+        scenarios = build_scenarios(args, rng, files)
+        selected = args.only.split(',') if args.only else list(scenarios) + ['extract']
+        results = {}
+        for name in selected:
+            storage_calls, search_calls = blob_service.calls, search_index.calls
+            if name == 'extract':
+                results[name] = run_extraction(args, rng)
+            elif name in scenarios:
+                results[name] = run_scenario(app, scenarios[name], args.requests, args.concurrency, args.warmup)
+            else:
+                parser.error(f"unknown scenario: {name}")
+            results[name]['storage_calls'] = blob_service.calls - storage_calls
+            results[name]['search_calls'] = search_index.calls - search_calls
+            print(f"  {name}: {results[name]['throughput']:.1f} req/s")
+
+        print_results(results, baseline)
+        if output:
+            with open(output, "w") as f:
+                json.dump({
+                    'commit': git_commit(),
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                    'python': platform.python_version(),
+                    'params': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+                    'results': results
+                }, f, indent=2)
+            print(f"\nResults written to {output}")
+    finally:
+        os.chdir(repo_root)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
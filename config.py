@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,20 +8,117 @@ load_dotenv()
 class Config:
     # Flask
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
-    SESSION_TYPE = "filesystem"
+
+    # Sessions: "sqlite" (one row per session, expired rows swept), "cookie" (signed
+    # cookie, nothing stored server-side) or "filesystem" (Flask-Session files)
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite").lower()
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+    SESSION_SWEEP_INTERVAL = 600  # seconds between deletes of expired sessions, 0 disables
+    SESSION_TYPE = "filesystem"  # used by the "filesystem" backend
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=int(os.getenv("SESSION_LIFETIME_HOURS", "24")))
 
     # Azure Storage
     AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
     AZURE_STORAGE_ACCOUNT_NAME = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
 
+    # Storage backend: "azure" (Azure Blob Storage) or "local" (one directory per container)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "azure").lower()
+    LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "storage")
+    STORAGE_LIST_CONCURRENCY = 16  # containers listed at once for full scans, 1 = sequential
+
+    # Content deduplication: identical uploads are stored once and reference-counted
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+    CONTENT_CONTAINER = "shared-content"  # reserved; no user can own it
+    CONTENT_DB_PATH = os.getenv("CONTENT_DB_PATH", "content.db")
+
+    # Search backend: "azure" (Azure AI Search) or "local" (on-disk index in this process)
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "azure").lower()
+    LOCAL_SEARCH_DB_PATH = os.getenv("LOCAL_SEARCH_DB_PATH", "search_index.db")
+
+    # Search result cache (per process; index writes in any process invalidate it)
+    SEARCH_CACHE_ENTRIES = 512
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "60"))  # seconds, 0 disables
+    SEARCH_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    # Holds the invalidation counter every worker process checks; the catalog's file by default
+    SEARCH_CACHE_DB_PATH = os.getenv("SEARCH_CACHE_DB_PATH", os.getenv("CATALOG_DB_PATH", "catalog.db"))
+
+    # Chunked indexing: each PDF is indexed as page-sized chunks
+    INDEX_CHUNK_CHARS = int(os.getenv("INDEX_CHUNK_CHARS", "4000"))  # longer pages are split into windows
+    SEARCH_PAGES_PER_RESULT = 3  # best-matching pages shown per file
+    SEARCH_MAX_CHUNKS = 1000  # chunk hits scanned per query when grouping them by file
+
     # Azure AI Search
     AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
     AZURE_SEARCH_API_KEY = os.getenv("AZURE_SEARCH_API_KEY")
     AZURE_SEARCH_INDEX_NAME = os.getenv("AZURE_SEARCH_INDEX_NAME", "cloudfolio-index")
 
+    # Streaming downloads
+    DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # bytes fetched from storage per chunk
+
+    # Shared HTTP connection pool for Azure SDK clients
+    HTTP_POOL_CONNECTIONS = 10  # distinct hosts kept alive
+    HTTP_POOL_SIZE = 32  # connections per host
+
+    # Pagination
+    LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))  # files per folder page
+    SEARCH_PAGE_SIZE = 20  # results per search page
+
+    # Bulk deletes
+    DELETE_BATCH_SIZE = 256  # blobs per batch-delete request (service maximum)
+    DELETE_MAX_CONCURRENCY = 4  # batches in flight
+    INDEX_BATCH_SIZE = 1000  # documents per index request (service maximum)
+    INDEX_BATCH_MAX_BYTES = 15 * 1024 * 1024  # index request payload, under the service's 16 MB limit
+
+    # Local metadata catalog (mirrors blob listings for page views)
+    CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "true").lower() == "true"
+    CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH", "catalog.db")
+    CATALOG_REFRESH_INTERVAL = int(os.getenv("CATALOG_REFRESH_INTERVAL", "300"))  # seconds, 0 disables
+
+    # Dashboard aggregates (kept in the catalog; the recount only applies with CATALOG_ENABLED off)
+    DASHBOARD_RECENT_UPLOADS = 10
+    DASHBOARD_TOP_FOLDERS = 5
+    DASHBOARD_RECOUNT_INTERVAL = int(os.getenv("DASHBOARD_RECOUNT_INTERVAL", "600"))  # seconds, 0 disables
+
     # User storage
-    USERS_FILE = "users.json"
+    USERS_DB_PATH = os.getenv("USERS_DB_PATH", "users.db")
+    USERS_FILE = "users.json"  # legacy store, imported into USERS_DB_PATH once
 
     # Allowed file extensions
     ALLOWED_EXTENSIONS = {"pdf"}
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+    MAX_CONTENT_LENGTH = MAX_FILE_SIZE + 1024 * 1024  # Flask rejects larger requests up front
+
+    # Streaming uploads
+    UPLOAD_BLOCK_SIZE = 4 * 1024 * 1024  # bytes per staged block
+    UPLOAD_MAX_CONCURRENCY = 4  # blocks in flight per upload
+
+    # Batch uploads: many PDFs or zip archives in one request, indexed in one call
+    BATCH_UPLOAD_WORKERS = 4  # files uploaded at once
+    BATCH_UPLOAD_MAX_FILES = 500
+    BATCH_UPLOAD_MAX_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_MB", "1024")) * 1024 * 1024  # whole request
+
+    # PDF text extraction
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 2)))  # 0 extracts inline
+    PDF_EXTRACT_TASKS_PER_CHILD = 50  # recycle worker processes periodically
+    PDF_PAGES_PER_TASK = 16  # pages extracted per pool task
+    PDF_MAX_PAGES = 2000
+    PDF_MAX_BYTES = MAX_FILE_SIZE
+    PDF_EXTRACT_TIMEOUT = 120  # seconds per document
+
+    # Extracted-text cache, keyed by the sha256 of the PDF bytes
+    TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "true").lower() == "true"
+    TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", "text_cache")
+    TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    # Background indexing queue
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+    JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "job_spool")  # uploaded PDFs waiting to be indexed
+    INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "2"))
+    INDEX_MAX_ATTEMPTS = 5
+    INDEX_RETRY_BASE_DELAY = 5  # seconds, doubled on every retry
+    INDEX_RETRY_MAX_DELAY = 600
+    INDEX_JOB_LEASE_TIMEOUT = 600  # running jobs older than this are picked up again
+
+    # Metrics (/metrics in Prometheus text format)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # if set, scrapers must send "Authorization: Bearer <token>"
+    SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0"))  # log slower requests with their backend calls, 0 disables
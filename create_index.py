@@ -13,3 +13,4 @@ except Exception as e:
 print("\nCreating new index with correct configuration...")
 search_manager._create_index_if_not_exists()
 print("✓ New index created!")
+print("\nThe index is empty; run `python reindex.py` to index the stored PDFs.")
@@ -0,0 +1,27 @@
+import sys
+from datetime import datetime
+from config import Config
+from utils.job_queue import IndexJobQueue
+
+# Inspect the background indexing queue:
+#   python index_jobs.py            -> counts per status
+#   python index_jobs.py pending    -> list jobs with a status (pending/running/indexed/failed)
+#   python index_jobs.py retry      -> re-queue every failed job
+queue = IndexJobQueue(Config.JOBS_DB_PATH, Config.JOB_SPOOL_DIR)
+command = sys.argv[1] if len(sys.argv) > 1 else None
+
+if command is None:
+    for status, count in queue.counts().items():
+        print(f"{status:>8}: {count}")
+elif command == "retry":
+    print(f"Re-queued {queue.retry_failed()} failed jobs")
+elif command in IndexJobQueue.STATUSES:
+    for job in queue.list_jobs(status=command, limit=1000):
+        next_run = datetime.fromtimestamp(job['next_run_at']).strftime('%Y-%m-%d %H:%M:%S')
+        line = f"{job['container']}/{job['filepath']}  attempts={job['attempts']}  next_run={next_run}"
+        if job['last_error']:
+            line += f"  error={job['last_error']}"
+        print(line)
+else:
+    print(f"Unknown command: {command}")
+    sys.exit(1)
@@ -0,0 +1,79 @@
+import sys
+from collections import defaultdict
+from utils.search_manager import SearchManager
+
+# One-time migration to stable chunk keys.
+# Every (container, filepath) ends up as chunks keyed "<key>-<ordinal>", with
+# key from SearchManager.document_key and the file's chunk count stored on
+# chunk 0 (deletes and re-indexing read it instead of searching). Documents
+# under older ids (random uuids, or the bare key from before chunking) are
+# re-keyed as chunk 0 if the file has no chunks yet, and removed.
+#   python migrate_index_keys.py            -> migrate
+#   python migrate_index_keys.py --dry-run  -> only report what would change
+BATCH_SIZE = 500
+
+dry_run = "--dry-run" in sys.argv
+# Adds the chunk fields to an index that predates them
+search_manager = SearchManager(ensure_index=not dry_run)
+search_client = search_manager.search_client
+
+
+def chunk_ordinal(doc_id, key):
+    """Ordinal of a "<key>-<ordinal>" chunk id, or None for any other id"""
+    prefix = f"{key}-"
+    if doc_id.startswith(prefix) and doc_id[len(prefix):].isdigit():
+        return int(doc_id[len(prefix):])
+    return None
+
+
+print("Scanning index...")
+groups = defaultdict(dict)
+select = ["id", "container", "filepath"] if dry_run else ["id", "container", "filepath", "chunks"]
+for result in search_client.search(search_text="*", select=select):
+    groups[(result["container"], result["filepath"])][result["id"]] = result.get("chunks")
+print(f"✓ Found {sum(len(ids) for ids in groups.values())} documents for {len(groups)} files")
+
+uploads = []
+deletes = []
+rekeyed = 0
+counted = 0
+for (container, filepath), ids in groups.items():
+    key = SearchManager.document_key(container, filepath)
+    ordinals = {doc_id: chunk_ordinal(doc_id, key) for doc_id in ids}
+    stale = [doc_id for doc_id, ordinal in ordinals.items() if ordinal is None]
+    chunks = [ordinal for ordinal in ordinals.values() if ordinal is not None]
+
+    if not chunks:
+        # Copy one of the old documents as the file's only chunk
+        if not dry_run:
+            document = search_client.get_document(key=stale[0])
+            document = {name: value for name, value in document.items() if not name.startswith("@")}
+            document.update(id=f"{key}-0", chunk=0, chunks=1)
+            uploads.append(document)
+        rekeyed += 1
+    elif f"{key}-0" in ids and ids[f"{key}-0"] is None:
+        # Covers every ordinal present, including leftovers past the current end
+        if not dry_run:
+            uploads.append({"id": f"{key}-0", "chunks": max(chunks) + 1})
+        counted += 1
+    deletes.extend({"id": doc_id} for doc_id in stale)
+
+    # Send re-keyed documents as we go so their content isn't all held in memory
+    if len(uploads) >= BATCH_SIZE:
+        search_client.merge_or_upload_documents(documents=uploads)
+        uploads = []
+
+if dry_run:
+    print(f"{rekeyed} files to re-key, {len(deletes)} old documents to delete, "
+          f"chunk counts to store for up to {counted} more files")
+    sys.exit(0)
+print(f"{rekeyed} files re-keyed, {counted} chunk counts stored, {len(deletes)} old documents to delete")
+
+if uploads:
+    search_client.merge_or_upload_documents(documents=uploads)
+print("✓ Stable-key documents uploaded")
+
+# Old IDs are deleted only after every stable-key copy exists
+for i in range(0, len(deletes), BATCH_SIZE):
+    search_client.delete_documents(documents=deletes[i:i + BATCH_SIZE])
+print("✓ Old documents deleted")
@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from azure.core.exceptions import ResourceNotFoundError
+from config import Config
+from utils.blob_manager import get_blob_manager
+from utils.pdf_extractor import ExtractionUnavailableError, extract_page_texts, get_cached_pages
+from utils.search_manager import SearchManager, get_search_manager
+
+# Rebuild the search index from every PDF in storage:
+#   python reindex.py                               -> re-index into the current index
+#   python reindex.py --resume                      -> continue an interrupted run
+#   python reindex.py --new-index docs-v2 --alias cloudfolio-index
+#       -> build docs-v2 from scratch, then point the alias at it. With
+#          AZURE_SEARCH_INDEX_NAME set to the alias, searches switch over
+#          in one step and never see a half-built index.
+#
+# Switching an existing deployment to an alias: the first time, the alias has
+# the name of the physical index the app already uses (AZURE_SEARCH_INDEX_NAME),
+# and an alias can't share a name with an index. Pass --replace-index:
+#   python reindex.py --new-index docs-v1 --alias cloudfolio-index --replace-index
+#       -> build docs-v1, delete the physical cloudfolio-index, then create the
+#          alias in its place. Searches fail for the moment between the delete
+#          and the alias appearing. Later runs only move the alias and don't
+#          need the flag.
+
+
+def index_exists(index_client, name):
+    """Whether a physical index (not an alias) has this name"""
+    try:
+        index_client.get_index(name)
+    except ResourceNotFoundError:
+        return False
+    return True
+
+
+def load_checkpoint(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def iter_blobs(blob_manager, state):
+    """Yield (container, blob) for every PDF not yet indexed, and (container, None) after each container"""
+    containers = sorted(
+        container for container in blob_manager.storage.list_containers()
+        if container != Config.CONTENT_CONTAINER
+    )
+    for container in containers:
+        if container in state['done_containers']:
+            continue
+        after = state['after'] if state['container'] == container else None
+        # Resuming relies on name order, which not every backend lists in
+        blobs = sorted(blob_manager.storage.list_blobs(container), key=lambda blob: blob['name'])
+        for blob in blobs:
+            if after is not None and blob['name'] <= after:
+                continue
+            if blob['name'].lower().endswith('.pdf'):
+                yield container, blob
+        yield container, None
+
+
+def load_document(blob_manager, container, blob):
+    """Build the search document for one blob; returns (document, sha256, error)"""
+    name = blob['name']
+    sha256 = blob_manager.content_sha256(container, name)
+
+    # Cached text means no download and no parsing
+    pages = get_cached_pages(sha256) if sha256 else None
+    if not pages:
+        data = blob_manager.download_file(container, name)
+        if data is None:
+            return None, sha256, "download failed"
+        try:
+            pages = extract_page_texts(data, sha256)
+        except ExtractionUnavailableError as e:
+            return None, sha256, str(e)
+    if not any(page.strip() for page in pages):
+        return None, sha256, "no text extracted"
+
+    folder, _, filename = name.rpartition('/')
+    document = {
+        'filename': filename,
+        'content': pages,
+        'owner': container,
+        'folder': folder,
+        'container': container,
+        'filepath': name
+    }
+    return document, sha256, None
+
+
+def ordered_results(executor, blob_manager, state, window_size):
+    """Extract documents concurrently but yield them in listing order
+
+    Listing order is what the checkpoint records, so results are released
+    in order; at most window_size blobs are in flight.
+    """
+    window = deque()
+    for container, blob in iter_blobs(blob_manager, state):
+        future = executor.submit(load_document, blob_manager, container, blob) if blob else None
+        window.append((container, blob, future))
+        while len(window) >= window_size:
+            container, blob, future = window.popleft()
+            yield container, blob, future.result() if future else None
+    while window:
+        container, blob, future = window.popleft()
+        yield container, blob, future.result() if future else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-index every PDF in storage")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint file")
+    parser.add_argument("--checkpoint", default="reindex_checkpoint.json")
+    parser.add_argument("--workers", type=int, default=4, help="documents downloaded and extracted at once")
+    parser.add_argument("--new-index", help="build into this (new) Azure index instead of the current one")
+    parser.add_argument("--alias", help="point this alias at --new-index when the build finishes")
+    parser.add_argument("--replace-index", action="store_true",
+                        help="delete a physical index named like --alias before creating the alias")
+    args = parser.parse_args()
+
+    if (args.new_index or args.alias) and Config.SEARCH_BACKEND == "local":
+        print("--new-index and --alias need the Azure search backend")
+        sys.exit(1)
+    if args.alias and not args.new_index:
+        print("--alias needs --new-index")
+        sys.exit(1)
+    if args.alias and args.alias == args.new_index:
+        print("--alias and --new-index need different names")
+        sys.exit(1)
+    if args.replace_index and not args.alias:
+        print("--replace-index needs --alias")
+        sys.exit(1)
+
+    if args.resume and os.path.exists(args.checkpoint):
+        state = load_checkpoint(args.checkpoint)
+        if state['index'] != args.new_index:
+            print(f"Checkpoint is for index {state['index']!r}, not {args.new_index!r}")
+            sys.exit(1)
+        print(f"Resuming after {state['docs']} documents")
+    else:
+        state = {'index': args.new_index, 'done_containers': [], 'container': None, 'after': None,
+                 'docs': 0, 'failed': 0, 'bytes': 0}
+
+    if args.new_index:
+        search_manager = SearchManager(ensure_index=True, index_name=args.new_index)
+        # Checked before the build, not after it: the alias can't be created
+        # while a physical index holds its name
+        if args.alias and index_exists(search_manager.index_client, args.alias) and not args.replace_index:
+            print(f"{args.alias} is a physical index, not an alias. Re-run with --replace-index to "
+                  f"delete it once {args.new_index} is built and create the alias in its place.")
+            sys.exit(1)
+    else:
+        search_manager = get_search_manager()
+    blob_manager = get_blob_manager()
+
+    batch = []
+    batch_bytes = 0
+    started = time.monotonic()
+    run_docs = 0
+    run_bytes = 0
+
+    def flush():
+        nonlocal batch, batch_bytes, run_docs
+        if batch:
+            documents = [document for document, _ in batch]
+            failures = search_manager.index_documents(documents)
+            for (container, filepath), error in failures.items():
+                print(f"  failed {container}/{filepath}: {error}")
+            content_store = blob_manager.content_store
+            for document, sha256 in batch:
+                if content_store and sha256 and (document['container'], document['filepath']) not in failures:
+                    content_store.mark_indexed(sha256, document['container'], document['filepath'])
+            state['docs'] += len(batch) - len(failures)
+            state['failed'] += len(failures)
+            run_docs += len(batch)
+            batch = []
+            batch_bytes = 0
+        save_checkpoint(args.checkpoint, state)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        print(f"{state['docs']} indexed, {state['failed']} failed | "
+              f"{run_docs / elapsed:.1f} docs/s, {run_bytes / elapsed / (1024 * 1024):.2f} MB/s")
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for container, blob, result in ordered_results(executor, blob_manager, state, args.workers * 2):
+            if blob is None:
+                # Container finished: flush so the checkpoint can skip it from now on
+                state['container'] = None
+                state['after'] = None
+                state['done_containers'].append(container)
+                flush()
+                continue
+
+            document, sha256, error = result
+            run_bytes += blob['size'] or 0
+            state['bytes'] += blob['size'] or 0
+            if error:
+                print(f"  skipped {container}/{blob['name']}: {error}")
+                state['failed'] += 1
+            else:
+                size = len(json.dumps(document).encode("utf-8"))
+                if batch and (len(batch) >= Config.INDEX_BATCH_SIZE
+                              or batch_bytes + size > Config.INDEX_BATCH_MAX_BYTES):
+                    flush()
+                batch.append((document, sha256))
+                batch_bytes += size
+            # Everything up to here is either in the batch or done
+            state['container'] = container
+            state['after'] = blob['name']
+    flush()
+
+    elapsed = time.monotonic() - started
+    print(f"✓ Re-indexed {state['docs']} documents ({state['failed']} failed) in {elapsed:.0f}s")
+
+    if args.alias:
+        from azure.search.documents.indexes.models import SearchAlias
+        index_client = search_manager.index_client
+        try:
+            previous = index_client.get_alias(args.alias).indexes
+        except ResourceNotFoundError:
+            previous = []
+        if not previous and index_exists(index_client, args.alias):
+            index_client.delete_index(args.alias)
+            print(f"✓ Deleted physical index {args.alias} to make way for the alias")
+        index_client.create_or_update_alias(SearchAlias(name=args.alias, indexes=[args.new_index]))
+        print(f"✓ Alias {args.alias} now points at {args.new_index}")
+        if previous:
+            print(f"  previous index {', '.join(previous)} can be deleted once nothing uses it")
+
+    os.remove(args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+
+# Config reads the environment when it is imported, so point every database,
+# spool and storage directory at a scratch directory and use the local backends
+_workdir = tempfile.mkdtemp(prefix="cloudfolio-tests-")
+os.chdir(_workdir)
+os.environ.update({
+    "STORAGE_BACKEND": "local",
+    "SEARCH_BACKEND": "local",
+    "SESSION_BACKEND": "sqlite",
+    "CATALOG_REFRESH_INTERVAL": "0",
+    "DASHBOARD_RECOUNT_INTERVAL": "0",
+    "INDEX_WORKERS": "0",
+    "PDF_EXTRACT_WORKERS": "2",
+    "SEARCH_CACHE_TTL": "0",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+def build_pdf(pages):
+    """A minimal valid PDF with one line of text per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    font = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>".encode()
+        )
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+@pytest.fixture
+def make_pdf():
+    return build_pdf
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+import utils.aio_storage
+from utils.aio_storage import SyncAsyncBlobStorage
+
+
+class FakeAsyncClient:
+    """Just enough of the aio BlobServiceClient for listings, tracking how many run at once"""
+
+    def __init__(self, containers, failing=()):
+        self.containers = containers
+        self.failing = set(failing)
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    async def list_containers(self):
+        for name in self.containers:
+            yield SimpleNamespace(name=name)
+
+    def get_container_client(self, container):
+        return SimpleNamespace(list_blobs=lambda **kwargs: self._list_blobs(container))
+
+    async def _list_blobs(self, container):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if container in self.failing:
+                raise RuntimeError(f"listing {container} failed")
+            for i in range(self.containers[container]):
+                yield SimpleNamespace(name=f"{container}-{i}.pdf", size=i, creation_time=None, metadata={})
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def storage_for(monkeypatch):
+    facades = []
+
+    def storage_for(client, max_concurrency):
+        monkeypatch.setattr(utils.aio_storage.AsyncBlobServiceClient, "from_connection_string",
+                            lambda connection_string: client)
+        facade = SyncAsyncBlobStorage("UseDevelopmentStorage=true", max_concurrency)
+        facades.append(facade)
+        return facade
+
+    yield storage_for
+    for facade in facades:
+        facade.close()
+
+
+def test_listing_merges_every_container(storage_for):
+    client = FakeAsyncClient({"alice": 2, "bob": 0, "carol": 3})
+    listing = storage_for(client, 2).list_all()
+    assert sorted(listing) == ["alice", "bob", "carol"]
+    assert [blob['name'] for blob in listing["carol"]] == ["carol-0.pdf", "carol-1.pdf", "carol-2.pdf"]
+    assert listing["bob"] == []
+
+
+def test_containers_listed_at_once_are_bounded(storage_for):
+    client = FakeAsyncClient({f"user{i}": 1 for i in range(10)})
+    listing = storage_for(client, 3).list_all()
+    assert len(listing) == 10
+    assert client.peak == 3
+
+
+def test_a_failed_container_does_not_break_the_facade(storage_for):
+    client = FakeAsyncClient({"alice": 1, "bob": 1, "carol": 1}, failing={"bob"})
+    storage = storage_for(client, 2)
+    with pytest.raises(RuntimeError, match="bob"):
+        storage.list_all()
+    # The other listings were cancelled rather than left running
+    assert client.running == 0
+
+    # The loop thread is still serving calls
+    client.failing.clear()
+    assert sorted(storage.list_all()) == ["alice", "bob", "carol"]
+    assert storage.list_containers() == ["alice", "bob", "carol"]
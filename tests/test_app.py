@@ -0,0 +1,127 @@
+import io
+import pytest
+from app import app, blob_manager
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def logged_in(client):
+    blob_manager.create_user_container("alice")
+    with client.session_transaction() as session:
+        session['username'] = "alice"
+    return client
+
+
+def test_refresh_catalog_is_not_a_get(logged_in):
+    assert logged_in.get('/refresh_catalog').status_code == 405
+
+
+def test_refresh_catalog_needs_login(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(blob_manager, "refresh_catalog", lambda: calls.append(1) or (True, "done"))
+    response = client.post('/refresh_catalog')
+    assert response.status_code == 302 and '/login' in response.headers['Location']
+    assert calls == []
+
+
+def test_refresh_catalog_rescans_on_post(logged_in):
+    response = logged_in.post('/refresh_catalog')
+    assert response.status_code == 302
+    with logged_in.session_transaction() as session:
+        assert session['_flashes'][0][0] == 'success'
+
+
+@pytest.fixture
+def pdf(logged_in):
+    success, message = blob_manager.upload_file_to_folder("alice", io.BytesIO(b"%PDF-0123456789"), "a.pdf", "notes")
+    assert success, message
+    return '/download/alice/notes/a.pdf'
+
+
+@pytest.fixture(params=["send_file", "streamed"])
+def download_path(request, pdf, monkeypatch):
+    # Local disk is served with send_file; Azure streams from storage
+    if request.param == "streamed":
+        monkeypatch.setattr(blob_manager, "get_local_path", lambda container, filepath: None)
+    return pdf
+
+
+def test_download_sends_validators(logged_in, download_path):
+    response = logged_in.get(download_path)
+    assert response.status_code == 200
+    assert response.data == b"%PDF-0123456789"
+    assert response.headers['ETag'] and response.headers['Last-Modified']
+    assert 'no-cache' in response.headers['Cache-Control']
+
+
+def test_repeat_download_is_not_modified(logged_in, download_path):
+    etag = logged_in.get(download_path).headers['ETag']
+    response = logged_in.get(download_path, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers['ETag'] == etag
+
+
+def test_byte_range(logged_in, download_path):
+    response = logged_in.get(download_path, headers={'Range': 'bytes=5-8'})
+    assert response.status_code == 206
+    assert response.data == b"0123"
+    assert response.headers['Content-Range'] == 'bytes 5-8/15'
+
+
+def test_range_for_another_version_gets_the_whole_file(logged_in, download_path):
+    response = logged_in.get(download_path, headers={'Range': 'bytes=5-8', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == b"%PDF-0123456789"
+
+
+def test_unsatisfiable_range(logged_in, download_path):
+    response = logged_in.get(download_path, headers={'Range': 'bytes=100-200'})
+    assert response.status_code == 416
+
+
+def test_listing_is_not_modified_until_it_changes(logged_in, pdf):
+    first = logged_in.get('/browse/alice')
+    assert first.status_code == 200 and first.headers['ETag']
+    repeat = logged_in.get('/browse/alice', headers={'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 304
+
+    blob_manager.upload_file_to_folder("alice", io.BytesIO(b"%PDF-new"), "b.pdf", "notes")
+    changed = logged_in.get('/browse/alice', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_jobs_lists_only_the_users_own(logged_in):
+    from app import index_queue
+    index_queue.enqueue("alice", "notes/mine.pdf", "mine.pdf", "alice", "notes")
+    index_queue.enqueue("bob", "private/theirs.pdf", "theirs.pdf", "bob", "private")
+    body = logged_in.get('/jobs').get_json()
+    assert {job['container'] for job in body['jobs']} == {"alice"}
+    assert sum(body['counts'].values()) == len(index_queue.list_jobs(container="alice"))
+
+
+def test_batch_upload_reports_each_file(logged_in, make_pdf):
+    response = logged_in.post('/upload/batch', headers={'Accept': 'application/json'}, data={
+        'folder_name': "batch",
+        'files': [(io.BytesIO(make_pdf(["alpha"])), "a.pdf"), (io.BytesIO(b"text"), "b.txt")],
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['folder'] == "batch"
+    assert [(f['file'], f['status']) for f in body['files']] == [("a.pdf", 'indexed'), ("b.txt", 'skipped')]
+
+
+def test_batch_upload_needs_a_folder(logged_in, make_pdf):
+    response = logged_in.post('/upload/batch', data={
+        'files': [(io.BytesIO(make_pdf(["alpha"])), "a.pdf")],
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    with logged_in.session_transaction() as session:
+        assert session['_flashes'] == [('danger', 'Please select a folder')]
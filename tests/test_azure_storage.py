@@ -0,0 +1,36 @@
+import pytest
+import utils.azure_storage
+from benchmarks.fakes import FakeBlobServiceClient
+from utils.azure_storage import AzureBlobStorage
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setattr(utils.azure_storage, "BlobServiceClient", FakeBlobServiceClient())
+    storage = AzureBlobStorage("UseDevelopmentStorage=true")
+    storage.create_container("alice")
+    return storage
+
+
+def test_pages_of_only_sub_folders_are_skipped(storage):
+    # Sub-folders sort before the files, so the first pages hold only prefixes
+    for i in range(5):
+        storage.put_blob("alice", f"notes/folder{i}/x.pdf", b"x")
+    for i in range(3):
+        storage.put_blob("alice", f"notes/z{i}.pdf", b"x")
+
+    names = []
+    token = None
+    while True:
+        blobs, token = storage.list_page("alice", "notes/", 2, token=token, delimiter=True)
+        assert blobs
+        names.extend(blob['name'] for blob in blobs)
+        if token is None:
+            break
+    assert names == ["notes/z0.pdf", "notes/z1.pdf", "notes/z2.pdf"]
+
+
+def test_folder_of_only_sub_folders_gives_one_empty_page(storage):
+    for i in range(5):
+        storage.put_blob("alice", f"notes/folder{i}/x.pdf", b"x")
+    assert storage.list_page("alice", "notes/", 2, delimiter=True) == ([], None)
@@ -0,0 +1,129 @@
+import io
+import os
+import zipfile
+import pytest
+from config import Config
+from utils.batch_upload import BatchUpload
+from utils.blob_manager import get_blob_manager
+from utils.job_queue import IndexJobQueue
+from utils.search_manager import get_search_manager
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # Archives are spooled next to the index spool files
+    monkeypatch.setattr(Config, "JOB_SPOOL_DIR", str(tmp_path / "spool"))
+    return IndexJobQueue(str(tmp_path / "jobs.db"), Config.JOB_SPOOL_DIR)
+
+
+@pytest.fixture
+def new_batch(queue, request):
+    blob_manager = get_blob_manager()
+    blob_manager.create_user_container("alice")
+    # Every test uploads into its own folder of the shared storage
+    folder = request.node.name.replace('[', '-').rstrip(']')
+
+    def new_batch(**kwargs):
+        return BatchUpload(blob_manager, get_search_manager(), queue, "alice", folder, **kwargs)
+    return new_batch
+
+
+def zip_of(entries):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w') as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return out.getvalue()
+
+
+def statuses(report):
+    return {result['file']: result['status'] for result in report}
+
+
+def spooled(queue):
+    return os.listdir(queue.spool_dir)
+
+
+def test_loose_files_and_archive_entries_are_stored_and_indexed(new_batch, queue, make_pdf):
+    batch = new_batch()
+    batch.add_file("a.pdf", [make_pdf(["alpha"])])
+    batch.add_file("notes.txt", [b"not a pdf"])
+    batch.add_archive("lectures.zip", [zip_of({
+        "week1/b.pdf": make_pdf(["bravo"]),
+        "week1/deep/c.pdf": make_pdf(["charlie"]),
+        "../escape.pdf": make_pdf(["delta"]),
+        "week1/readme.md": b"# notes",
+    })])
+    report = batch.finish()
+
+    assert statuses(report) == {
+        "a.pdf": 'indexed',
+        "notes.txt": 'skipped',
+        "lectures.zip/week1/b.pdf": 'indexed',
+        "lectures.zip/week1/deep/c.pdf": 'indexed',
+        "lectures.zip/../escape.pdf": 'skipped',
+        "lectures.zip/week1/readme.md": 'skipped',
+    }
+    search_manager = get_search_manager()
+    assert search_manager.get_document_pages("alice", f"{batch.folder_name}/a.pdf")
+    assert search_manager.get_document_pages("alice", f"{batch.folder_name}/week1/deep/c.pdf")
+    assert queue.counts()['indexed'] == 3
+    assert spooled(queue) == []
+
+
+def test_files_past_the_batch_limit_are_skipped(new_batch, make_pdf):
+    batch = new_batch(max_files=2)
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        batch.add_file(name, [make_pdf([name])])
+    report = batch.finish()
+    assert [result['status'] for result in report] == ['indexed', 'indexed', 'skipped']
+    assert "limit of 2 files" in report[2]['message']
+
+
+def test_oversized_parts_and_entries_fail(new_batch, queue, make_pdf, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_FILE_SIZE", 4096)
+    batch = new_batch()
+    batch.add_file("big.pdf", [b"x" * 3000, b"x" * 3000])
+    batch.add_archive("a.zip", [zip_of({"big.pdf": b"x" * 5000, "small.pdf": make_pdf(["small"])})])
+    report = batch.finish()
+
+    assert statuses(report) == {"big.pdf": 'failed', "a.zip/big.pdf": 'failed', "a.zip/small.pdf": 'indexed'}
+    assert not get_blob_manager().blob_exists("alice", f"{batch.folder_name}/big.pdf")
+    assert spooled(queue) == []
+
+
+def test_invalid_zip_is_reported(new_batch):
+    batch = new_batch()
+    batch.add_archive("broken.zip", [b"PK not really a zip"])
+    assert batch.finish() == [{'file': "broken.zip", 'status': 'failed', 'message': 'Not a valid zip archive'}]
+
+
+def test_files_the_batch_index_call_misses_are_queued(new_batch, queue, make_pdf, monkeypatch):
+    batch = new_batch()
+    batch.add_file("a.pdf", [make_pdf(["alpha"])])
+    batch.add_file("b.pdf", [make_pdf(["bravo"])])
+    search_manager = get_search_manager()
+    index_documents = search_manager.index_documents
+
+    def partly_failing(documents):
+        failures = index_documents([d for d in documents if d['filename'] != "b.pdf"])
+        failures[("alice", f"{batch.folder_name}/b.pdf")] = "throttled"
+        return failures
+
+    monkeypatch.setattr(search_manager, "index_documents", partly_failing)
+    report = batch.finish()
+
+    assert statuses(report) == {"a.pdf": 'indexed', "b.pdf": 'queued'}
+    [job] = queue.list_jobs(status='pending')
+    assert job['filepath'] == f"{batch.folder_name}/b.pdf"
+    # The worker indexes the queued file from its spool
+    assert len(spooled(queue)) == 1
+
+
+def test_abort_removes_spool_files(new_batch, queue, make_pdf):
+    batch = new_batch()
+    batch.add_file("a.pdf", [make_pdf(["alpha"])])
+    batch.add_archive("a.zip", [zip_of({"b.pdf": make_pdf(["bravo"])})])
+    batch.abort()
+    assert spooled(queue) == []
+    assert queue.counts()['pending'] == 0
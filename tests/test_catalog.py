@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from utils.catalog import MetadataCatalog
+from utils.dashboard_stats import DashboardStats
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def blob(name, size, minutes):
+    return {'name': name, 'size': size, 'created': START + timedelta(minutes=minutes)}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "catalog.db")
+
+
+def expected(listing, container):
+    """What the in-memory stats report for the same blobs"""
+    stats = DashboardStats()
+    stats.rebuild([dict(b, container=c) for c, blobs in listing.items() for b in blobs])
+    return stats.snapshot(container)
+
+
+def test_writes_from_one_process_show_in_another(db_path):
+    writer = MetadataCatalog(db_path)
+    reader = MetadataCatalog(db_path)
+    writer.upsert_blob("alice", "notes/a.pdf", 100, START)
+    writer.upsert_blob("bob", "notes/b.pdf", 50, START + timedelta(minutes=1))
+
+    totals = reader.dashboard_totals("alice")
+    assert (totals['total_files'], totals['total_bytes']) == (2, 150)
+    assert (totals['user_files'], totals['user_bytes']) == (1, 100)
+    assert totals['top_folders'] == [("notes", 2)]
+    assert [f['name'] for f in totals['recent_uploads']] == ["notes/b.pdf", "notes/a.pdf"]
+
+
+def test_totals_follow_overwrites_and_deletes(db_path):
+    catalog = MetadataCatalog(db_path)
+    catalog.upsert_blob("alice", "notes/a.pdf", 100, START)
+    catalog.upsert_blob("alice", "notes/a.pdf", 30, START)  # overwrite
+    catalog.upsert_blob("alice", "maths/x.pdf", 10, START)
+    catalog.upsert_blob("alice", "maths/y/z.pdf", 20, START)
+    catalog.remove_blob("alice", "missing.pdf")
+    catalog.remove_blobs("alice", ["maths/x.pdf", "notes/a.pdf"])
+
+    totals = catalog.dashboard_totals("alice")
+    assert (totals['user_files'], totals['user_bytes']) == (1, 20)
+    assert totals['top_folders'] == [("maths", 1)]
+
+
+def test_matches_a_full_recount(db_path):
+    listing = {
+        "alice": [blob("notes/a.pdf", 100, 1), blob("notes/b.pdf", 5, 2), blob("top.pdf", 7, 3)],
+        "bob": [blob("notes/c.pdf", 9, 4), blob("other/d.pdf", 1, 5)],
+    }
+    catalog = MetadataCatalog(db_path)
+    catalog.upsert_blob("carol", "gone/x.pdf", 1000, START)  # not in storage any more
+    catalog.replace_all(listing)
+    assert catalog.dashboard_totals("alice") == expected(listing, "alice")
+
+    listing["alice"] = [blob("notes/a.pdf", 100, 1)]
+    catalog.replace_all(listing)
+    assert catalog.dashboard_totals("alice") == expected(listing, "alice")
+
+
+def test_totals_are_filled_for_an_existing_catalog(db_path):
+    catalog = MetadataCatalog(db_path)
+    catalog.upsert_blob("alice", "notes/a.pdf", 100, START)
+    with catalog._conn:
+        catalog._conn.execute("DROP TABLE container_totals")
+        catalog._conn.execute("DROP TABLE folder_totals")
+
+    totals = MetadataCatalog(db_path).dashboard_totals("alice")
+    assert (totals['total_files'], totals['total_bytes']) == (1, 100)
+    assert totals['top_folders'] == [("notes", 1)]
+
+
+def test_refresh_keeps_writes_made_while_listing(db_path):
+    catalog = MetadataCatalog(db_path)
+    catalog.replace_all({"alice": [blob("a.pdf", 1, 1)], "bob": [blob("b.pdf", 2, 2)]})
+
+    generations = catalog.generations()
+    # Uploaded and deleted after the listing below was taken
+    catalog.upsert_blob("alice", "new.pdf", 10, START)
+    catalog.remove_blob("bob", "b.pdf")
+    catalog.upsert_blob("carol", "c.pdf", 3, START)
+    catalog.replace_all({"alice": [blob("a.pdf", 1, 1)], "bob": [blob("b.pdf", 2, 2)]}, generations)
+
+    assert catalog.dashboard_totals("alice")['user_files'] == 2
+    assert catalog.dashboard_totals("bob")['user_files'] == 0
+    assert catalog.dashboard_totals("carol")['user_files'] == 1
+
+
+def test_refresh_applies_changes_to_untouched_containers(db_path):
+    catalog = MetadataCatalog(db_path)
+    catalog.replace_all({"alice": [blob("a.pdf", 1, 1)], "bob": [blob("b.pdf", 2, 2)]})
+    generation = catalog.container_generation("bob")
+
+    generations = catalog.generations()
+    catalog.replace_all({"alice": [blob("a.pdf", 1, 1), blob("x.pdf", 4, 3)]}, generations)
+
+    assert catalog.dashboard_totals("alice")['user_files'] == 2
+    assert catalog.dashboard_totals("bob")['total_files'] == 2
+    assert catalog.dashboard_totals("bob")['user_files'] == 0
+    assert "bob" not in catalog.generations()
+    assert catalog.container_generation("alice") > generation
+
+
+def test_refresh_drops_the_digest_of_a_changed_blob(db_path):
+    catalog = MetadataCatalog(db_path)
+    catalog.upsert_blob("alice", "a.pdf", 10, START, sha256="h1")
+    catalog.upsert_blob("alice", "b.pdf", 20, START, sha256="h2")
+    catalog.replace_all({"alice": [blob("a.pdf", 10, 0), blob("b.pdf", 25, 0)]})
+    assert catalog.get_sha256("alice", "a.pdf") == "h1"
+    assert catalog.get_sha256("alice", "b.pdf") is None
@@ -0,0 +1,95 @@
+import io
+import pytest
+from config import Config
+from utils.blob_manager import BlobManager
+from utils.content_store import ContentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentStore(str(tmp_path / "content.db"))
+
+
+def refcount(store, sha256):
+    row = store.get_object(sha256)
+    return row['refcount'] if row else 0
+
+
+def test_identical_content_shares_one_object(store):
+    assert store.add_ref("alice", "a.pdf", "h1", 10, "objects/1") == ("objects/1", [])
+    assert store.add_ref("bob", "b.pdf", "h1", 10, "objects/2") == ("objects/1", [])
+    assert refcount(store, "h1") == 2
+
+    assert store.remove_ref("alice", "a.pdf") == []
+    assert refcount(store, "h1") == 1
+    assert store.remove_ref("bob", "b.pdf") == ["objects/1"]
+    assert store.get_object("h1") is None
+
+
+def test_overwriting_an_entry_releases_its_old_content(store):
+    store.add_ref("alice", "a.pdf", "h1", 10, "objects/1")
+    assert store.add_ref("alice", "a.pdf", "h1", 10, "objects/x") == ("objects/1", [])
+    assert refcount(store, "h1") == 1
+
+    assert store.add_ref("alice", "a.pdf", "h2", 20, "objects/2") == ("objects/2", ["objects/1"])
+    assert store.get_ref("alice", "a.pdf") == "h2"
+    assert store.get_object("h1") is None
+
+
+def test_existing_ref_only_for_stored_content(store):
+    assert store.add_existing_ref("alice", "a.pdf", "h1") is None
+    assert store.get_ref("alice", "a.pdf") is None
+
+    store.add_ref("bob", "b.pdf", "h1", 10, "objects/1")
+    assert store.add_existing_ref("alice", "a.pdf", "h1") == ("objects/1", [])
+    assert refcount(store, "h1") == 2
+
+
+def test_index_source_is_dropped_with_its_reference(store):
+    store.add_ref("alice", "a.pdf", "h1", 10, "objects/1")
+    store.add_ref("bob", "b.pdf", "h1", 10, "objects/1")
+    store.mark_indexed("h1", "alice", "a.pdf")
+    store.mark_indexed("h1", "bob", "b.pdf")  # first one stays
+    assert store.indexed_source("h1") == ("alice", "a.pdf")
+    store.remove_ref("alice", "a.pdf")
+    assert store.indexed_source("h1") is None
+
+
+@pytest.fixture
+def blob_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LOCAL_STORAGE_ROOT", str(tmp_path / "storage"))
+    monkeypatch.setattr(Config, "CONTENT_DB_PATH", str(tmp_path / "content.db"))
+    monkeypatch.setattr(Config, "CATALOG_DB_PATH", str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(Config, "DEDUP_ENABLED", True)
+    manager = BlobManager()
+    manager.create_user_container("alice")
+    return manager
+
+
+def test_duplicate_upload_keeps_content_until_the_last_reference_goes(blob_manager):
+    assert blob_manager.upload_file_to_folder("alice", io.BytesIO(b"same pdf"), "a.pdf", "notes")[0]
+    success, message = blob_manager.upload_file_to_folder("alice", io.BytesIO(b"same pdf"), "b.pdf", "notes")
+    assert success and "already stored" in message
+    assert list(blob_manager.storage.list_blobs(Config.CONTENT_CONTAINER))[0]['size'] == 8
+
+    blob_manager.delete_file_from_folder("alice", "notes", "a.pdf")
+    assert blob_manager.download_file("alice", "notes/b.pdf") == b"same pdf"
+    blob_manager.delete_file_from_folder("alice", "notes", "b.pdf")
+    assert list(blob_manager.storage.list_blobs(Config.CONTENT_CONTAINER)) == []
+
+
+def test_upload_is_stored_when_the_existing_copy_is_deleted_first(blob_manager, monkeypatch):
+    blob_manager.upload_file_to_folder("alice", io.BytesIO(b"same pdf"), "a.pdf", "notes")
+    content_store = blob_manager.content_store
+    add_existing_ref = content_store.add_existing_ref
+
+    def deleted_meanwhile(container, name, sha256):
+        # The only other reference goes away after the upload is hashed
+        blob_manager.delete_file_from_folder("alice", "notes", "a.pdf")
+        return add_existing_ref(container, name, sha256)
+
+    monkeypatch.setattr(content_store, "add_existing_ref", deleted_meanwhile)
+    success, message = blob_manager.upload_file_to_folder("alice", io.BytesIO(b"same pdf"), "b.pdf", "notes")
+    assert success and "already stored" not in message
+    assert blob_manager.download_file("alice", "notes/b.pdf") == b"same pdf"
+    assert refcount(content_store, content_store.get_ref("alice", "notes/b.pdf")) == 1
@@ -0,0 +1,40 @@
+import io
+import pytest
+from utils.blob_manager import get_blob_manager
+from utils.indexer import process_index_job
+from utils.job_queue import PermanentJobError
+from utils.search_manager import get_search_manager
+
+
+@pytest.fixture
+def job(make_pdf, request):
+    blob_manager = get_blob_manager()
+    blob_manager.create_user_container("alice")
+    filename = f"{request.node.name}.pdf"
+    success, message = blob_manager.upload_file_to_folder(
+        "alice", io.BytesIO(make_pdf(["thermodynamics lecture"])), filename, "notes"
+    )
+    assert success, message
+    return {'container': "alice", 'filepath': f"notes/{filename}", 'filename': filename,
+            'owner': "alice", 'folder': "notes", 'spool_path': None}
+
+
+def test_job_indexes_the_file(job):
+    success, _ = process_index_job(job)
+    assert success
+    assert get_search_manager().get_document_pages("alice", job['filepath'])
+
+
+def test_file_deleted_during_indexing_is_not_left_searchable(job, monkeypatch):
+    search_manager = get_search_manager()
+    index_document = search_manager.index_document
+
+    def deleted_meanwhile(**document):
+        # The delete (storage, then index) finishes while the job is extracting
+        get_blob_manager().delete_file_from_folder("alice", "notes", job['filename'])
+        return index_document(**document)
+
+    monkeypatch.setattr(search_manager, "index_document", deleted_meanwhile)
+    with pytest.raises(PermanentJobError):
+        process_index_job(job)
+    assert search_manager.get_document_pages("alice", job['filepath']) is None
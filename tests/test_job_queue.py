@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import pytest
+from utils.job_queue import IndexJobQueue, PermanentJobError
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return IndexJobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "spool"), max_attempts=3, base_delay=0)
+
+
+def enqueue(queue, filepath="notes/a.pdf", spool_path=None):
+    queue.enqueue("alice", filepath, filepath.rsplit('/', 1)[-1], "alice", "notes", spool_path=spool_path)
+
+
+def job_row(queue, filepath="notes/a.pdf"):
+    return queue._conn().execute("SELECT * FROM jobs WHERE filepath = ?", (filepath,)).fetchone()
+
+
+def test_successful_job_is_indexed_and_its_spool_removed(queue):
+    spool_path = queue.new_spool_path()
+    open(spool_path, 'wb').close()
+    enqueue(queue, spool_path=spool_path)
+
+    seen = []
+    assert queue.run_once(lambda job: seen.append(job['spool_path']) or (True, "ok"))
+    assert seen == [spool_path]
+    assert job_row(queue)['status'] == 'indexed'
+    assert not queue.run_once(lambda job: (True, "ok"))
+    assert not os.path.exists(spool_path)
+
+
+def test_failures_are_retried_until_max_attempts(queue):
+    enqueue(queue)
+    for attempt in range(1, 4):
+        assert queue.run_once(lambda job: (False, "search unavailable"))
+        row = job_row(queue)
+        assert row['attempts'] == attempt
+    assert row['status'] == 'failed' and row['last_error'] == "search unavailable"
+
+    assert queue.retry_failed() == 1
+    assert job_row(queue)['status'] == 'pending'
+
+
+def test_permanent_errors_are_not_retried(queue):
+    enqueue(queue)
+
+    def handler(job):
+        raise PermanentJobError("No text could be extracted from the PDF")
+
+    queue.run_once(handler)
+    assert job_row(queue)['status'] == 'failed'
+    assert job_row(queue)['attempts'] == 1
+
+
+def test_outcome_of_a_superseded_run_is_ignored(queue):
+    enqueue(queue)
+    first = queue._claim()
+    # The file is uploaded again while the first run is still going
+    enqueue(queue)
+    second = queue._claim()
+    assert first['attempts'] == second['attempts'] == 1
+
+    queue._finish(first, False, "stale run failed", permanent=True)
+    row = job_row(queue)
+    assert row['status'] == 'running' and row['lease'] == second['lease']
+
+    queue._finish(second, True, "ok")
+    assert job_row(queue)['status'] == 'indexed'
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = IndexJobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "spool"), lease_timeout=-1)
+    enqueue(queue)
+    stuck = queue._claim()
+    retried = queue._claim()
+    assert retried['id'] == stuck['id'] and retried['attempts'] == 2
+
+    queue._finish(stuck, True, "ok")
+    assert job_row(queue)['status'] == 'running'
+    queue._finish(retried, True, "ok")
+    assert job_row(queue)['status'] == 'indexed'
+
+
+def test_deleted_file_stays_deleted(queue):
+    enqueue(queue)
+    job = queue._claim()
+    queue.forget("alice", "notes/a.pdf")
+    queue._finish(job, True, "ok")
+    assert job_row(queue) is None
+
+
+def test_lease_column_is_added_to_an_existing_queue(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, container TEXT NOT NULL, "
+        "filepath TEXT NOT NULL, filename TEXT NOT NULL, owner TEXT NOT NULL, folder TEXT NOT NULL, "
+        "spool_path TEXT, status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+        "next_run_at REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+        "UNIQUE (container, filepath))"
+    )
+    conn.commit()
+    conn.close()
+
+    queue = IndexJobQueue(db_path, str(tmp_path / "spool"))
+    enqueue(queue)
+    assert queue.run_once(lambda job: (True, "ok"))
+    assert job_row(queue)['status'] == 'indexed'
+
+
+def test_listing_can_be_limited_to_one_container(queue):
+    enqueue(queue)
+    queue.enqueue("bob", "private/b.pdf", "b.pdf", "bob", "private")
+    assert [job['container'] for job in queue.list_jobs(container="bob")] == ["bob"]
+    assert queue.counts(container="alice")['pending'] == 1
+    assert queue.counts()['pending'] == 2
@@ -0,0 +1,44 @@
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+from utils.local_storage import LocalDiskStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalDiskStorage(str(tmp_path / "root"))
+    storage.create_container("alice")
+    storage.put_blob("alice", "notes/a.pdf", b"alice's file")
+    storage.create_container("bob")
+    storage.put_blob("bob", "private/secret.pdf", b"bob's file")
+    (tmp_path / "outside.pdf").write_bytes(b"not in storage")
+    return storage
+
+
+def test_lists_inside_the_container(storage):
+    assert [blob['name'] for blob in storage.list_blobs("alice", "notes/")] == ["notes/a.pdf"]
+    folders, blobs = storage.walk("alice", "notes/")
+    assert folders == [] and [blob['name'] for blob in blobs] == ["notes/a.pdf"]
+
+
+@pytest.mark.parametrize("prefix", ["../bob/private/", "../../", "notes/../../bob/", "./notes/", "notes//"])
+def test_listing_prefix_cannot_escape_the_container(storage, prefix):
+    with pytest.raises(ResourceNotFoundError):
+        storage.walk("alice", prefix)
+    with pytest.raises(ResourceNotFoundError):
+        list(storage.list_blobs("alice", prefix))
+    with pytest.raises(ResourceNotFoundError):
+        storage.list_page("alice", prefix, 10, delimiter=True)
+
+
+@pytest.mark.parametrize("name", ["../bob/private/secret.pdf", "../../outside.pdf", "notes/../a.pdf", "notes\\a.pdf"])
+def test_blob_names_cannot_escape_the_container(storage, name):
+    with pytest.raises(ResourceNotFoundError):
+        storage.download("alice", name)
+    with pytest.raises(ResourceNotFoundError):
+        storage.get_properties("alice", name)
+
+
+@pytest.mark.parametrize("container", ["..", ".tmp", "alice/../bob", ""])
+def test_container_names_are_checked(storage, container):
+    with pytest.raises(ResourceNotFoundError):
+        storage.walk(container, None)
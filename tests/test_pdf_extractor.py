@@ -0,0 +1,44 @@
+import pytest
+from config import Config
+from utils import pdf_extractor
+from utils.pdf_extractor import ExtractionUnavailableError, extract_page_texts
+
+
+@pytest.fixture(autouse=True)
+def no_text_cache(monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "get_text_cache", lambda: None)
+
+
+def test_extracts_pages_on_the_pool(make_pdf):
+    assert [page.strip() for page in extract_page_texts(make_pdf(["first", "second"]))] == ["first", "second"]
+
+
+def test_unparseable_pdf_gives_no_pages():
+    assert extract_page_texts(b"not a pdf") == []
+
+
+def test_timeout_is_retryable_not_empty(make_pdf, monkeypatch):
+    monkeypatch.setattr(Config, "PDF_EXTRACT_TIMEOUT", 0)
+    with pytest.raises(ExtractionUnavailableError):
+        extract_page_texts(make_pdf(["slow"]))
+
+
+def test_retired_pool_finishes_other_documents(tmp_path, make_pdf):
+    # A document that is mid-extraction when another one times out
+    path = tmp_path / "other.pdf"
+    path.write_bytes(make_pdf(["unaffected"]))
+    pool = pdf_extractor._acquire_pool()
+    pdf_extractor._retire_pool(pool)
+
+    try:
+        assert [page.strip() for page in pdf_extractor._extract_on_pool(pool, str(path))] == ["unaffected"]
+        # New documents get a fresh pool meanwhile
+        fresh = pdf_extractor._acquire_pool()
+        assert fresh is not pool
+        pdf_extractor._release_pool(fresh)
+    finally:
+        pdf_extractor._release_pool(pool)
+    # The last user of the retired pool shut it down
+    assert pool not in pdf_extractor._pool_users
+    with pytest.raises(ValueError):
+        pool.apply_async(len, ((),))
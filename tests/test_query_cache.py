@@ -0,0 +1,34 @@
+from utils.query_cache import QueryCache
+
+
+def test_write_in_one_process_invalidates_another(tmp_path):
+    db_path = str(tmp_path / "catalog.db")
+    worker_a = QueryCache(ttl=60, generation_db=db_path)
+    worker_b = QueryCache(ttl=60, generation_db=db_path)
+    key = QueryCache.make_key("calculus", 10)
+
+    worker_a.put(key, [{'filename': 'a.pdf'}], worker_a.generation)
+    assert worker_a.get(key) == [{'filename': 'a.pdf'}]
+
+    worker_b.invalidate()
+    assert worker_a.get(key) is None
+
+
+def test_results_from_before_a_write_are_not_stored(tmp_path):
+    db_path = str(tmp_path / "catalog.db")
+    cache = QueryCache(ttl=60, generation_db=db_path)
+    key = QueryCache.make_key("calculus", 10)
+
+    generation = cache.generation
+    QueryCache(ttl=60, generation_db=db_path).invalidate()  # lands while the search runs
+    cache.put(key, [{'filename': 'a.pdf'}], generation)
+    assert cache.get(key) is None
+
+
+def test_without_a_database_the_generation_is_per_process():
+    cache = QueryCache(ttl=60)
+    key = QueryCache.make_key("calculus", 10)
+    cache.put(key, [], cache.generation)
+    assert cache.get(key) == []
+    cache.invalidate()
+    assert cache.get(key) is None
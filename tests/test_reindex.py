@@ -0,0 +1,39 @@
+import hashlib
+import io
+import pytest
+from config import Config
+from reindex import load_document
+from utils.blob_manager import BlobManager
+from utils.pdf_extractor import extract_page_texts
+
+
+@pytest.fixture
+def blob_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LOCAL_STORAGE_ROOT", str(tmp_path / "storage"))
+    monkeypatch.setattr(Config, "CATALOG_DB_PATH", str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(Config, "DEDUP_ENABLED", False)
+    manager = BlobManager()
+    manager.create_user_container("alice")
+    return manager
+
+
+def test_upload_digest_is_recorded_without_dedup(blob_manager, make_pdf):
+    data = make_pdf(["entropy"])
+    assert blob_manager.upload_file_to_folder("alice", io.BytesIO(data), "a.pdf", "notes")[0]
+    assert blob_manager.content_store is None
+    assert blob_manager.content_sha256("alice", "notes/a.pdf") == hashlib.sha256(data).hexdigest()
+
+    # A refresh that finds the blob unchanged keeps the digest
+    blob_manager.catalog.replace_all({"alice": list(blob_manager.storage.list_blobs("alice"))})
+    assert blob_manager.content_sha256("alice", "notes/a.pdf") == hashlib.sha256(data).hexdigest()
+
+
+def test_reindex_uses_cached_text_instead_of_downloading(blob_manager, make_pdf, monkeypatch):
+    data = make_pdf(["cached lecture notes"])
+    blob_manager.upload_file_to_folder("alice", io.BytesIO(data), "a.pdf", "notes")
+    extract_page_texts(data)  # what indexing the upload leaves in the text cache
+
+    monkeypatch.setattr(blob_manager, "download_file", lambda *args: pytest.fail("downloaded"))
+    document, sha256, error = load_document(blob_manager, "alice", {'name': "notes/a.pdf"})
+    assert error is None and sha256 == hashlib.sha256(data).hexdigest()
+    assert "cached lecture notes" in document['content'][0]
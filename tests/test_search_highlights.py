@@ -0,0 +1,24 @@
+from utils.local_search import LocalSearchManager
+from utils.search_backend import HIGHLIGHT_END, HIGHLIGHT_START, mark_snippet
+
+
+def test_mark_snippet_escapes_text_before_marking():
+    snippet = f"<img src=x onerror=alert(1)> {HIGHLIGHT_START}photosynthesis{HIGHLIGHT_END} & <mark>"
+    assert mark_snippet(snippet) == (
+        "&lt;img src=x onerror=alert(1)&gt; <mark>photosynthesis</mark> &amp; &lt;mark&gt;"
+    )
+
+
+def test_local_search_highlights_are_escaped(tmp_path):
+    search = LocalSearchManager(str(tmp_path / "search.db"))
+    search.index_document(
+        filename="evil.pdf",
+        content=["<script>alert('x')</script> notes on photosynthesis"],
+        owner="alice", folder="bio", container="alice", filepath="bio/evil.pdf"
+    )
+    results = search.search_documents("photosynthesis")
+    assert len(results) == 1
+    highlight = results[0]['pages'][0]['highlights'][0]
+    assert "<script>" not in highlight
+    assert "&lt;script&gt;" in highlight
+    assert "<mark>photosynthesis</mark>" in highlight
@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+import utils.search_manager
+from config import Config
+from utils.search_manager import SearchManager
+
+
+class AliasIndexClient:
+    """Index client holding physical indexes and aliases, like the service keeps them apart"""
+
+    def __init__(self, indexes, aliases):
+        self.indexes = indexes
+        self.aliases = aliases
+        self.created = []
+
+    def get_index(self, name):
+        if name not in self.indexes:
+            raise ResourceNotFoundError(f"Index not found: {name}")
+        return SimpleNamespace(name=name, fields=list(self.indexes[name]))
+
+    def get_alias(self, name):
+        if name not in self.aliases:
+            raise ResourceNotFoundError(f"Alias not found: {name}")
+        return SimpleNamespace(name=name, indexes=self.aliases[name])
+
+    def create_index(self, index):
+        if index.name in self.aliases:
+            raise ValueError(f"{index.name} is already an alias")
+        self.created.append(index.name)
+        self.indexes[index.name] = index.fields
+
+    def create_or_update_index(self, index):
+        self.indexes[index.name] = index.fields
+
+
+def make_manager(monkeypatch, client, name):
+    monkeypatch.setattr(Config, "AZURE_SEARCH_API_KEY", "test-key")
+    monkeypatch.setattr(utils.search_manager, "SearchIndexClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(utils.search_manager, "SearchClient", lambda *args, **kwargs: None)
+    return SearchManager(ensure_index=True, index_name=name)
+
+
+def test_alias_is_not_created_as_an_index(monkeypatch):
+    fields = [SimpleNamespace(name=name) for name in ("id", "content")]
+    client = AliasIndexClient({"docs-v2": fields}, {"cloudfolio-index": ["docs-v2"]})
+    make_manager(monkeypatch, client, "cloudfolio-index")
+    assert client.created == []
+    # The index behind the alias still gets fields added since it was built
+    assert {field.name for field in client.indexes["docs-v2"]} >= {"page", "chunk"}
+
+
+def test_missing_index_is_created(monkeypatch):
+    client = AliasIndexClient({}, {})
+    make_manager(monkeypatch, client, "cloudfolio-index")
+    assert client.created == ["cloudfolio-index"]
+
+
+@pytest.fixture
+def fake_index(monkeypatch):
+    from benchmarks.fakes import FakeSearchClient, FakeSearchIndex, FakeSearchIndexClient
+    index = FakeSearchIndex()
+    index.searches = 0
+
+    class CountingSearchClient(FakeSearchClient):
+        def search(self, *args, **kwargs):
+            index.searches += 1
+            return super().search(*args, **kwargs)
+
+    monkeypatch.setattr(Config, "AZURE_SEARCH_API_KEY", "test-key")
+    monkeypatch.setattr(Config, "INDEX_CHUNK_CHARS", 20)
+    monkeypatch.setattr(utils.search_manager, "SearchIndexClient", lambda *args, **kwargs: FakeSearchIndexClient(index))
+    monkeypatch.setattr(utils.search_manager, "SearchClient", lambda *args, **kwargs: CountingSearchClient(index))
+    return index
+
+
+def index_pages(manager, filepath, pages):
+    success, message = manager.index_document(filepath, pages, "alice", "notes", "alice", filepath)
+    assert success, message
+
+
+def test_reindex_and_delete_use_the_stored_chunk_count(fake_index):
+    manager = SearchManager(index_name="docs")
+    index_pages(manager, "notes/a.pdf", ["first page text", "second page text", "third page text"])
+    index_pages(manager, "notes/b.pdf", ["other file"])
+    key = SearchManager.document_key("alice", "notes/a.pdf")
+    assert fake_index.documents[f"{key}-0"]["chunks"] == 3
+
+    # Shrinking drops the chunks past the new end
+    index_pages(manager, "notes/a.pdf", ["only page"])
+    assert sorted(i for i in fake_index.documents if i.startswith(key)) == [f"{key}-0"]
+    assert fake_index.documents[f"{key}-0"]["chunks"] == 1
+
+    manager.delete_documents_by_filepaths("alice", ["notes/a.pdf", "notes/b.pdf", "notes/missing.pdf"])
+    assert fake_index.documents == {}
+    assert fake_index.searches == 0
+
+
+def test_chunks_without_a_count_are_found_by_search(fake_index):
+    manager = SearchManager(index_name="docs")
+    index_pages(manager, "notes/a.pdf", ["first page text", "second page text"])
+    key = SearchManager.document_key("alice", "notes/a.pdf")
+    # Indexed before chunk counts were stored
+    del fake_index.documents[f"{key}-0"]["chunks"]
+
+    success, _ = manager.delete_document_by_filepath("alice", "notes/a.pdf")
+    assert success
+    assert fake_index.documents == {}
+    assert fake_index.searches == 1
@@ -0,0 +1,22 @@
+import time
+from utils.session_store import SessionStore
+
+
+def test_expired_sessions_are_not_loaded_and_get_swept(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"))
+    store.save("live", '{"username": "alice"}', time.time() + 60)
+    store.save("expired", '{"username": "bob"}', time.time() - 1)
+
+    assert store.load("live")[0] == '{"username": "alice"}'
+    assert store.load("expired") is None
+    assert store.sweep() == 1
+    assert store.count() == 1
+
+
+def test_touch_extends_a_session(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"))
+    store.save("sid", "{}", time.time() - 1)
+    store.touch("sid", time.time() + 60)
+    assert store.load("sid") is not None
+    store.delete("sid")
+    assert store.load("sid") is None
@@ -0,0 +1,57 @@
+import io
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+from utils.blob_manager import get_blob_manager
+from utils.local_storage import LocalDiskStorage
+from utils.metrics import BACKEND_BYTES, BACKEND_CALL_ERRORS
+from utils.storage_backend import InstrumentedStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = InstrumentedStorage(LocalDiskStorage(str(tmp_path / "root")))
+    storage.create_container("alice")
+    return storage
+
+
+def counted(counter, operation):
+    return counter._values.get(("storage", operation), 0)
+
+
+def test_put_blob_counts_bytes_like_data(storage):
+    before = counted(BACKEND_BYTES, "put_blob")
+    storage.put_blob("alice", "a.pdf", b"12345")
+    storage.put_blob("alice", "b.pdf", memoryview(b"123"))
+    assert counted(BACKEND_BYTES, "put_blob") == before + 8
+
+
+def test_put_blob_accepts_file_like_data(storage):
+    storage.put_blob("alice", "a.pdf", io.BytesIO(b"%PDF-file"))
+    assert b"".join(storage.stream("alice", "a.pdf")) == b"%PDF-file"
+
+
+def test_errors_raised_while_iterating_are_counted(storage):
+    before = counted(BACKEND_CALL_ERRORS, "list_blobs")
+    listing = storage.list_blobs("alice", "../")
+    with pytest.raises(ResourceNotFoundError):
+        list(listing)
+    assert counted(BACKEND_CALL_ERRORS, "list_blobs") == before + 1
+
+
+def test_stopping_early_is_not_an_error(storage):
+    storage.put_blob("alice", "a.pdf", b"x")
+    storage.put_blob("alice", "b.pdf", b"y")
+    before = counted(BACKEND_CALL_ERRORS, "list_blobs")
+    listing = storage.list_blobs("alice")
+    next(listing)
+    listing.close()
+    assert counted(BACKEND_CALL_ERRORS, "list_blobs") == before
+
+
+def test_upload_file_through_the_instrumented_backend():
+    blob_manager = get_blob_manager()
+    assert isinstance(blob_manager.storage, InstrumentedStorage)
+    blob_manager.create_user_container("alice")
+    success, message = blob_manager.upload_file("alice", io.BytesIO(b"%PDF-upload"), "upload.pdf")
+    assert success, message
+    assert b"".join(blob_manager.storage.stream("alice", "upload.pdf")) == b"%PDF-upload"
@@ -0,0 +1,29 @@
+import io
+from benchmarks.fakes import FakeBlobServiceClient
+from utils.upload_stream import BlockUploader
+
+
+def make_uploader(spool=None):
+    service = FakeBlobServiceClient()
+    service.create_container("alice")
+    blob_client = service.get_blob_client("alice", "notes/a.pdf")
+    return blob_client, BlockUploader(blob_client, block_size=4, max_concurrency=2, spool=spool)
+
+
+def test_blocks_are_staged_and_committed_in_order():
+    spool = io.BytesIO()
+    blob_client, uploader = make_uploader(spool)
+    for chunk in (b"abc", b"defgh", b"ij"):
+        uploader.write(chunk)
+    assert uploader.commit() == 10
+    assert blob_client.download_blob().readall() == b"abcdefghij"
+    assert spool.read() == b"abcdefghij"
+
+
+def test_empty_file_stages_no_block(monkeypatch):
+    blob_client, uploader = make_uploader()
+    staged = []
+    monkeypatch.setattr(blob_client, "stage_block", lambda *args, **kwargs: staged.append(args))
+    assert uploader.commit() == 0
+    assert staged == []
+    assert blob_client.download_blob().readall() == b""
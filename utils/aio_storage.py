@@ -0,0 +1,104 @@
+import asyncio
+import os
+import threading
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+from config import Config
+from utils.azure_storage import AzureBlobStorage
+
+
+class AsyncBlobStorage:
+    """Blob listings on the SDK's aio clients, fanned out across containers"""
+
+    def __init__(self, connection_string, max_concurrency):
+        self.client = AsyncBlobServiceClient.from_connection_string(connection_string)
+        self.max_concurrency = max_concurrency
+
+    async def list_containers(self):
+        return [container.name async for container in self.client.list_containers()]
+
+    async def list_blobs(self, container, prefix=None):
+        container_client = self.client.get_container_client(container)
+        return [
+            AzureBlobStorage._to_dict(blob)
+            async for blob in container_client.list_blobs(name_starts_with=prefix, include=['metadata'])
+        ]
+
+    async def list_all(self, containers=None):
+        """Return {container: [blobs]}, listing up to max_concurrency containers at once
+
+        Results are merged as each container finishes, so one large
+        container doesn't hold up the others.
+        """
+        if containers is None:
+            containers = await self.list_containers()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def list_one(container):
+            async with semaphore:
+                return container, await self.list_blobs(container)
+
+        tasks = [asyncio.ensure_future(list_one(container)) for container in containers]
+        listing = {}
+        try:
+            for task in asyncio.as_completed(tasks):
+                container, blobs = await task
+                listing[container] = blobs
+        finally:
+            # One failed container fails the listing; don't leave the rest running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return listing
+
+    async def close(self):
+        await self.client.close()
+
+
+class SyncAsyncBlobStorage:
+    """Blocking facade over AsyncBlobStorage for the (sync) Flask app
+
+    The coroutines run on a private event loop in a daemon thread, so the
+    aio client and its connection pool live as long as the process.
+    """
+
+    def __init__(self, connection_string, max_concurrency):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="aio-storage", daemon=True)
+        self._thread.start()
+        self._storage = self._run(self._create(connection_string, max_concurrency))
+
+    @staticmethod
+    async def _create(connection_string, max_concurrency):
+        # Build the client on the loop that will use it
+        return AsyncBlobStorage(connection_string, max_concurrency)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def list_containers(self):
+        return self._run(self._storage.list_containers())
+
+    def list_all(self, containers=None):
+        return self._run(self._storage.list_all(containers))
+
+    def close(self):
+        self._run(self._storage.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_aio_storage = None
+_aio_storage_pid = None
+_aio_storage_lock = threading.Lock()
+
+
+def get_aio_storage():
+    """Process-wide SyncAsyncBlobStorage, created on first use and again after a fork"""
+    global _aio_storage, _aio_storage_pid
+    with _aio_storage_lock:
+        if _aio_storage is None or _aio_storage_pid != os.getpid():
+            _aio_storage = SyncAsyncBlobStorage(
+                Config.AZURE_STORAGE_CONNECTION_STRING,
+                Config.STORAGE_LIST_CONCURRENCY
+            )
+            _aio_storage_pid = os.getpid()
+        return _aio_storage
@@ -1,54 +1,30 @@
-import json
-import os
 from functools import wraps
 from flask import session, redirect, url_for, flash
+from utils.user_store import get_user_store
 
 
-# def load_users():
-#     """Load users from JSON file"""
-#     if not os.path.exists('users.json'):
-#         return {}
-
-
-#     with open('users.json', 'r') as f:
-#         return json.load(f)
 def load_users():
-    """Load users from JSON file"""
-    if not os.path.exists("users.json"):
-        return {}
+    """Load all users as {username: password}"""
+    return get_user_store().all_users()
 
-    try:
-        with open("users.json", "r") as f:
-            content = f.read().strip()
-            if not content:  # File is empty
-                return {}
-            return json.loads(content)
-    except json.JSONDecodeError:
-        return {}
 
-
-def save_users(users):
-    """Save users to JSON file"""
-    with open("users.json", "w") as f:
-        json.dump(users, f, indent=2)
+def count_users():
+    """Number of registered users (cached)"""
+    return get_user_store().count()
 
 
 def create_user(username, password):
     """Create a new user"""
-    users = load_users()
-
-    if username in users:
+    if not get_user_store().add_user(username, password):
         return False, "Username already exists"
 
-    users[username] = password
-    save_users(users)
     return True, "User created successfully"
 
 
 def verify_user(username, password):
     """Verify user credentials"""
-    users = load_users()
-    return users.get(username) == password
+    stored = get_user_store().get_password(username)
+    return stored is not None and stored == password
 
 
 def login_required(f):
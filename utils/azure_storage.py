@@ -0,0 +1,139 @@
+from azure.core import MatchConditions
+from azure.storage.blob import BlobPrefix, BlobServiceClient
+from config import Config
+from utils.http_pool import make_transport
+from utils.storage_backend import StorageBackend
+from utils.upload_stream import BlockUploader
+
+
+class AzureBlobStorage(StorageBackend):
+    """Storage backend on Azure Blob Storage"""
+
+    def __init__(self, connection_string):
+        # Downloads are fetched in bounded chunks so streaming stays cheap on memory
+        self.blob_service_client = BlobServiceClient.from_connection_string(
+            connection_string,
+            transport=make_transport(),
+            max_single_get_size=Config.DOWNLOAD_CHUNK_SIZE,
+            max_chunk_get_size=Config.DOWNLOAD_CHUNK_SIZE
+        )
+
+    def _blob_client(self, container, name):
+        return self.blob_service_client.get_blob_client(container=container, blob=name)
+
+    @staticmethod
+    def _to_dict(blob):
+        # Reference blobs are empty; their metadata carries the content's size
+        metadata = blob.metadata or {}
+        size = int(metadata['content_length']) if 'content_length' in metadata else blob.size
+        return {'name': blob.name, 'size': size, 'created': blob.creation_time}
+
+    def list_containers(self):
+        return [container.name for container in self.blob_service_client.list_containers()]
+
+    def create_container(self, container):
+        self.blob_service_client.create_container(container)
+
+    def list_blobs(self, container, prefix=None):
+        container_client = self.blob_service_client.get_container_client(container)
+        for blob in container_client.list_blobs(name_starts_with=prefix, include=['metadata']):
+            yield self._to_dict(blob)
+
+    def list_all(self):
+        # Containers are listed concurrently on the aio client instead of one by one
+        if Config.STORAGE_LIST_CONCURRENCY > 1:
+            from utils.aio_storage import get_aio_storage
+            return get_aio_storage().list_all()
+        return super().list_all()
+
+    def walk(self, container, prefix=None):
+        # The service collapses everything below a sub-folder into one prefix entry
+        container_client = self.blob_service_client.get_container_client(container)
+        folders = []
+        blobs = []
+        for item in container_client.walk_blobs(name_starts_with=prefix, include=['metadata'], delimiter='/'):
+            if isinstance(item, BlobPrefix):
+                folders.append(item.name.rstrip('/'))
+            else:
+                blobs.append(self._to_dict(item))
+        return folders, blobs
+
+    def list_page(self, container, prefix, page_size, token=None, delimiter=False):
+        container_client = self.blob_service_client.get_container_client(container)
+        if delimiter:
+            listing = container_client.walk_blobs(
+                name_starts_with=prefix, include=['metadata'], delimiter='/', results_per_page=page_size
+            )
+        else:
+            listing = container_client.list_blobs(
+                name_starts_with=prefix, include=['metadata'], results_per_page=page_size
+            )
+        pages = listing.by_page(continuation_token=token)
+        while True:
+            blobs = [self._to_dict(blob) for blob in next(pages, []) if not isinstance(blob, BlobPrefix)]
+            # With the delimiter a page can hold only sub-folders and still
+            # continue; an empty page must mean the listing is done
+            if blobs or pages.continuation_token is None:
+                return blobs, pages.continuation_token
+
+    def get_properties(self, container, name):
+        props = self._blob_client(container, name).get_blob_properties()
+        result = self._to_dict(props)
+        result['name'] = name
+        result['etag'] = props.etag
+        result['last_modified'] = props.last_modified
+        metadata = props.metadata or {}
+        result['content'] = None
+        if 'content_name' in metadata:
+            result['content'] = (metadata['content_container'], metadata['content_name'])
+        return result
+
+    def put_blob(self, container, name, data):
+        self._blob_client(container, name).upload_blob(data, overwrite=True)
+
+    def put_reference(self, container, name, content_container, content_name, size, sha256):
+        # An empty blob whose metadata points at the shared copy
+        self._blob_client(container, name).upload_blob(b"", overwrite=True, metadata={
+            'content_container': content_container,
+            'content_name': content_name,
+            'content_length': str(size),
+            'content_sha256': sha256
+        })
+
+    def open_writer(self, container, name, max_size=None, spool=None):
+        # Blocks are staged concurrently while the data is still arriving
+        return BlockUploader(
+            self._blob_client(container, name),
+            block_size=Config.UPLOAD_BLOCK_SIZE,
+            max_concurrency=Config.UPLOAD_MAX_CONCURRENCY,
+            max_size=max_size,
+            spool=spool
+        )
+
+    def download(self, container, name):
+        return self._blob_client(container, name).download_blob().readall()
+
+    def stream(self, container, name, offset=None, length=None, etag=None):
+        kwargs = {}
+        if etag:
+            kwargs = {'etag': etag, 'match_condition': MatchConditions.IfNotModified}
+        downloader = self._blob_client(container, name).download_blob(offset=offset, length=length, **kwargs)
+        return downloader.chunks()
+
+    def url(self, container, name):
+        return self._blob_client(container, name).url
+
+    def delete_blob(self, container, name):
+        self._blob_client(container, name).delete_blob()
+
+    def delete_blobs(self, container, names):
+        # One batch request for up to 256 blobs
+        container_client = self.blob_service_client.get_container_client(container)
+        responses = container_client.delete_blobs(*names, raise_on_any_failure=False)
+
+        failures = {}
+        for name, response in zip(names, responses):
+            # 404 means it is already gone, which is what we wanted
+            if response.status_code not in (200, 202, 404):
+                failures[name] = f"storage returned {response.status_code}"
+        return failures
@@ -0,0 +1,230 @@
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from utils.pdf_extractor import extract_page_texts, get_cached_pages
+
+
+class BatchUpload:
+    """Upload many PDFs (loose or in zip archives) into one folder and index them together
+
+    Files are handed in one at a time, as a streamed request delivers them.
+    Each is stored by a pool of `workers` threads while the next one is read,
+    and reading waits while all workers are busy. finish() waits
+    for the uploads and sends every extracted document in one index call.
+    Files that call doesn't index go to the background index queue instead.
+    """
+
+    def __init__(self, blob_manager, search_manager, index_queue, username, folder_name,
+                 workers=None, max_files=None):
+        self.blob_manager = blob_manager
+        self.search_manager = search_manager
+        self.index_queue = index_queue
+        self.username = username
+        self.folder_name = folder_name
+        self.container = blob_manager._get_container_name(username)
+        self.workers = workers or Config.BATCH_UPLOAD_WORKERS
+        self.max_files = max_files or Config.BATCH_UPLOAD_MAX_FILES
+        self.results = []  # per-file report, in the order the files arrived
+        self._items = []  # (result, folder, filename, spool_path, future) per accepted file
+        self._archives = []
+        self._paths = set()
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def _report(self, name, status, message):
+        result = {'file': name, 'status': status, 'message': message}
+        self.results.append(result)
+        return result
+
+    def _accept(self, name, folder, filename, size=None):
+        """Check one incoming file; returns its report entry if it should be uploaded"""
+        if len(self._items) >= self.max_files:
+            self._report(name, 'skipped', f'Batch limit of {self.max_files} files reached')
+        elif not filename.lower().endswith('.pdf'):
+            self._report(name, 'skipped', 'Only PDF files are allowed')
+        elif folder is None:
+            self._report(name, 'skipped', 'Invalid path')
+        elif size is not None and size > Config.MAX_FILE_SIZE:
+            self._report(name, 'failed', f'File exceeds the {Config.MAX_FILE_SIZE // (1024 * 1024)} MB limit')
+        elif f"{folder}/{filename}" in self._paths:
+            self._report(name, 'skipped', 'Same name as an earlier file in this batch')
+        else:
+            self._paths.add(f"{folder}/{filename}")
+            return self._report(name, 'pending', '')
+        return None
+
+    def _submit(self, result, folder, filename, open_source, spool_path, copy_to_spool):
+        # Wait for a free worker so spooled files don't pile up ahead of the uploads
+        self._slots.acquire()
+        future = self._executor.submit(
+            self._upload, result, folder, filename, open_source, spool_path, copy_to_spool
+        )
+        future.add_done_callback(lambda f: self._slots.release())
+        self._items.append((result, folder, filename, spool_path, future))
+
+    def add_file(self, filename, chunks):
+        """Add one PDF from an iterator of byte chunks (a multipart part)
+
+        The part has to be read before the next one arrives, so it goes to
+        the index spool first and is uploaded from there.
+        """
+        filename = filename.replace('\\', '/').rsplit('/', 1)[-1]
+        result = self._accept(filename, self.folder_name, filename)
+        if result is None:
+            for _ in chunks:
+                pass
+            return
+
+        spool_path = self.index_queue.new_spool_path()
+        size = 0
+        with open(spool_path, 'wb') as spool:
+            for chunk in chunks:
+                size += len(chunk)
+                if size <= Config.MAX_FILE_SIZE:
+                    spool.write(chunk)
+        if size > Config.MAX_FILE_SIZE:
+            os.remove(spool_path)
+            result.update(status='failed',
+                          message=f'File exceeds the {Config.MAX_FILE_SIZE // (1024 * 1024)} MB limit')
+            return
+        self._submit(result, self.folder_name, filename, lambda: open(spool_path, 'rb'), spool_path, False)
+
+    def add_archive(self, name, chunks):
+        """Add every PDF in a zip archive, keeping its sub-folders under the target folder
+
+        A zip's directory sits at its end, so the archive itself is spooled to
+        a temporary file. Entries are never unpacked to disk: each one is
+        decompressed straight into storage by a worker, with a copy kept only
+        in that file's index spool.
+        """
+        archive_file = tempfile.TemporaryFile(dir=Config.JOB_SPOOL_DIR)
+        for chunk in chunks:
+            archive_file.write(chunk)
+        try:
+            archive = zipfile.ZipFile(archive_file)
+        except zipfile.BadZipFile:
+            archive_file.close()
+            self._report(name, 'failed', 'Not a valid zip archive')
+            return
+        self._archives.append((archive, archive_file))
+
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                continue
+            subfolder, _, filename = info.filename.rpartition('/')
+            folder = self.folder_name
+            if subfolder:
+                folder = self.blob_manager.normalize_folder_path(f"{self.folder_name}/{subfolder}")
+            result = self._accept(f"{name}/{info.filename}", folder, filename, info.file_size)
+            if result is not None:
+                self._submit(result, folder, filename, lambda info=info: archive.open(info),
+                             self.index_queue.new_spool_path(), True)
+
+    def _upload(self, result, folder, filename, open_source, spool_path, copy_to_spool):
+        """Store one file and extract its pages; returns (document, sha256), or None if not indexable"""
+        try:
+            with open_source() as source:
+                if copy_to_spool:
+                    with open(spool_path, 'wb') as spool:
+                        success, message = self.blob_manager.upload_file_to_folder(
+                            self.username, source, filename, folder, spool=spool
+                        )
+                else:
+                    success, message = self.blob_manager.upload_file_to_folder(
+                        self.username, source, filename, folder
+                    )
+        except Exception as e:
+            success, message = False, f"Error reading file: {str(e)}"
+        if not success:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+            result.update(status='failed', message=message)
+            return None
+
+        result.update(status='uploaded', message=message)
+        filepath = f"{folder}/{filename}"
+        content_store = self.blob_manager.content_store
+        sha256 = content_store.get_ref(self.container, filepath) if content_store else None
+
+        # Deduplicated content that is already indexed elsewhere: copy its pages, skip extraction
+        source = content_store.indexed_source(sha256) if sha256 else None
+        pages = None
+        if source is not None and source != (self.container, filepath):
+            pages = self.search_manager.get_document_pages(*source)
+
+        # Text extracted earlier for the same bytes (re-uploads of known files)
+        if not pages and sha256:
+            pages = get_cached_pages(sha256)
+        if not pages:
+            pages = extract_page_texts(spool_path, sha256)
+        if not any(page.strip() for page in pages):
+            return None
+        document = {
+            'filename': filename,
+            'content': pages,
+            'owner': self.username,
+            'folder': folder,
+            'container': self.container,
+            'filepath': filepath
+        }
+        return document, sha256
+
+    def finish(self):
+        """Wait for the uploads, index the batch in one call and return the report"""
+        extracted = []
+        for result, folder, filename, spool_path, future in self._items:
+            try:
+                loaded = future.result()
+            except Exception as e:
+                print(f"Error preparing {folder}/{filename} for indexing: {str(e)}")
+                loaded = None
+            extracted.append((result, folder, filename, spool_path, loaded))
+        self._close()
+
+        documents = [loaded[0] for *_, loaded in extracted if loaded is not None]
+        failures = {}
+        if documents:
+            try:
+                failures = self.search_manager.index_documents(documents)
+            except Exception as e:
+                print(f"Error indexing batch: {str(e)}")
+                failures = {(document['container'], document['filepath']): str(e) for document in documents}
+
+        indexed = []
+        content_store = self.blob_manager.content_store
+        for result, folder, filename, spool_path, loaded in extracted:
+            if result['status'] != 'uploaded':
+                continue
+            filepath = f"{folder}/{filename}"
+            job = {'container': self.container, 'filepath': filepath, 'filename': filename,
+                   'owner': self.username, 'folder': folder}
+            if loaded is not None and (self.container, filepath) not in failures:
+                document, sha256 = loaded
+                if sha256:
+                    content_store.mark_indexed(sha256, self.container, filepath)
+                indexed.append(job)
+                os.remove(spool_path)
+                result.update(status='indexed', message='Uploaded and indexed')
+            else:
+                # The background worker retries, or records why the file can't be indexed
+                self.index_queue.enqueue(spool_path=spool_path, **job)
+                result.update(status='queued', message='Uploaded; indexing will finish in the background')
+        if indexed:
+            self.index_queue.mark_indexed(indexed)
+        return self.results
+
+    def _close(self):
+        self._executor.shutdown(wait=True)
+        for archive, archive_file in self._archives:
+            archive.close()
+            archive_file.close()
+
+    def abort(self):
+        """Give up on the batch: wait for running uploads and drop their spool files"""
+        self._close()
+        for _, _, _, spool_path, _ in self._items:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
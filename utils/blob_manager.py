@@ -1,13 +1,165 @@
-from azure.storage.blob import BlobServiceClient
 from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 from config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import base64
+import hashlib
+import os
+import threading
+import uuid
+from utils.catalog import MetadataCatalog
+from utils.content_store import ContentStore
+from utils.dashboard_stats import DashboardStats
+from utils.storage_backend import make_storage_backend
+from utils.upload_stream import UploadTooLargeError
+
+_blob_manager = None
+_blob_manager_pid = None
+_blob_manager_lock = threading.Lock()
+
+
+def get_blob_manager():
+    """Process-wide BlobManager, created on first use and again after a fork
+
+    Creating it lazily in each worker process means its connection pool and
+    background threads never cross a fork.
+    """
+    global _blob_manager, _blob_manager_pid
+    with _blob_manager_lock:
+        if _blob_manager is None or _blob_manager_pid != os.getpid():
+            _blob_manager = BlobManager()
+            _blob_manager_pid = os.getpid()
+        return _blob_manager
+
 
 class BlobManager:
     def __init__(self):
-        self.blob_service_client = BlobServiceClient.from_connection_string(
-            Config.AZURE_STORAGE_CONNECTION_STRING
+        # Azure Blob Storage or local disk, per Config.STORAGE_BACKEND
+        self.storage = make_storage_backend()
+        
+        # Identical uploads are stored once in a shared container and referenced
+        self.content_store = None
+        self._content_container_ready = False
+        if Config.DEDUP_ENABLED:
+            self.content_store = ContentStore(Config.CONTENT_DB_PATH)
+        
+        # Local catalog serves listings; storage stays the source of truth
+        self.catalog = None
+        if Config.CATALOG_ENABLED:
+            self.catalog = MetadataCatalog(Config.CATALOG_DB_PATH)
+            self.catalog.start_reconciler(self.refresh_catalog, Config.CATALOG_REFRESH_INTERVAL)
+        
+        # Dashboard aggregates live in the catalog, shared by every worker process.
+        # Without one they are kept in memory, updated on every write and recounted periodically
+        self.stats = None
+        if self.catalog is None:
+            self.stats = self._new_stats()
+            self.stats.start_recounter(self.recount_stats, Config.DASHBOARD_RECOUNT_INTERVAL)
+    
+    def _catalog_ready(self):
+        """Return True if listings can be served from the local catalog"""
+        if self.catalog is None:
+            return False
+        if not self.catalog.is_populated():
+            # First use: fill the catalog synchronously
+            success, message = self.refresh_catalog()
+            if not success:
+                print(message)
+                return False
+        return True
+    
+    def _list_blobs_from_storage(self, container_name, prefix=None):
+        """List blobs straight from storage as plain dicts"""
+        return list(self.storage.list_blobs(container_name, prefix))
+    
+    def _walk_from_storage(self, container_name, prefix=None):
+        """List one level under prefix with the "/" delimiter
+
+        Returns (folders, blobs): full paths of the sub-folders and the blobs
+        sitting directly under prefix, without enumerating anything deeper.
+        """
+        return self.storage.walk(container_name, prefix)
+    
+    @staticmethod
+    def normalize_folder_path(folder_name):
+        """Clean up a (possibly nested) folder path; returns None if it is invalid"""
+        parts = [part.strip() for part in folder_name.replace('\\', '/').split('/')]
+        parts = [part for part in parts if part]
+        if not parts or any(part in ('.', '..') for part in parts):
+            return None
+        return '/'.join(parts)
+    
+    def refresh_catalog(self):
+        """Force a full refresh of the local catalog from storage"""
+        if self.catalog is None:
+            return False, "Catalog is disabled"
+        try:
+            # Containers written to while storage is being listed are left for the next refresh
+            generations = self.catalog.generations()
+            listing = self.storage.list_all()
+            listing.pop(Config.CONTENT_CONTAINER, None)
+            self.catalog.replace_all(listing, generations)
+            return True, f"Catalog refreshed with {len(listing)} containers"
+        except Exception as e:
+            return False, f"Error refreshing catalog: {str(e)}"
+    
+    @staticmethod
+    def _new_stats():
+        return DashboardStats(
+            recent_size=Config.DASHBOARD_RECENT_UPLOADS,
+            top_k=Config.DASHBOARD_TOP_FOLDERS
         )
     
+    def recount_stats(self):
+        """Rebuild the in-memory dashboard aggregates from a full listing"""
+        self.stats.rebuild(self.list_all_files())
+    
+    def get_dashboard_stats(self, username):
+        """Return dashboard totals for a user without scanning storage"""
+        container_name = self._get_container_name(username)
+        if self._catalog_ready():
+            return self.catalog.dashboard_totals(
+                container_name, Config.DASHBOARD_RECENT_UPLOADS, Config.DASHBOARD_TOP_FOLDERS
+            )
+        if self.stats is None:
+            # The catalog couldn't be filled; count this once from storage
+            stats = self._new_stats()
+            stats.rebuild(self.list_all_files())
+            return stats.snapshot(container_name)
+        if not self.stats.initialized:
+            self.recount_stats()
+        return self.stats.snapshot(container_name)
+    
+    def _known_size(self, container_name, blob_name):
+        """Size of an existing blob, from the catalog when possible"""
+        if self.catalog is not None:
+            blob = self.catalog.get_blob(container_name, blob_name)
+            return blob['size'] if blob else None
+        try:
+            return self.storage.get_properties(container_name, blob_name)['size']
+        except ResourceNotFoundError:
+            return None
+    
+    def _record_upload(self, container_name, blob_name, previous_size=None, sha256=None):
+        """Mirror a freshly written blob into the catalog and dashboard stats"""
+        try:
+            props = self.storage.get_properties(container_name, blob_name)
+            if self.catalog is not None:
+                self.catalog.upsert_blob(container_name, blob_name, props['size'], props['created'], sha256)
+            if self.stats is not None:
+                self.stats.record_upload(
+                    container_name, blob_name, props['size'], props['created'],
+                    previous_size=previous_size
+                )
+        except Exception as e:
+            print(f"Error updating catalog: {str(e)}")
+    
+    def _record_delete(self, container_name, blob_name, size):
+        """Remove a deleted blob from the catalog and dashboard stats"""
+        if self.catalog is not None:
+            self.catalog.remove_blob(container_name, blob_name)
+        if self.stats is not None and size is not None:
+            self.stats.record_delete(container_name, blob_name, size)
+    
     def _get_container_name(self, username):
         """Sanitize username to valid container name"""
         container_name = username.lower()
@@ -18,7 +170,11 @@ class BlobManager:
         """Create a container for a new user"""
         try:
             container_name = self._get_container_name(username)
-            self.blob_service_client.create_container(container_name)
+            if container_name == Config.CONTENT_CONTAINER:
+                return False, "Container name is reserved"
+            self.storage.create_container(container_name)
+            if self.catalog is not None:
+                self.catalog.add_container(container_name)
             return True, f"Container created for {username}"
         except ResourceExistsError:
             return False, "Container already exists"
@@ -26,80 +182,265 @@ class BlobManager:
             return False, f"Error creating container: {str(e)}"
     
     def create_folder(self, username, folder_name):
-        """Create a virtual folder by uploading a placeholder blob"""
+        """Create a virtual folder by uploading a placeholder blob
+
+        folder_name may be nested ("Physics/Mechanics"); parent folders
+        exist implicitly through the placeholder's path.
+        """
         try:
+            folder_name = self.normalize_folder_path(folder_name)
+            if folder_name is None:
+                return False, "Invalid folder name"
             container_name = self._get_container_name(username)
             # Create a placeholder file to represent the folder
-            blob_client = self.blob_service_client.get_blob_client(
-                container=container_name,
-                blob=f"{folder_name}/.placeholder"
-            )
-            blob_client.upload_blob(b"", overwrite=True)
+            blob_name = f"{folder_name}/.placeholder"
+            previous_size = self._known_size(container_name, blob_name)
+            self.storage.put_blob(container_name, blob_name, b"")
+            self._record_upload(container_name, blob_name, previous_size)
             return True, f"Folder '{folder_name}' created"
         except Exception as e:
             return False, f"Error creating folder: {str(e)}"
 
-    def list_user_folders(self, username):
-        """List all folders (unique prefixes) in a user's container"""
+    def list_users(self):
+        """List all users (one container per user)"""
+        try:
+            if self._catalog_ready():
+                return self.catalog.list_containers()
+            return [
+                container for container in self.storage.list_containers()
+                if container != Config.CONTENT_CONTAINER
+            ]
+        except Exception as e:
+            print(f"Error listing users: {str(e)}")
+            return []
+
+    def get_listing_version(self, username=None):
+        """Opaque version of the listings for one user (or of the user list)
+
+        Changes whenever the catalog behind those listings does. Returns
+        None when listings aren't served from the catalog, since there is
+        then no cheap way to tell whether they changed.
+        """
+        try:
+            if not self._catalog_ready():
+                return None
+            if username is not None:
+                generation = self.catalog.container_generation(self._get_container_name(username))
+                if generation is not None:
+                    return f"c{generation}"
+            # Unknown containers appear with a catalog-wide change
+            return f"g{self.catalog.generation()}"
+        except Exception as e:
+            print(f"Error reading listing version: {str(e)}")
+            return None
+
+    def list_user_folders(self, username, parent=None):
+        """List the folders directly under parent (top level by default) as full paths"""
         try:
             container_name = self._get_container_name(username)
-            container_client = self.blob_service_client.get_container_client(container_name)
-            
-            blobs = container_client.list_blobs()
-            folders = set()
+            if self._catalog_ready():
+                return self.catalog.list_folders(container_name, parent)
             
-            for blob in blobs:
-                # Extract folder name (everything before first /)
-                if '/' in blob.name:
-                    folder = blob.name.split('/')[0]
-                    folders.add(folder)
-            
-            return sorted(list(folders))
+            # Delimiter listing returns one prefix per folder instead of every blob
+            folders, _ = self._walk_from_storage(container_name, f"{parent}/" if parent else None)
+            return sorted(folders)
         except Exception as e:
             print(f"Error listing folders: {str(e)}")
             return []
 
-    def list_files_in_folder(self, username, folder_name):
-        """List files in a specific folder"""
+    @staticmethod
+    def _iter_chunks(file, chunk_size):
+        """Yield byte chunks from a file-like object or an iterable of chunks"""
+        if hasattr(file, 'read'):
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            yield from file
+
+    def _list_page(self, container_name, prefix, page_size, cursor=None, skip_placeholders=False):
+        """Fetch one page of blobs under prefix; returns (blobs, next_cursor)
+
+        Cursors are opaque strings: "c:<name>" continues a catalog listing
+        after that blob name, "s:<token>" continues a storage listing from
+        the backend's continuation token.
+        """
+        kind, _, value = (cursor or '').partition(':')
+        
+        if self._catalog_ready() and kind in ('', 'c'):
+            folder = prefix[:-1] if prefix else None
+            after = base64.urlsafe_b64decode(value).decode('utf-8') if value else None
+            # Ask for one extra row to know whether another page exists
+            blobs = self.catalog.list_blobs_page(
+                container_name, folder=folder, after=after, limit=page_size + 1,
+                skip_placeholders=skip_placeholders
+            )
+            next_cursor = None
+            if len(blobs) > page_size:
+                blobs = blobs[:page_size]
+                next_cursor = 'c:' + base64.urlsafe_b64encode(blobs[-1]['name'].encode('utf-8')).decode('ascii')
+            return blobs, next_cursor
+        
+        # A folder page lists only the folder's own files, not its sub-folders
+        blobs, token = self.storage.list_page(
+            container_name, prefix, page_size,
+            token=value if kind == 's' and value else None,
+            delimiter=bool(prefix)
+        )
+        if skip_placeholders:
+            blobs = [blob for blob in blobs if not blob['name'].endswith('.placeholder')]
+        next_cursor = f"s:{token}" if token else None
+        return blobs, next_cursor
+
+    def list_files_in_folder_page(self, username, folder_name, page_size, cursor=None):
+        """List one page of files in a folder; returns (files, next_cursor)"""
         try:
             container_name = self._get_container_name(username)
-            container_client = self.blob_service_client.get_container_client(container_name)
-            
             prefix = f"{folder_name}/"
-            blobs = container_client.list_blobs(name_starts_with=prefix)
-            files = []
+            blobs, next_cursor = self._list_page(
+                container_name, prefix, page_size, cursor, skip_placeholders=True
+            )
             
-            for blob in blobs:
-                if blob.name.endswith('.placeholder'):
-                    continue  # Skip placeholder files
-                
-                files.append({
-                    'name': blob.name.replace(prefix, ''),  # Remove folder prefix
-                    'full_path': blob.name,
-                    'size': blob.size,
-                    'created': blob.creation_time,
-                    'container': container_name,
-                    'folder': folder_name
-                })
+            files = [{
+                'name': blob['name'].replace(prefix, ''),  # Remove folder prefix
+                'full_path': blob['name'],
+                'size': blob['size'],
+                'created': blob['created'],
+                'container': container_name,
+                'folder': folder_name
+            } for blob in blobs]
             
-            return files
+            return files, next_cursor
         except Exception as e:
             print(f"Error listing files in folder: {str(e)}")
-            return []
+            return [], None
+
+    def _ensure_content_container(self):
+        if not self._content_container_ready:
+            try:
+                self.storage.create_container(Config.CONTENT_CONTAINER)
+            except ResourceExistsError:
+                pass
+            self._content_container_ready = True
+    
+    def _delete_content(self, object_names):
+        """Delete shared content objects that lost their last reference"""
+        if not object_names:
+            return
+        failures = self.storage.delete_blobs(Config.CONTENT_CONTAINER, object_names)
+        for name, reason in failures.items():
+            print(f"Error deleting content object {name}: {reason}")
+    
+    def _release_refs(self, container_name, names):
+        """Drop deduplication references for deleted blobs"""
+        if self.content_store is None or not names:
+            return
+        try:
+            self._delete_content(self.content_store.remove_refs(container_name, names))
+        except Exception as e:
+            print(f"Error releasing content references: {str(e)}")
+    
+    def _upload_deduplicated(self, container_name, blob_path, file, spool):
+        """Hash the upload as it streams into the content store, keeping one copy per sha256
+
+        The bytes are written to a fresh content object while being hashed. If
+        the hash turns out to be known, the write is abandoned before commit
+        and the folder entry references the existing object instead. The
+        existing object is looked up and referenced in one step; if it was
+        deleted meanwhile, the fresh object is committed after all.
+        """
+        self._ensure_content_container()
+        object_name = f"objects/{uuid.uuid4().hex}"
+        digest = hashlib.sha256()
+        uploader = self.storage.open_writer(
+            Config.CONTENT_CONTAINER, object_name, max_size=Config.MAX_FILE_SIZE, spool=spool
+        )
+        committed = False
+        try:
+            for chunk in self._iter_chunks(file, Config.UPLOAD_BLOCK_SIZE):
+                digest.update(chunk)
+                uploader.write(chunk)
+            sha256 = digest.hexdigest()
+            
+            existing = self.content_store.add_existing_ref(container_name, blob_path, sha256)
+            if existing is not None:
+                uploader.abort()
+                if spool is not None:
+                    spool.seek(0)
+                stored_name, released = existing
+            else:
+                uploader.commit()
+                committed = True
+                stored_name, released = self.content_store.add_ref(
+                    container_name, blob_path, sha256, uploader.size, object_name
+                )
+        except Exception:
+            if committed:
+                # Stored but never referenced
+                self._delete_content([object_name])
+            else:
+                uploader.abort()
+            raise
+        
+        try:
+            self.storage.put_reference(
+                container_name, blob_path, Config.CONTENT_CONTAINER, stored_name, uploader.size, sha256
+            )
+        except Exception:
+            self._delete_content(self.content_store.remove_ref(container_name, blob_path))
+            raise
+        finally:
+            # Another upload of the same content may have registered first
+            if committed and stored_name != object_name:
+                released.append(object_name)
+            self._delete_content(released)
+        return sha256, not committed
+    
+    def upload_file_to_folder(self, username, file, filename, folder_name, spool=None):
+        """Upload a file to a specific folder
 
-    def upload_file_to_folder(self, username, file, filename, folder_name):
-        """Upload a file to a specific folder"""
+        The data is read once in chunks and handed to the storage backend's
+        writer (concurrently staged blocks on Azure, a temp file renamed into
+        place on local disk). If `spool` is given, the same chunks are copied
+        into it so the caller can extract text without a second copy in memory.
+        
+        With deduplication on, content that is already stored is not stored
+        again; the folder entry just references it.
+        """
+        uploader = None
         try:
             container_name = self._get_container_name(username)
             blob_path = f"{folder_name}/{filename}"
-            blob_client = self.blob_service_client.get_blob_client(
-                container=container_name,
-                blob=blob_path
+            previous_size = self._known_size(container_name, blob_path)
+            
+            if self.content_store is not None:
+                sha256, duplicate = self._upload_deduplicated(container_name, blob_path, file, spool)
+                self._record_upload(container_name, blob_path, previous_size, sha256)
+                if duplicate:
+                    return True, "File uploaded successfully (identical content already stored)"
+                return True, "File uploaded successfully"
+            
+            uploader = self.storage.open_writer(
+                container_name, blob_path, max_size=Config.MAX_FILE_SIZE, spool=spool
             )
-            blob_client.upload_blob(file, overwrite=True)
+            # Hashed on the way through so re-indexing can find the cached text
+            digest = hashlib.sha256()
+            for chunk in self._iter_chunks(file, Config.UPLOAD_BLOCK_SIZE):
+                digest.update(chunk)
+                uploader.write(chunk)
+            uploader.commit()
+            self._record_upload(container_name, blob_path, previous_size, digest.hexdigest())
             
             return True, "File uploaded successfully"
+        except UploadTooLargeError as e:
+            if uploader is not None:
+                uploader.abort()
+            return False, str(e)
         except Exception as e:
+            if uploader is not None:
+                uploader.abort()
             return False, f"Error uploading file: {str(e)}"
 
     # def delete_file_from_folder(self, username, folder_name, filename):
@@ -123,11 +464,9 @@ class BlobManager:
         """Upload a file to user's container"""
         try:
             container_name = self._get_container_name(username)
-            blob_client = self.blob_service_client.get_blob_client(
-                container=container_name,
-                blob=filename
-            )
-            blob_client.upload_blob(file, overwrite=True)
+            previous_size = self._known_size(container_name, filename)
+            self.storage.put_blob(container_name, filename, file)
+            self._record_upload(container_name, filename, previous_size)
             
             return True, "File uploaded successfully"
         except Exception as e:
@@ -137,11 +476,10 @@ class BlobManager:
         """Delete a file from user's container"""
         try:
             container_name = self._get_container_name(username)
-            blob_client = self.blob_service_client.get_blob_client(
-                container=container_name,
-                blob=filename
-            )
-            blob_client.delete_blob()
+            size = self._known_size(container_name, filename)
+            self.storage.delete_blob(container_name, filename)
+            self._record_delete(container_name, filename, size)
+            self._release_refs(container_name, [filename])
             
             return True, "File deleted successfully"
         except ResourceNotFoundError:
@@ -153,16 +491,17 @@ class BlobManager:
         """List all files in a user's container"""
         try:
             container_name = self._get_container_name(username)
-            container_client = self.blob_service_client.get_container_client(container_name)
-            
-            blobs = container_client.list_blobs()
+            if self._catalog_ready():
+                blobs = self.catalog.list_container_blobs(container_name)
+            else:
+                blobs = self._list_blobs_from_storage(container_name)
             files = []
             
             for blob in blobs:
                 files.append({
-                    'name': blob.name,
-                    'size': blob.size,
-                    'created': blob.creation_time,
+                    'name': blob['name'],
+                    'size': blob['size'],
+                    'created': blob['created'],
                     'container': container_name
                 })
             
@@ -175,19 +514,23 @@ class BlobManager:
         """List all files from all containers"""
         try:
             all_files = []
-            containers = self.blob_service_client.list_containers()
+            if self._catalog_ready():
+                for blob in self.catalog.list_all_blobs():
+                    blob['owner'] = blob['container']
+                    all_files.append(blob)
+                return all_files
+            
+            listing = self.storage.list_all()
+            listing.pop(Config.CONTENT_CONTAINER, None)
             
-            for container in containers:
-                container_client = self.blob_service_client.get_container_client(container.name)
-                blobs = container_client.list_blobs()
-                
+            for container, blobs in listing.items():
                 for blob in blobs:
                     all_files.append({
-                        'name': blob.name,
-                        'size': blob.size,
-                        'created': blob.creation_time,
-                        'container': container.name,
-                        'owner': container.name
+                        'name': blob['name'],
+                        'size': blob['size'],
+                        'created': blob['created'],
+                        'container': container,
+                        'owner': container
                     })
             
             return all_files
@@ -198,11 +541,7 @@ class BlobManager:
     def get_download_url(self, container_name, filename):
         """Get download URL for a file"""
         try:
-            blob_client = self.blob_service_client.get_blob_client(
-                container=container_name,
-                blob=filename
-            )
-            return blob_client.url
+            return self.storage.url(container_name, filename)
         except Exception as e:
             print(f"Error getting download URL: {str(e)}")
             return None
@@ -210,29 +549,76 @@ class BlobManager:
     def download_file(self, container_name, filename):
         """Download file content"""
         try:
-            blob_client = self.blob_service_client.get_blob_client(
-                container=container_name,
-                blob=filename
-            )
-            return blob_client.download_blob().readall()
+            content = self.storage.get_properties(container_name, filename)['content']
+            if content is not None:
+                return self.storage.download(*content)
+            return self.storage.download(container_name, filename)
         except Exception as e:
             print(f"Error downloading file: {str(e)}")
             return None
 
+    def get_file_properties(self, container_name, filename):
+        """Get blob properties (size, etag, last_modified) without downloading content"""
+        try:
+            return self.storage.get_properties(container_name, filename)
+        except Exception as e:
+            print(f"Error getting file properties: {str(e)}")
+            return None
+
+    def stream_file(self, container_name, filename, offset=None, length=None, etag=None, content=None):
+        """Open a download and return an iterator over its chunks
+
+        Only one chunk (Config.DOWNLOAD_CHUNK_SIZE) is held in memory at a
+        time. Passing the etag from get_file_properties guarantees the bytes
+        come from the same version of the blob. For a deduplicated file pass
+        the content from get_file_properties; shared objects never change.
+        """
+        try:
+            if content is not None:
+                return self.storage.stream(*content, offset=offset, length=length)
+            return self.storage.stream(container_name, filename, offset=offset, length=length, etag=etag)
+        except Exception as e:
+            print(f"Error downloading file: {str(e)}")
+            return None
+
+    def content_sha256(self, container_name, filename):
+        """sha256 of a blob's bytes as recorded at upload, or None if it isn't known"""
+        if self.content_store is not None:
+            sha256 = self.content_store.get_ref(container_name, filename)
+            if sha256:
+                return sha256
+        if self.catalog is not None:
+            return self.catalog.get_sha256(container_name, filename)
+        return None
+
+    def blob_exists(self, container_name, filename):
+        """Whether the blob is (still) in storage"""
+        try:
+            self.storage.get_properties(container_name, filename)
+            return True
+        except ResourceNotFoundError:
+            return False
+
+    def get_local_path(self, container_name, filename):
+        """Path of the file on local disk when the backend can serve it directly, else None"""
+        try:
+            return self.storage.local_path(container_name, filename)
+        except ResourceNotFoundError:
+            return None
+
     def delete_file_from_folder(self, username, folder_name, filename):
         """Delete a file from a specific folder"""
         try:
             container_name = self._get_container_name(username)
             blob_path = f"{folder_name}/{filename}"
-            blob_client = self.blob_service_client.get_blob_client(
-                container=container_name,
-                blob=blob_path
-            )
-            blob_client.delete_blob()
+            size = self._known_size(container_name, blob_path)
+            self.storage.delete_blob(container_name, blob_path)
+            self._record_delete(container_name, blob_path, size)
+            self._release_refs(container_name, [blob_path])
             
             # Also delete from search index
-            from utils.search_manager import SearchManager
-            search_manager = SearchManager()
+            from utils.search_manager import get_search_manager
+            search_manager = get_search_manager()
             search_manager.delete_document_by_filepath(container_name, blob_path)
             
             return True, "File deleted successfully"
@@ -241,34 +627,77 @@ class BlobManager:
         except Exception as e:
             return False, f"Error deleting file: {str(e)}"
 
+    def _delete_blob_group(self, container_name, names, search_manager):
+        """Delete one batch of blobs and their index documents
+
+        Returns (deleted_names, failures) where failures maps name -> reason.
+        """
+        failures = self.storage.delete_blobs(container_name, names)
+        deleted = [name for name in names if name not in failures]
+        
+        if deleted:
+            index_failures = search_manager.delete_documents_by_filepaths(container_name, deleted)
+            for name, reason in index_failures.items():
+                failures[name] = f"removed from storage but not from search: {reason}"
+        
+        return deleted, failures
+
     def delete_folder(self, username, folder_name):
-        """Delete a folder and all its contents"""
+        """Delete a folder and all its contents
+
+        Blobs are removed with batch deletes and their index documents with
+        batched delete actions, several groups at a time.
+        """
         try:
             container_name = self._get_container_name(username)
-            container_client = self.blob_service_client.get_container_client(container_name)
             
             # List all blobs in the folder
             prefix = f"{folder_name}/"
-            blobs = container_client.list_blobs(name_starts_with=prefix)
+            blobs = self._list_blobs_from_storage(container_name, prefix)
+            sizes = {blob['name']: blob['size'] or 0 for blob in blobs}
+            names = list(sizes)
             
-            # Delete from search index first
-            from utils.search_manager import SearchManager
-            search_manager = SearchManager()
+            from utils.search_manager import get_search_manager
+            search_manager = get_search_manager()
             
-            deleted_count = 0
-            for blob in blobs:
-                # Delete from blob storage
-                blob_client = self.blob_service_client.get_blob_client(
-                    container=container_name,
-                    blob=blob.name
+            groups = [
+                names[i:i + Config.DELETE_BATCH_SIZE]
+                for i in range(0, len(names), Config.DELETE_BATCH_SIZE)
+            ]
+            deleted = []
+            failures = {}
+            with ThreadPoolExecutor(max_workers=Config.DELETE_MAX_CONCURRENCY) as executor:
+                futures = {
+                    executor.submit(self._delete_blob_group, container_name, group, search_manager): group
+                    for group in groups
+                }
+                for future in as_completed(futures):
+                    try:
+                        group_deleted, group_failures = future.result()
+                        deleted.extend(group_deleted)
+                        failures.update(group_failures)
+                    except Exception as e:
+                        for name in futures[future]:
+                            failures[name] = str(e)
+            
+            # Only blobs that are really gone leave the catalog and the stats
+            gone = deleted
+            if self.catalog is not None:
+                self.catalog.remove_blobs(container_name, gone)
+            self._release_refs(container_name, gone)
+            if self.stats is not None:
+                self.stats.record_prefix_delete(
+                    container_name, prefix, len(gone), sum(sizes[name] for name in gone)
+                )
+            
+            if failures:
+                failed = ', '.join(
+                    f"{name.replace(prefix, '', 1)} ({reason})"
+                    for name, reason in sorted(failures.items())[:5]
                 )
-                blob_client.delete_blob()
-                
-                # Delete from search index
-                search_manager.delete_document_by_filepath(container_name, blob.name)
-                
-                deleted_count += 1
+                more = f" and {len(failures) - 5} more" if len(failures) > 5 else ""
+                return False, f"Deleted {len(gone)} of {len(names)} files; failed: {failed}{more}"
             
-            return True, f"Folder deleted with {deleted_count} files"
+            return True, f"Folder deleted with {len(gone)} files"
         except Exception as e:
             return False, f"Error deleting folder: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,515 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class MetadataCatalog:
+    """Local SQLite mirror of blob listings so page views don't hit storage
+
+    Folders are kept in their own table (one row per folder at any depth),
+    so listing a folder's subfolders costs the number of folders, not files.
+
+    Every change advances a catalog-wide generation number and stamps it on
+    the containers it touched, so pages can tell cheaply whether a listing
+    has changed since they last rendered it.
+
+    Dashboard totals (files and bytes per container, files per top-level
+    folder) are kept in the same writes, so every worker process sharing
+    the database reads the same numbers.
+    """
+
+    SCHEMA_VERSION = "2"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+        self._reconciler = None
+        self._stop_event = threading.Event()
+
+    def _create_tables(self):
+        """Create catalog tables and indexes if they don't exist"""
+        with self._lock, self._conn:
+            has_totals = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'container_totals'"
+            ).fetchone() is not None
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS containers (
+                    name TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS blobs (
+                    container TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    folder TEXT,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    created REAL,
+                    sha256 TEXT,
+                    PRIMARY KEY (container, name)
+                );
+                CREATE INDEX IF NOT EXISTS idx_blobs_folder ON blobs (container, folder, name);
+                CREATE TABLE IF NOT EXISTS folders (
+                    container TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    parent TEXT NOT NULL,
+                    PRIMARY KEY (container, path)
+                );
+                CREATE INDEX IF NOT EXISTS idx_folders_parent ON folders (container, parent, path);
+                CREATE INDEX IF NOT EXISTS idx_blobs_created ON blobs (created);
+                CREATE INDEX IF NOT EXISTS idx_blobs_size ON blobs (size);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS container_totals (
+                    container TEXT PRIMARY KEY,
+                    files INTEGER NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS folder_totals (
+                    container TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    files INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (container, folder)
+                );
+            """)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(containers)")}
+            if 'generation' not in columns:
+                self._conn.execute("ALTER TABLE containers ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(blobs)")}
+            if 'sha256' not in columns:
+                self._conn.execute("ALTER TABLE blobs ADD COLUMN sha256 TEXT")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row is None or row['value'] != self.SCHEMA_VERSION:
+                # Older catalogs keyed blobs by top-level folder only; rebuild from storage
+                self._conn.execute("DELETE FROM blobs")
+                self._conn.execute("DELETE FROM folders")
+                self._conn.execute("DELETE FROM meta WHERE key = 'last_refresh'")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                    (self.SCHEMA_VERSION,)
+                )
+                has_totals = False
+            if not has_totals:
+                # Catalogs from before the totals were kept
+                self._recount_totals()
+
+    @staticmethod
+    def _folder_of(name):
+        """Return the folder directly containing a blob (e.g. "a/b" for "a/b/c.pdf"), or None"""
+        if '/' in name:
+            return name.rsplit('/', 1)[0]
+        return None
+
+    @staticmethod
+    def _ancestors(name):
+        """Yield (path, parent) for every folder above a blob, outermost first"""
+        parts = name.split('/')[:-1]
+        for depth in range(1, len(parts) + 1):
+            yield '/'.join(parts[:depth]), '/'.join(parts[:depth - 1])
+
+    def _add_folders(self, container, names):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO folders (container, path, parent) VALUES (?, ?, ?)",
+            {(container, path, parent) for name in names for path, parent in self._ancestors(name)}
+        )
+
+    def _prune_folders(self, container, names):
+        """Drop folders above removed blobs that no longer contain anything"""
+        paths = {path for name in names for path, _ in self._ancestors(name)}
+        # Deepest first, so a parent is checked after its emptied children
+        for path in sorted(paths, key=lambda p: p.count('/'), reverse=True):
+            # Range scan on the primary key: every name starting with "path/"
+            exists = self._conn.execute(
+                "SELECT 1 FROM blobs WHERE container = ? AND name >= ? AND name < ? LIMIT 1",
+                (container, path + '/', path + '0')
+            ).fetchone()
+            if exists is None:
+                self._conn.execute(
+                    "DELETE FROM folders WHERE container = ? AND path = ?", (container, path)
+                )
+
+    def _bump(self, containers):
+        """Advance the generation and stamp it on the changed containers (inside a write)"""
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', '1') "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        generation = int(self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()['value'])
+        self._conn.executemany(
+            "UPDATE containers SET generation = ? WHERE name = ?",
+            [(generation, container) for container in containers]
+        )
+
+    @staticmethod
+    def _top_folder(name):
+        """Top-level folder of a blob (what the dashboard groups by), or None"""
+        if '/' in name:
+            return name.split('/')[0]
+        return None
+
+    def _adjust_totals(self, container, blobs, sign):
+        """Add (sign=1) or subtract (sign=-1) (name, size) pairs from the totals (inside a write)"""
+        if not blobs:
+            return
+        self._conn.execute(
+            "INSERT INTO container_totals (container, files, bytes) VALUES (?, ?, ?) "
+            "ON CONFLICT (container) DO UPDATE SET "
+            "files = files + excluded.files, bytes = bytes + excluded.bytes",
+            (container, sign * len(blobs), sign * sum(size or 0 for _, size in blobs))
+        )
+        folders = {}
+        for name, _ in blobs:
+            folder = self._top_folder(name)
+            if folder:
+                folders[folder] = folders.get(folder, 0) + sign
+        self._conn.executemany(
+            "INSERT INTO folder_totals (container, folder, files) VALUES (?, ?, ?) "
+            "ON CONFLICT (container, folder) DO UPDATE SET files = files + excluded.files",
+            [(container, folder, files) for folder, files in folders.items()]
+        )
+        if sign < 0:
+            self._conn.execute("DELETE FROM folder_totals WHERE container = ? AND files <= 0", (container,))
+
+    def _recount_totals(self, containers=None):
+        """Recompute the totals of some containers (all by default) from the blobs table (inside a write)"""
+        if containers is None:
+            self._conn.execute("DELETE FROM container_totals")
+            self._conn.execute("DELETE FROM folder_totals")
+            scopes = [("1", ())]
+        else:
+            self._conn.executemany("DELETE FROM container_totals WHERE container = ?", [(c,) for c in containers])
+            self._conn.executemany("DELETE FROM folder_totals WHERE container = ?", [(c,) for c in containers])
+            scopes = [("container = ?", (container,)) for container in containers]
+        for scope, args in scopes:
+            self._conn.execute(
+                "INSERT INTO container_totals (container, files, bytes) "
+                f"SELECT container, COUNT(*), COALESCE(SUM(size), 0) FROM blobs WHERE {scope} GROUP BY container",
+                args
+            )
+            self._conn.execute(
+                "INSERT INTO folder_totals (container, folder, files) "
+                "SELECT container, substr(name, 1, instr(name, '/') - 1) AS top, COUNT(*) FROM blobs "
+                f"WHERE {scope} AND instr(name, '/') > 0 GROUP BY container, top",
+                args
+            )
+
+    def _listing_changed(self, container, blobs):
+        """Whether a fresh listing differs from what the catalog holds for a container"""
+        rows = self._conn.execute(
+            "SELECT name, size, created FROM blobs WHERE container = ?", (container,)
+        ).fetchall()
+        current = {(row['name'], row['size'], row['created']) for row in rows}
+        return current != {(b['name'], b['size'] or 0, self._to_timestamp(b['created'])) for b in blobs}
+
+    @staticmethod
+    def _to_timestamp(value):
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.timestamp()
+        return float(value)
+
+    @staticmethod
+    def _from_timestamp(value):
+        if value is None:
+            return None
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+
+    def is_populated(self):
+        """Check whether the catalog has been filled from storage at least once"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'last_refresh'"
+            ).fetchone()
+            return row is not None
+
+    def last_refresh(self):
+        """Return the time of the last full refresh, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'last_refresh'"
+            ).fetchone()
+            return float(row['value']) if row else None
+
+    def generation(self):
+        """Catalog-wide generation; changes whenever anything in the catalog does"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+            return int(row['value']) if row else 0
+
+    def container_generation(self, container):
+        """Generation of the last change to one container, or None if it isn't known"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generation FROM containers WHERE name = ?", (container,)
+            ).fetchone()
+            return row['generation'] if row else None
+
+    # Write path
+
+    def add_container(self, container):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO containers (name) VALUES (?)", (container,)
+            )
+            if cursor.rowcount:
+                self._bump([container])
+
+    def upsert_blob(self, container, name, size, created, sha256=None):
+        """Record a written blob; sha256 is its content digest when the upload computed one"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO containers (name) VALUES (?)", (container,)
+            )
+            previous = self._conn.execute(
+                "SELECT size FROM blobs WHERE container = ? AND name = ?", (container, name)
+            ).fetchone()
+            if previous is not None:
+                self._adjust_totals(container, [(name, previous['size'])], -1)
+            self._conn.execute(
+                """INSERT INTO blobs (container, name, folder, size, created, sha256)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (container, name) DO UPDATE SET
+                       folder = excluded.folder,
+                       size = excluded.size,
+                       created = excluded.created,
+                       sha256 = excluded.sha256""",
+                (container, name, self._folder_of(name), size or 0, self._to_timestamp(created), sha256)
+            )
+            self._add_folders(container, [name])
+            self._adjust_totals(container, [(name, size)], 1)
+            self._bump([container])
+
+    def _existing(self, container, names):
+        """(name, size) of the given blobs that the catalog holds"""
+        rows = []
+        for name in names:
+            row = self._conn.execute(
+                "SELECT name, size FROM blobs WHERE container = ? AND name = ?", (container, name)
+            ).fetchone()
+            if row is not None:
+                rows.append((row['name'], row['size']))
+        return rows
+
+    def remove_blob(self, container, name):
+        with self._lock, self._conn:
+            self._adjust_totals(container, self._existing(container, [name]), -1)
+            self._conn.execute(
+                "DELETE FROM blobs WHERE container = ? AND name = ?", (container, name)
+            )
+            self._prune_folders(container, [name])
+            self._bump([container])
+
+    def remove_blobs(self, container, names):
+        with self._lock, self._conn:
+            self._adjust_totals(container, self._existing(container, names), -1)
+            self._conn.executemany(
+                "DELETE FROM blobs WHERE container = ? AND name = ?",
+                [(container, name) for name in names]
+            )
+            self._prune_folders(container, names)
+            self._bump([container])
+
+    def generations(self):
+        """{container: generation} for every known container, to pass to replace_all"""
+        with self._lock:
+            return {
+                row['name']: row['generation']
+                for row in self._conn.execute("SELECT name, generation FROM containers")
+            }
+
+    def replace_all(self, listing, generations=None):
+        """Bring the whole catalog in line with a fresh {container: [blobs]} listing
+
+        Listing storage takes a while and writes keep landing in the catalog
+        meanwhile. Pass generations() as it was before the listing started:
+        containers changed (or added) since then are left alone, since the
+        listing may predate those writes; the next reconcile covers them.
+        Containers whose rows already match the listing aren't rewritten.
+        """
+        with self._lock, self._conn:
+            current = {
+                row['name']: row['generation']
+                for row in self._conn.execute("SELECT name, generation FROM containers")
+            }
+            if generations is None:
+                generations = current
+            moved = {container for container, generation in current.items()
+                     if generations.get(container) != generation}
+            # Dropped from the catalog since the snapshot
+            moved.update(container for container in generations if container not in current)
+
+            changed = []
+            for container, blobs in listing.items():
+                if container in moved:
+                    continue
+                if container in current and not self._listing_changed(container, blobs):
+                    continue
+                # Listings carry no digest; keep the one recorded at upload if the blob is unchanged
+                digests = {
+                    (row['name'], row['size'], row['created']): row['sha256']
+                    for row in self._conn.execute(
+                        "SELECT name, size, created, sha256 FROM blobs "
+                        "WHERE container = ? AND sha256 IS NOT NULL",
+                        (container,)
+                    )
+                }
+                self._conn.execute("INSERT OR IGNORE INTO containers (name) VALUES (?)", (container,))
+                self._conn.execute("DELETE FROM blobs WHERE container = ?", (container,))
+                self._conn.execute("DELETE FROM folders WHERE container = ?", (container,))
+                rows = []
+                for b in blobs:
+                    size, created = b['size'] or 0, self._to_timestamp(b['created'])
+                    rows.append((container, b['name'], self._folder_of(b['name']), size, created,
+                                 digests.get((b['name'], size, created))))
+                self._conn.executemany(
+                    "INSERT INTO blobs (container, name, folder, size, created, sha256) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._add_folders(container, [b['name'] for b in blobs])
+                changed.append(container)
+            self._recount_totals(changed)
+
+            removed = [container for container in current if container not in listing and container not in moved]
+            for table, column in (("blobs", "container"), ("folders", "container"), ("containers", "name"),
+                                  ("container_totals", "container"), ("folder_totals", "container")):
+                self._conn.executemany(
+                    f"DELETE FROM {table} WHERE {column} = ?", [(container,) for container in removed]
+                )
+            if changed or removed:
+                self._bump(changed)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_refresh', ?)",
+                (str(time.time()),)
+            )
+
+    # Read path
+
+    def get_blob(self, container, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, size, created FROM blobs WHERE container = ? AND name = ?",
+                (container, name)
+            ).fetchone()
+            return self._row_to_blob(row) if row else None
+
+    def get_sha256(self, container, name):
+        """Content digest recorded when the blob was uploaded, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM blobs WHERE container = ? AND name = ?", (container, name)
+            ).fetchone()
+            return row['sha256'] if row else None
+
+    def dashboard_totals(self, container=None, recent_size=10, top_k=5):
+        """Dashboard numbers in the shape of DashboardStats.snapshot"""
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(files), 0) AS files, COALESCE(SUM(bytes), 0) AS bytes FROM container_totals"
+            ).fetchone()
+            user = self._conn.execute(
+                "SELECT files, bytes FROM container_totals WHERE container = ?", (container,)
+            ).fetchone()
+            recent = self._conn.execute(
+                "SELECT container, name, size, created FROM blobs WHERE created IS NOT NULL "
+                "ORDER BY created DESC LIMIT ?",
+                (recent_size,)
+            ).fetchall()
+            folders = self._conn.execute(
+                "SELECT folder, SUM(files) AS files FROM folder_totals GROUP BY folder "
+                "HAVING SUM(files) > 0 ORDER BY files DESC, folder LIMIT ?",
+                (top_k,)
+            ).fetchall()
+            return {
+                'total_files': total['files'],
+                'total_bytes': total['bytes'],
+                'user_files': user['files'] if user else 0,
+                'user_bytes': user['bytes'] if user else 0,
+                'recent_uploads': [
+                    dict(self._row_to_blob(row), container=row['container'], owner=row['container'])
+                    for row in recent
+                ],
+                'top_folders': [(row['folder'], row['files']) for row in folders]
+            }
+
+    def list_containers(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM containers ORDER BY name").fetchall()
+            return [row['name'] for row in rows]
+
+    def list_folders(self, container, parent=None):
+        """Full paths of the folders directly under parent (top level by default)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM folders WHERE container = ? AND parent = ? ORDER BY path",
+                (container, parent or '')
+            ).fetchall()
+            return [row['path'] for row in rows]
+
+    def list_blobs_page(self, container, folder=None, after=None, limit=50, skip_placeholders=False):
+        """Keyset-paginated listing ordered by name; returns up to `limit` blobs after `after`"""
+        where = ["container = ?"]
+        args = [container]
+        if folder is not None:
+            where.append("folder = ?")
+            args.append(folder)
+        if after is not None:
+            where.append("name > ?")
+            args.append(after)
+        if skip_placeholders:
+            where.append("name NOT LIKE '%/.placeholder'")
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT name, size, created FROM blobs WHERE {' AND '.join(where)} ORDER BY name LIMIT ?",
+                args
+            ).fetchall()
+            return [self._row_to_blob(row) for row in rows]
+
+    def list_container_blobs(self, container):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, size, created FROM blobs WHERE container = ? ORDER BY name",
+                (container,)
+            ).fetchall()
+            return [self._row_to_blob(row) for row in rows]
+
+    def list_all_blobs(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT container, name, size, created FROM blobs ORDER BY container, name"
+            ).fetchall()
+            return [dict(self._row_to_blob(row), container=row['container']) for row in rows]
+
+    def _row_to_blob(self, row):
+        return {
+            'name': row['name'],
+            'size': row['size'],
+            'created': self._from_timestamp(row['created'])
+        }
+
+    # Background reconciliation
+
+    def start_reconciler(self, refresh_fn, interval):
+        """Run refresh_fn every `interval` seconds on a daemon thread"""
+        if self._reconciler is not None or not interval:
+            return
+
+        def run():
+            while not self._stop_event.wait(interval):
+                try:
+                    refresh_fn()
+                except Exception as e:
+                    print(f"Error reconciling catalog: {str(e)}")
+
+        self._reconciler = threading.Thread(target=run, name="catalog-reconciler", daemon=True)
+        self._reconciler.start()
+
+    def stop_reconciler(self):
+        self._stop_event.set()
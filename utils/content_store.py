@@ -0,0 +1,178 @@
+import sqlite3
+import threading
+import time
+
+
+class ContentStore:
+    """Reference counts for deduplicated upload content, stored in SQLite
+
+    Each distinct PDF (by sha256) is stored once as an object in the shared
+    content container; every folder entry that holds it is a reference. An
+    object is deleted when its last reference goes away.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS objects (
+                sha256 TEXT PRIMARY KEY,
+                object_name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                indexed_container TEXT,
+                indexed_filepath TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                container TEXT NOT NULL,
+                name TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (container, name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_refs_sha256 ON refs (sha256);
+        """)
+
+    def _conn(self):
+        """One connection per thread; SQLite handles locking between processes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get_object(self, sha256):
+        """Return the stored object for a hash (object_name, size, ...) or None"""
+        row = self._conn().execute("SELECT * FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+        return dict(row) if row else None
+
+    def get_ref(self, container, name):
+        """Return the sha256 a folder entry points to, or None for a plain blob"""
+        row = self._conn().execute(
+            "SELECT sha256 FROM refs WHERE container = ? AND name = ?", (container, name)
+        ).fetchone()
+        return row['sha256'] if row else None
+
+    def _release(self, conn, container, names):
+        """Drop references inside a transaction; returns object names left unreferenced"""
+        released = []
+        for name in names:
+            row = conn.execute(
+                "SELECT sha256 FROM refs WHERE container = ? AND name = ?", (container, name)
+            ).fetchone()
+            if row is None:
+                continue
+            conn.execute("DELETE FROM refs WHERE container = ? AND name = ?", (container, name))
+            # The search document we could copy from is going away with the reference
+            conn.execute(
+                "UPDATE objects SET refcount = refcount - 1, "
+                "indexed_container = CASE WHEN indexed_container = ? AND indexed_filepath = ? "
+                "THEN NULL ELSE indexed_container END, "
+                "indexed_filepath = CASE WHEN indexed_container = ? AND indexed_filepath = ? "
+                "THEN NULL ELSE indexed_filepath END "
+                "WHERE sha256 = ?",
+                (container, name, container, name, row['sha256'])
+            )
+            orphan = conn.execute(
+                "SELECT object_name FROM objects WHERE sha256 = ? AND refcount <= 0", (row['sha256'],)
+            ).fetchone()
+            if orphan is not None:
+                conn.execute("DELETE FROM objects WHERE sha256 = ?", (row['sha256'],))
+                released.append(orphan['object_name'])
+        return released
+
+    def _add_ref(self, conn, container, name, sha256, size, object_name):
+        """add_ref inside a transaction"""
+        previous = conn.execute(
+            "SELECT sha256 FROM refs WHERE container = ? AND name = ?", (container, name)
+        ).fetchone()
+        released = []
+        if previous is not None and previous['sha256'] == sha256:
+            row = conn.execute("SELECT object_name FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+            return row['object_name'], released
+        if previous is not None:
+            released = self._release(conn, container, [name])
+
+        conn.execute(
+            "INSERT OR IGNORE INTO objects (sha256, object_name, size, created_at) VALUES (?, ?, ?, ?)",
+            (sha256, object_name, size, time.time())
+        )
+        conn.execute("UPDATE objects SET refcount = refcount + 1 WHERE sha256 = ?", (sha256,))
+        conn.execute(
+            "INSERT INTO refs (container, name, sha256) VALUES (?, ?, ?)", (container, name, sha256)
+        )
+        row = conn.execute("SELECT object_name FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+        return row['object_name'], released
+
+    def add_ref(self, container, name, sha256, size, object_name):
+        """Point a folder entry at content, registering object_name if the hash is new
+
+        Returns (object_name, released): the object the entry now references
+        (an existing one if another upload stored the same content first) and
+        objects that lost their last reference because the entry used to
+        point elsewhere.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = self._add_ref(conn, container, name, sha256, size, object_name)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def add_existing_ref(self, container, name, sha256):
+        """Point a folder entry at content that is already stored, if it is
+
+        Returns (object_name, released) like add_ref, or None when no object
+        has this hash. The lookup and the new reference share a transaction,
+        so the object can't lose its last reference and be deleted between
+        the two.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT object_name, size FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+            result = None
+            if row is not None:
+                result = self._add_ref(conn, container, name, sha256, row['size'], row['object_name'])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def remove_refs(self, container, names):
+        """Drop references for deleted folder entries; returns object names to delete"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            released = self._release(conn, container, names)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return released
+
+    def remove_ref(self, container, name):
+        return self.remove_refs(container, [name])
+
+    def indexed_source(self, sha256):
+        """(container, filepath) of a search document holding this content, or None"""
+        row = self._conn().execute(
+            "SELECT indexed_container, indexed_filepath FROM objects WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        if row is None or row['indexed_container'] is None:
+            return None
+        return row['indexed_container'], row['indexed_filepath']
+
+    def mark_indexed(self, sha256, container, filepath):
+        """Remember a search document other references can copy their text from"""
+        self._conn().execute(
+            "UPDATE objects SET indexed_container = ?, indexed_filepath = ? "
+            "WHERE sha256 = ? AND indexed_container IS NULL",
+            (container, filepath, sha256)
+        )
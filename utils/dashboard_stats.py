@@ -0,0 +1,130 @@
+import threading
+from collections import Counter, deque
+
+
+class DashboardStats:
+    """Running dashboard totals kept up to date by BlobManager writes"""
+
+    def __init__(self, recent_size=10, top_k=5):
+        self.recent_size = recent_size
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self._recounter = None
+        self._stop_event = threading.Event()
+        self._reset()
+        self.initialized = False
+
+    def _reset(self):
+        self.total_files = 0
+        self.total_bytes = 0
+        self.user_totals = {}  # container -> [file_count, bytes]
+        self.folder_counts = Counter()
+        self.recent = deque(maxlen=self.recent_size)
+
+    @staticmethod
+    def _folder_of(name):
+        if '/' in name:
+            return name.split('/')[0]
+        return None
+
+    def _add(self, container, name, size, sign):
+        self.total_files += sign
+        self.total_bytes += sign * size
+        totals = self.user_totals.setdefault(container, [0, 0])
+        totals[0] += sign
+        totals[1] += sign * size
+        folder = self._folder_of(name)
+        if folder:
+            self.folder_counts[folder] += sign
+            if self.folder_counts[folder] <= 0:
+                del self.folder_counts[folder]
+
+    def record_upload(self, container, name, size, created, previous_size=None):
+        """Account for a new (or overwritten) blob"""
+        with self._lock:
+            if previous_size is not None:
+                self._add(container, name, previous_size, -1)
+            self._add(container, name, size, 1)
+
+            self._drop_recent(lambda f: f['container'] == container and f['name'] == name)
+            if created is not None and (
+                len(self.recent) < self.recent_size or created >= self.recent[-1]['created']
+            ):
+                self.recent.appendleft({
+                    'name': name,
+                    'size': size,
+                    'created': created,
+                    'container': container,
+                    'owner': container
+                })
+
+    def record_delete(self, container, name, size):
+        """Account for a deleted blob"""
+        with self._lock:
+            self._add(container, name, size, -1)
+            self._drop_recent(lambda f: f['container'] == container and f['name'] == name)
+
+    def record_prefix_delete(self, container, prefix, file_count, total_bytes):
+        """Account for a deleted folder (every blob under prefix)"""
+        with self._lock:
+            self.total_files -= file_count
+            self.total_bytes -= total_bytes
+            totals = self.user_totals.setdefault(container, [0, 0])
+            totals[0] -= file_count
+            totals[1] -= total_bytes
+            folder = self._folder_of(prefix)
+            if folder:
+                self.folder_counts[folder] -= file_count
+                if self.folder_counts[folder] <= 0:
+                    del self.folder_counts[folder]
+            self._drop_recent(lambda f: f['container'] == container and f['name'].startswith(prefix))
+
+    def _drop_recent(self, predicate):
+        kept = [f for f in self.recent if not predicate(f)]
+        if len(kept) != len(self.recent):
+            self.recent = deque(kept, maxlen=self.recent_size)
+
+    def rebuild(self, all_files):
+        """Full recount from a listing of every blob (corrects drift)"""
+        recent = sorted(
+            (f for f in all_files if f['created'] is not None),
+            key=lambda x: x['created'],
+            reverse=True
+        )[:self.recent_size]
+        with self._lock:
+            self._reset()
+            for f in all_files:
+                self._add(f['container'], f['name'], f['size'] or 0, 1)
+            self.recent.extend(dict(f, owner=f['container']) for f in recent)
+            self.initialized = True
+
+    def snapshot(self, container=None):
+        """Return the current dashboard numbers without touching storage"""
+        with self._lock:
+            user_files, user_bytes = self.user_totals.get(container, [0, 0])
+            return {
+                'total_files': self.total_files,
+                'total_bytes': self.total_bytes,
+                'user_files': user_files,
+                'user_bytes': user_bytes,
+                'recent_uploads': list(self.recent),
+                'top_folders': self.folder_counts.most_common(self.top_k)
+            }
+
+    def start_recounter(self, recount_fn, interval):
+        """Run recount_fn every `interval` seconds on a daemon thread"""
+        if self._recounter is not None or not interval:
+            return
+
+        def run():
+            while not self._stop_event.wait(interval):
+                try:
+                    recount_fn()
+                except Exception as e:
+                    print(f"Error recounting dashboard stats: {str(e)}")
+
+        self._recounter = threading.Thread(target=run, name="dashboard-recounter", daemon=True)
+        self._recounter.start()
+
+    def stop_recounter(self):
+        self._stop_event.set()
@@ -0,0 +1,35 @@
+import os
+import threading
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """One pooled requests.Session per process (recreated after fork)"""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            # The Azure SDK retries on its own, so urllib3 must not
+            adapter = HTTPAdapter(
+                pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=Config.HTTP_POOL_SIZE,
+                max_retries=Retry(total=False, redirect=False, raise_on_status=False)
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def make_transport():
+    """Azure SDK transport that reuses the shared connection pool"""
+    return RequestsTransport(session=get_http_session(), session_owner=False)
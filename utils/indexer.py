@@ -0,0 +1,77 @@
+import os
+import threading
+from config import Config
+from utils.blob_manager import get_blob_manager
+from utils.job_queue import IndexJobQueue, PermanentJobError
+from utils.pdf_extractor import extract_page_texts, get_cached_pages
+from utils.search_manager import get_search_manager
+
+_index_queue = None
+_index_queue_pid = None
+_index_queue_lock = threading.Lock()
+
+
+def get_index_queue():
+    """Process-wide index queue with its worker threads started"""
+    global _index_queue, _index_queue_pid
+    with _index_queue_lock:
+        if _index_queue is None or _index_queue_pid != os.getpid():
+            _index_queue = IndexJobQueue(
+                Config.JOBS_DB_PATH,
+                Config.JOB_SPOOL_DIR,
+                max_attempts=Config.INDEX_MAX_ATTEMPTS,
+                base_delay=Config.INDEX_RETRY_BASE_DELAY,
+                max_delay=Config.INDEX_RETRY_MAX_DELAY,
+                lease_timeout=Config.INDEX_JOB_LEASE_TIMEOUT
+            )
+            _index_queue.start(process_index_job, Config.INDEX_WORKERS)
+            _index_queue_pid = os.getpid()
+        return _index_queue
+
+
+def process_index_job(job):
+    """Extract text for a queued blob and push it to the search index"""
+    blob_manager = get_blob_manager()
+    search_manager = get_search_manager()
+    content_store = blob_manager.content_store
+
+    # Deduplicated content that is already indexed elsewhere: copy its pages, skip extraction
+    sha256 = content_store.get_ref(job['container'], job['filepath']) if content_store else None
+    source = content_store.indexed_source(sha256) if sha256 else None
+    pages = None
+    if source is not None and source != (job['container'], job['filepath']):
+        pages = search_manager.get_document_pages(*source)
+
+    # Text extracted earlier for the same bytes (re-uploads, re-indexing)
+    if not pages and sha256:
+        pages = get_cached_pages(sha256)
+
+    if not pages:
+        # Prefer the copy the upload left on local disk; fall back to storage
+        if job['spool_path'] and os.path.exists(job['spool_path']):
+            pages = extract_page_texts(job['spool_path'], sha256)
+        else:
+            file_data = blob_manager.download_file(job['container'], job['filepath'])
+            if file_data is None:
+                return False, "Could not download blob from storage"
+            pages = extract_page_texts(file_data, sha256)
+
+    if not any(page.strip() for page in pages):
+        raise PermanentJobError("No text could be extracted from the PDF")
+
+    success, message = search_manager.index_document(
+        filename=job['filename'],
+        content=pages,
+        owner=job['owner'],
+        folder=job['folder'],
+        container=job['container'],
+        filepath=job['filepath']
+    )
+    # A delete that ran during extraction has already cleared the index and
+    # dropped the job; without this the file would stay searchable for good
+    if success and not blob_manager.blob_exists(job['container'], job['filepath']):
+        search_manager.delete_document_by_filepath(job['container'], job['filepath'])
+        raise PermanentJobError("File was deleted while it was being indexed")
+    if success and sha256:
+        content_store.mark_indexed(sha256, job['container'], job['filepath'])
+    return success, message
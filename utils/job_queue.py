@@ -0,0 +1,344 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying cannot help"""
+
+
+class IndexJobQueue:
+    """Persistent "index this blob" queue stored in SQLite, drained by worker threads"""
+
+    STATUSES = ('pending', 'running', 'indexed', 'failed')
+
+    def __init__(self, db_path, spool_dir, max_attempts=5, base_delay=5, max_delay=600,
+                 lease_timeout=600, poll_interval=2):
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._workers = []
+        os.makedirs(spool_dir, exist_ok=True)
+        self._create_tables()
+
+    def _conn(self):
+        """One connection per thread; SQLite handles locking between processes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_tables(self):
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                container TEXT NOT NULL,
+                filepath TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                spool_path TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease TEXT,
+                next_run_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (container, filepath)
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, next_run_at);
+        """)
+        columns = {row['name'] for row in self._conn().execute("PRAGMA table_info(jobs)")}
+        if 'lease' not in columns:
+            # Token of the worker currently running the job; added after the first release
+            self._conn().execute("ALTER TABLE jobs ADD COLUMN lease TEXT")
+
+    def new_spool_path(self):
+        """Path where an upload can leave its bytes for the worker to pick up"""
+        return os.path.join(self.spool_dir, f"{uuid.uuid4().hex}.pdf")
+
+    def _remove_spool(self, spool_path):
+        if spool_path and os.path.exists(spool_path):
+            try:
+                os.remove(spool_path)
+            except OSError as e:
+                print(f"Error removing spool file: {str(e)}")
+
+    # Producer side
+
+    def enqueue(self, container, filepath, filename, owner, folder, spool_path=None):
+        """Queue (or re-queue) indexing for one blob"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute(
+                "SELECT spool_path FROM jobs WHERE container = ? AND filepath = ?",
+                (container, filepath)
+            ).fetchone()
+            conn.execute(
+                """INSERT INTO jobs (container, filepath, filename, owner, folder, spool_path,
+                                     status, attempts, next_run_at, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?, ?)
+                   ON CONFLICT (container, filepath) DO UPDATE SET
+                       filename = excluded.filename,
+                       owner = excluded.owner,
+                       folder = excluded.folder,
+                       spool_path = excluded.spool_path,
+                       status = 'pending',
+                       attempts = 0,
+                       lease = NULL,
+                       next_run_at = excluded.next_run_at,
+                       last_error = NULL,
+                       updated_at = excluded.updated_at""",
+                (container, filepath, filename, owner, folder, spool_path, now, now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if old is not None and old['spool_path'] != spool_path:
+            self._remove_spool(old['spool_path'])
+        self._wakeup.set()
+
+    def mark_indexed(self, jobs):
+        """Record blobs that were indexed without going through the queue
+
+        jobs are dicts with container, filepath, filename, owner and folder.
+        Any queued or failed job for the same blob is superseded.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = []
+            for job in jobs:
+                row = conn.execute(
+                    "SELECT spool_path FROM jobs WHERE container = ? AND filepath = ?",
+                    (job['container'], job['filepath'])
+                ).fetchone()
+                if row is not None:
+                    old.append(row['spool_path'])
+                conn.execute(
+                    """INSERT INTO jobs (container, filepath, filename, owner, folder, spool_path,
+                                         status, attempts, next_run_at, created_at, updated_at)
+                       VALUES (?, ?, ?, ?, ?, NULL, 'indexed', 0, ?, ?, ?)
+                       ON CONFLICT (container, filepath) DO UPDATE SET
+                           filename = excluded.filename,
+                           owner = excluded.owner,
+                           folder = excluded.folder,
+                           spool_path = NULL,
+                           status = 'indexed',
+                           attempts = 0,
+                           lease = NULL,
+                           next_run_at = excluded.next_run_at,
+                           last_error = NULL,
+                           updated_at = excluded.updated_at""",
+                    (job['container'], job['filepath'], job['filename'], job['owner'], job['folder'],
+                     now, now, now)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for spool_path in old:
+            self._remove_spool(spool_path)
+
+    def forget(self, container, filepath):
+        """Drop the job for a deleted blob"""
+        self.forget_prefix(container, filepath, exact=True)
+
+    def forget_prefix(self, container, prefix, exact=False):
+        """Drop jobs for every blob under a deleted folder"""
+        conn = self._conn()
+        if exact:
+            where, args = "container = ? AND filepath = ?", (container, prefix)
+        else:
+            where, args = "container = ? AND substr(filepath, 1, ?) = ?", (container, len(prefix), prefix)
+        rows = conn.execute(f"SELECT spool_path FROM jobs WHERE {where}", args).fetchall()
+        conn.execute(f"DELETE FROM jobs WHERE {where}", args)
+        for row in rows:
+            self._remove_spool(row['spool_path'])
+
+    # Status
+
+    def statuses_for_prefix(self, container, prefix):
+        """Map filepath -> status for every job under a folder"""
+        rows = self._conn().execute(
+            "SELECT filepath, status FROM jobs WHERE container = ? AND substr(filepath, 1, ?) = ?",
+            (container, len(prefix), prefix)
+        ).fetchall()
+        return {row['filepath']: row['status'] for row in rows}
+
+    def statuses_for(self, container, filepaths):
+        """Map filepath -> status for the given blobs (e.g. one listing page)"""
+        filepaths = list(filepaths)
+        if not filepaths:
+            return {}
+        placeholders = ", ".join("?" * len(filepaths))
+        rows = self._conn().execute(
+            f"SELECT filepath, status FROM jobs WHERE container = ? AND filepath IN ({placeholders})",
+            (container, *filepaths)
+        ).fetchall()
+        return {row['filepath']: row['status'] for row in rows}
+
+    def version(self, container):
+        """Opaque value that changes whenever a job in the container is added, updated or dropped"""
+        row = self._conn().execute(
+            "SELECT COUNT(*) AS n, MAX(updated_at) AS latest FROM jobs WHERE container = ?", (container,)
+        ).fetchone()
+        return f"{row['n']}-{row['latest'] or 0}"
+
+    def counts(self, container=None):
+        """Number of jobs in each status, optionally for one container"""
+        counts = dict.fromkeys(self.STATUSES, 0)
+        query = "SELECT status, COUNT(*) AS n FROM jobs"
+        args = ()
+        if container is not None:
+            query += " WHERE container = ?"
+            args = (container,)
+        for row in self._conn().execute(query + " GROUP BY status", args):
+            counts[row['status']] = row['n']
+        return counts
+
+    def list_jobs(self, status=None, limit=100, container=None):
+        """Return jobs (oldest first), optionally only one container's or those with a given status"""
+        query = ("SELECT id, container, filepath, status, attempts, next_run_at, last_error, "
+                 "created_at, updated_at FROM jobs")
+        where = []
+        args = ()
+        if container is not None:
+            where.append("container = ?")
+            args += (container,)
+        if status:
+            where.append("status = ?")
+            args += (status,)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY created_at LIMIT ?"
+        rows = self._conn().execute(query, args + (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def retry_failed(self):
+        """Put every failed job back in the queue; returns how many"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, lease = NULL, next_run_at = ?, updated_at = ? "
+            "WHERE status = 'failed'",
+            (now, now)
+        )
+        self._wakeup.set()
+        return cursor.rowcount
+
+    # Consumer side
+
+    def _claim(self):
+        """Atomically take the next ready job, reclaiming expired leases
+
+        The job gets a fresh lease token; only the worker holding it can
+        record the outcome, even if the job is re-queued or reclaimed and
+        claimed again while that worker is still busy.
+        """
+        now = time.time()
+        lease = uuid.uuid4().hex
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', lease = NULL WHERE status = 'running' AND updated_at < ?",
+                (now - self.lease_timeout,)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' AND next_run_at <= ? "
+                "ORDER BY next_run_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (lease, now, row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = dict(row)
+        job['attempts'] += 1
+        job['lease'] = lease
+        return job
+
+    def _finish(self, job, success, message, permanent=False):
+        now = time.time()
+        if success:
+            status, next_run_at = 'indexed', now
+        elif permanent or job['attempts'] >= self.max_attempts:
+            status, next_run_at = 'failed', now
+        else:
+            # Exponential backoff: base, 2*base, 4*base, ... capped at max_delay
+            status = 'pending'
+            next_run_at = now + min(self.max_delay, self.base_delay * 2 ** (job['attempts'] - 1))
+
+        # Only touch the row if this worker still holds the lease (not re-queued,
+        # reclaimed or deleted meanwhile)
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, next_run_at = ?, last_error = ?, updated_at = ?, lease = NULL, "
+            "spool_path = CASE WHEN ? = 'pending' THEN spool_path ELSE NULL END "
+            "WHERE id = ? AND status = 'running' AND lease = ?",
+            (status, next_run_at, None if success else message, now, status, job['id'], job['lease'])
+        )
+        if status != 'pending' and cursor.rowcount:
+            self._remove_spool(job['spool_path'])
+
+    def run_once(self, handler):
+        """Process one ready job; returns False if there was nothing to do"""
+        job = self._claim()
+        if job is None:
+            return False
+        try:
+            success, message = handler(job)
+            self._finish(job, success, message)
+        except PermanentJobError as e:
+            self._finish(job, False, str(e), permanent=True)
+        except Exception as e:
+            self._finish(job, False, f"{type(e).__name__}: {str(e)}")
+        return True
+
+    def start(self, handler, workers):
+        """Start `workers` daemon threads that drain the queue with handler(job)"""
+        if self._workers:
+            return
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    if self.run_once(handler):
+                        continue
+                except Exception as e:
+                    print(f"Error processing index job: {str(e)}")
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+        for i in range(workers):
+            worker = threading.Thread(target=run, name=f"index-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
@@ -0,0 +1,202 @@
+import re
+import sqlite3
+import threading
+from utils.search_backend import HIGHLIGHT_START, SearchBackend, mark_snippet
+
+FILTER_FIELDS = ('owner', 'folder', 'container')
+
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+_TERM_RE = re.compile(r'\w+\*?', re.UNICODE)
+
+
+def to_match_expression(query):
+    """Translate a simple user query into an FTS5 MATCH expression
+
+    Quoted text becomes a phrase query, a trailing * a prefix query, and
+    everything else is OR-ed together (like Azure's default "any" mode).
+    """
+    clauses = []
+    for phrase in _PHRASE_RE.findall(query):
+        words = _TERM_RE.findall(phrase.replace('*', ''))
+        if words:
+            clauses.append('"' + ' '.join(words) + '"')
+    for term in _TERM_RE.findall(_PHRASE_RE.sub(' ', query)):
+        if term.endswith('*'):
+            clauses.append(f'"{term[:-1]}"*')
+        else:
+            clauses.append(f'"{term}"')
+    return ' OR '.join(clauses)
+
+
+class LocalSearchManager(SearchBackend):
+    """Search backend on an on-disk SQLite FTS5 inverted index with BM25 ranking"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                filename TEXT NOT NULL,
+                owner TEXT,
+                folder TEXT,
+                container TEXT,
+                filepath TEXT,
+                page INTEGER NOT NULL DEFAULT 1,
+                chunk INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_docs_owner ON docs (owner);
+            CREATE INDEX IF NOT EXISTS idx_docs_folder ON docs (folder);
+            CREATE INDEX IF NOT EXISTS idx_docs_container ON docs (container, filepath);
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                filename, content, tokenize = 'porter unicode61'
+            );
+        """)
+        # Indexes created before chunking hold one row per file: treat it as chunk 0 of page 1
+        columns = {row['name'] for row in self._conn().execute("PRAGMA table_info(docs)")}
+        if 'page' not in columns:
+            self._conn().executescript("""
+                ALTER TABLE docs ADD COLUMN page INTEGER NOT NULL DEFAULT 1;
+                ALTER TABLE docs ADD COLUMN chunk INTEGER NOT NULL DEFAULT 0;
+            """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_document_chunks(self, container, filepath):
+        rows = self._conn().execute(
+            "SELECT d.page, f.content FROM docs d JOIN docs_fts f ON f.rowid = d.rowid "
+            "WHERE d.container = ? AND d.filepath = ? ORDER BY d.chunk",
+            (container, filepath)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _delete_files(self, conn, container, filepaths):
+        """Delete every chunk of the given files; the caller holds the write lock and transaction"""
+        for filepath in filepaths:
+            conn.execute(
+                "DELETE FROM docs_fts WHERE rowid IN "
+                "(SELECT rowid FROM docs WHERE container = ? AND filepath = ?)",
+                (container, filepath)
+            )
+            conn.execute("DELETE FROM docs WHERE container = ? AND filepath = ?", (container, filepath))
+
+    def _replace_chunks(self, files):
+        """Replace the chunks of every file in one transaction"""
+        try:
+            conn = self._conn()
+            with self._write_lock, conn:
+                for (container, filepath), chunks in files.items():
+                    self._delete_files(conn, container, [filepath])
+                    for chunk in chunks:
+                        cursor = conn.execute(
+                            "INSERT INTO docs (id, filename, owner, folder, container, filepath, page, chunk) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (chunk['id'], chunk['filename'], chunk['owner'], chunk['folder'],
+                             chunk['container'], chunk['filepath'], chunk['page'], chunk['chunk'])
+                        )
+                        conn.execute(
+                            "INSERT INTO docs_fts (rowid, filename, content) VALUES (?, ?, ?)",
+                            (cursor.lastrowid, chunk['filename'], chunk['content'])
+                        )
+            return {}
+        except Exception as e:
+            print(f"Error indexing documents: {str(e)}")
+            return {location: str(e) for location in files}
+
+    def _search_chunks(self, query, top, filters, skip):
+        """Search for chunks with highlighted snippets"""
+        where = []
+        args = []
+        for field, value in (filters or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Cannot filter on {field}")
+            where.append(f"d.{field} = ?")
+            args.append(value)
+
+        expression = to_match_expression(query)
+        if expression:
+            # bm25() is lower-is-better; filename matches weigh twice as much as content
+            sql = (
+                "SELECT d.filename, d.owner, d.folder, d.container, d.filepath, d.page, "
+                "-bm25(docs_fts, 2.0, 1.0) AS score, "
+                "snippet(docs_fts, 1, char(2), char(3), '...', 24) AS snippet "
+                "FROM docs_fts JOIN docs d ON d.rowid = docs_fts.rowid "
+                "WHERE docs_fts MATCH ?"
+            )
+            args.insert(0, expression)
+            order = " ORDER BY bm25(docs_fts, 2.0, 1.0)"
+        elif query.strip() == '*':
+            # Match everything, like Azure's search_text="*"
+            sql = (
+                "SELECT d.filename, d.owner, d.folder, d.container, d.filepath, d.page, "
+                "1.0 AS score, '' AS snippet FROM docs d WHERE 1"
+            )
+            order = " ORDER BY d.rowid"
+        else:
+            return []
+
+        if where:
+            sql += " AND " + " AND ".join(where)
+        sql += order + " LIMIT ? OFFSET ?"
+        args.extend((top, skip))
+
+        documents = []
+        for row in self._conn().execute(sql, args):
+            documents.append({
+                'filename': row['filename'],
+                'owner': row['owner'],
+                'folder': row['folder'],
+                'container': row['container'],
+                'filepath': row['filepath'],
+                'page': row['page'],
+                'score': row['score'],
+                'highlights': [mark_snippet(row['snippet'])] if HIGHLIGHT_START in (row['snippet'] or '') else []
+            })
+        return documents
+
+    def _delete_ids(self, doc_ids):
+        conn = self._conn()
+        with self._write_lock, conn:
+            for doc_id in doc_ids:
+                row = conn.execute("SELECT rowid FROM docs WHERE id = ?", (doc_id,)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (row['rowid'],))
+                    conn.execute("DELETE FROM docs WHERE rowid = ?", (row['rowid'],))
+
+    def _delete_document(self, doc_id):
+        """Delete a document from the index"""
+        try:
+            self._delete_ids([doc_id])
+            return True, "Document deleted from index"
+        except Exception as e:
+            return False, f"Error deleting document: {str(e)}"
+
+    def _delete_document_by_filepath(self, container, filepath):
+        """Delete every chunk of a file from the index"""
+        try:
+            conn = self._conn()
+            with self._write_lock, conn:
+                self._delete_files(conn, container, [filepath])
+            return True, "Document deleted from index"
+        except Exception as e:
+            return False, f"Error deleting document: {str(e)}"
+
+    def _delete_documents_by_filepaths(self, container, filepaths):
+        """Delete the chunks of many files in one transaction; returns {filepath: error}"""
+        try:
+            conn = self._conn()
+            with self._write_lock, conn:
+                self._delete_files(conn, container, filepaths)
+            return {}
+        except Exception as e:
+            print(f"Error deleting from search index: {str(e)}")
+            return {filepath: str(e) for filepath in filepaths}
@@ -0,0 +1,283 @@
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from config import Config
+from utils.storage_backend import StorageBackend
+from utils.upload_stream import UploadTooLargeError
+
+
+class LocalBlobWriter:
+    """Write an upload to a temporary file and rename it into place on commit
+
+    The temporary file lives on the same filesystem as the final path, so
+    readers only ever see the old blob or the complete new one.
+    """
+
+    def __init__(self, tmp_dir, final_path, max_size=None, spool=None):
+        self.final_path = final_path
+        self.max_size = max_size
+        self.spool = spool
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix="upload-")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise UploadTooLargeError(f"File exceeds the {self.max_size // (1024 * 1024)} MB limit")
+
+        if self.spool is not None:
+            self.spool.write(data)
+        self._file.write(data)
+
+    def commit(self, content_type="application/pdf"):
+        """Flush the data to disk and atomically replace the blob; returns its size"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        # A concurrent delete may prune the (empty) parent directory; retry
+        for attempt in range(3):
+            os.makedirs(os.path.dirname(self.final_path), exist_ok=True)
+            try:
+                os.replace(self.tmp_path, self.final_path)
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+        if self.spool is not None:
+            self.spool.seek(0)
+        return self.size
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalDiskStorage(StorageBackend):
+    """Storage backend on the local filesystem: one directory per container
+
+    Blob names map to paths below the container directory, so "a/b.pdf" is
+    stored as <root>/<container>/a/b.pdf. Uploads are staged under
+    <root>/.tmp and renamed into place.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._tmp_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def _container_dir(self, container):
+        if not container or '/' in container or '\\' in container or container.startswith('.'):
+            raise ResourceNotFoundError(f"Invalid container name: {container}")
+        return os.path.join(self.root, container)
+
+    def _existing_container_dir(self, container):
+        path = self._container_dir(container)
+        if not os.path.isdir(path):
+            raise ResourceNotFoundError(f"Container not found: {container}")
+        return path
+
+    @staticmethod
+    def _contained(container_dir, parts, name):
+        """Join path segments under a container directory, refusing anything that escapes it"""
+        if any(part in ('', '.', '..') or '\\' in part for part in parts):
+            raise ResourceNotFoundError(f"Invalid blob name: {name}")
+        path = os.path.join(container_dir, *parts)
+        if os.path.commonpath([os.path.abspath(path), container_dir]) != container_dir:
+            raise ResourceNotFoundError(f"Invalid blob name: {name}")
+        return path
+
+    def _path(self, container, name):
+        return self._contained(self._container_dir(container), name.split('/'), name)
+
+    def _prefix_dir(self, container_dir, prefix):
+        """Directory a listing prefix points into ("a/b/c" -> <container>/a/b)"""
+        return self._contained(container_dir, prefix.split('/')[:-1], prefix)
+
+    @staticmethod
+    def _etag(stat):
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    @staticmethod
+    def _to_dict(name, stat):
+        # Files are replaced on every write, so mtime is the blob's creation time
+        return {
+            'name': name,
+            'size': stat.st_size,
+            'created': datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+        }
+
+    def _prune_dirs(self, container, path):
+        """Remove directories left empty by a delete, up to the container"""
+        container_dir = self._container_dir(container)
+        directory = os.path.dirname(path)
+        while directory != container_dir and directory.startswith(container_dir):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    def list_containers(self):
+        return sorted(
+            entry.name for entry in os.scandir(self.root)
+            if entry.is_dir() and not entry.name.startswith('.')
+        )
+
+    def create_container(self, container):
+        try:
+            os.mkdir(self._container_dir(container))
+        except FileExistsError:
+            raise ResourceExistsError(f"Container already exists: {container}")
+
+    def list_blobs(self, container, prefix=None):
+        container_dir = self._existing_container_dir(container)
+        prefix = prefix or ''
+        # Only walk the directory the prefix points into
+        start = self._prefix_dir(container_dir, prefix)
+        for directory, dirs, files in os.walk(start):
+            dirs.sort()
+            relative = os.path.relpath(directory, container_dir)
+            base = '' if relative == '.' else relative.replace(os.sep, '/') + '/'
+            for filename in sorted(files):
+                name = base + filename
+                if name.startswith(prefix):
+                    try:
+                        yield self._to_dict(name, os.stat(os.path.join(directory, filename)))
+                    except FileNotFoundError:
+                        continue  # deleted while listing
+
+    def walk(self, container, prefix=None):
+        container_dir = self._existing_container_dir(container)
+        prefix = prefix or ''
+        directory = self._prefix_dir(container_dir, prefix)
+        folders = []
+        blobs = []
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except FileNotFoundError:
+            return folders, blobs
+        for entry in entries:
+            name = prefix + entry.name
+            if entry.is_dir():
+                folders.append(name)
+            else:
+                try:
+                    blobs.append(self._to_dict(name, entry.stat()))
+                except FileNotFoundError:
+                    continue
+        return folders, blobs
+
+    def list_page(self, container, prefix, page_size, token=None, delimiter=False):
+        if delimiter:
+            _, blobs = self.walk(container, prefix)
+        else:
+            blobs = sorted(self.list_blobs(container, prefix), key=lambda blob: blob['name'])
+        # The token is the last name returned, so pages stay stable under inserts
+        if token:
+            blobs = [blob for blob in blobs if blob['name'] > token]
+        if len(blobs) > page_size:
+            return blobs[:page_size], blobs[page_size - 1]['name']
+        return blobs, None
+
+    def get_properties(self, container, name):
+        try:
+            stat = os.stat(self._path(container, name))
+        except (FileNotFoundError, NotADirectoryError):
+            raise ResourceNotFoundError(f"Blob not found: {name}")
+        props = self._to_dict(name, stat)
+        props['etag'] = self._etag(stat)
+        props['last_modified'] = props['created']
+        props['content'] = None
+        return props
+
+    def put_blob(self, container, name, data):
+        writer = self.open_writer(container, name)
+        try:
+            if hasattr(data, 'read'):
+                for chunk in iter(lambda: data.read(Config.UPLOAD_BLOCK_SIZE), b''):
+                    writer.write(chunk)
+            else:
+                writer.write(data)
+            writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+
+    def put_reference(self, container, name, content_container, content_name, size, sha256):
+        # A hard link: the bytes exist once on disk and the entry reads like any file
+        self._existing_container_dir(container)
+        final_path = self._path(container, name)
+        tmp_path = os.path.join(self._tmp_dir, f"link-{uuid.uuid4().hex}")
+        os.link(self._path(content_container, content_name), tmp_path)
+        try:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def open_writer(self, container, name, max_size=None, spool=None):
+        self._existing_container_dir(container)
+        return LocalBlobWriter(self._tmp_dir, self._path(container, name), max_size=max_size, spool=spool)
+
+    def download(self, container, name):
+        try:
+            with open(self._path(container, name), "rb") as f:
+                return f.read()
+        except (FileNotFoundError, NotADirectoryError):
+            raise ResourceNotFoundError(f"Blob not found: {name}")
+
+    def stream(self, container, name, offset=None, length=None, etag=None):
+        try:
+            f = open(self._path(container, name), "rb")
+        except (FileNotFoundError, NotADirectoryError):
+            raise ResourceNotFoundError(f"Blob not found: {name}")
+        # The open handle keeps reading this version even if the blob is replaced
+        if etag and self._etag(os.fstat(f.fileno())) != etag:
+            f.close()
+            raise ResourceModifiedError(f"Blob changed: {name}")
+
+        def chunks():
+            with f:
+                if offset:
+                    f.seek(offset)
+                remaining = length
+                while remaining is None or remaining > 0:
+                    size = Config.DOWNLOAD_CHUNK_SIZE if remaining is None else min(Config.DOWNLOAD_CHUNK_SIZE, remaining)
+                    chunk = f.read(size)
+                    if not chunk:
+                        return
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+
+        return chunks()
+
+    def local_path(self, container, name):
+        path = self._path(container, name)
+        return path if os.path.isfile(path) else None
+
+    def delete_blob(self, container, name):
+        path = self._path(container, name)
+        try:
+            os.remove(path)
+        except (FileNotFoundError, NotADirectoryError):
+            raise ResourceNotFoundError(f"Blob not found: {name}")
+        self._prune_dirs(container, path)
+
+    def delete_blobs(self, container, names):
+        failures = {}
+        for name in names:
+            try:
+                self.delete_blob(container, name)
+            except ResourceNotFoundError:
+                pass  # already gone
+            except OSError as e:
+                failures[name] = str(e)
+        return failures
@@ -0,0 +1,208 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus' default latency buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative histogram with labels, rendered as _bucket, _sum and _count"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in sorted(values.items()):
+            for bound, count in zip(self.buckets, state):
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {state[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}"
+
+
+class MetricsRegistry:
+    """The process's metrics, rendered in the Prometheus text format
+
+    Metrics are per process: under a multi-worker server each worker
+    reports its own, and Prometheus aggregates across scrape targets.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, caches=None):
+        """Prometheus exposition text; caches maps a cache name to its stats() dict"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        # Caches keep their own counters; report them as of now
+        if caches:
+            for field, kind, help_text in (
+                ('hits', 'counter', 'Cache lookups that found an entry'),
+                ('misses', 'counter', 'Cache lookups that found nothing'),
+                ('bytes', 'gauge', 'Bytes currently held by the cache'),
+            ):
+                name = f"cloudfolio_cache_{field}_total" if kind == 'counter' else f"cloudfolio_cache_{field}"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for cache, stats in sorted(caches.items()):
+                    lines.append(f'{name}{{cache="{_escape(cache)}"}} {stats.get(field, 0)}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "cloudfolio_http_request_duration_seconds", "Time spent handling a request",
+    ("route", "method", "status")
+)
+BACKEND_CALL_SECONDS = registry.histogram(
+    "cloudfolio_backend_call_duration_seconds", "Latency of storage and search backend calls",
+    ("backend", "operation")
+)
+BACKEND_CALL_ERRORS = registry.counter(
+    "cloudfolio_backend_call_errors_total", "Storage and search backend calls that failed",
+    ("backend", "operation")
+)
+BACKEND_BYTES = registry.counter(
+    "cloudfolio_backend_bytes_total", "Bytes sent to or read from storage and search backends",
+    ("backend", "operation")
+)
+PDF_EXTRACT_SECONDS = registry.histogram(
+    "cloudfolio_pdf_extract_duration_seconds", "Time spent extracting text from a PDF"
+)
+PDF_PAGES = registry.histogram(
+    "cloudfolio_pdf_pages", "Pages extracted per PDF", buckets=PAGE_BUCKETS
+)
+PDF_EXTRACT_ERRORS = registry.counter(
+    "cloudfolio_pdf_extract_errors_total", "PDFs whose text could not be extracted"
+)
+
+
+# Backend calls made while handling the current request, for the slow-request log
+_trace = threading.local()
+
+
+def start_trace():
+    _trace.calls = []
+
+
+def end_trace():
+    """Stop tracing this thread's request; returns its calls as (backend, operation, seconds, error)"""
+    calls = getattr(_trace, 'calls', None)
+    _trace.calls = None
+    return calls or []
+
+
+class BackendCall:
+    """One timed backend call; set bytes or call fail() from inside the with block"""
+
+    def __init__(self, backend, operation):
+        self.backend = backend
+        self.operation = operation
+        self.bytes = 0
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+
+def record_call(backend, operation, seconds, failed=False, nbytes=0):
+    BACKEND_CALL_SECONDS.observe(seconds, backend=backend, operation=operation)
+    if failed:
+        BACKEND_CALL_ERRORS.inc(backend=backend, operation=operation)
+    if nbytes:
+        BACKEND_BYTES.inc(nbytes, backend=backend, operation=operation)
+    calls = getattr(_trace, 'calls', None)
+    if calls is not None:
+        calls.append((backend, operation, seconds, failed))
+
+
+@contextmanager
+def backend_call(backend, operation):
+    """Time a backend call; an exception counts as an error and is re-raised"""
+    call = BackendCall(backend, operation)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.failed = True
+        raise
+    finally:
+        record_call(backend, operation, time.perf_counter() - started, call.failed, call.bytes)
@@ -1,17 +1,247 @@
 import PyPDF2
 import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from config import Config
+from utils import metrics
+from utils.text_cache import get_text_cache, hash_source
 
-def extract_text_from_pdf(file_bytes):
-    """Extract text from PDF file bytes"""
+
+class ExtractionLimitError(Exception):
+    """Raised when a PDF exceeds the configured size limits"""
+
+
+class ExtractionUnavailableError(Exception):
+    """Raised when extraction didn't finish (time limit, worker pool failure); retrying may succeed"""
+
+
+_pool = None
+_pool_pid = None
+_pool_users = {}  # pool -> documents currently extracting on it
+_retired_pools = set()
+_pool_lock = threading.Lock()
+
+
+def _acquire_pool():
+    """Shared worker pool, recreated after a fork or a timeout; pair with _release_pool"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if _pool_pid != os.getpid():
+                # Pools inherited through a fork belong to the parent
+                _pool_users.clear()
+                _retired_pools.clear()
+            context = multiprocessing.get_context("spawn")
+            _pool = context.Pool(
+                processes=Config.PDF_EXTRACT_WORKERS,
+                maxtasksperchild=Config.PDF_EXTRACT_TASKS_PER_CHILD
+            )
+            _pool_pid = os.getpid()
+        _pool_users[_pool] = _pool_users.get(_pool, 0) + 1
+        return _pool
+
+
+def _release_pool(pool):
+    """Done with a pool; a retired pool is terminated once nobody uses it"""
+    with _pool_lock:
+        _pool_users[pool] -= 1
+        idle = _pool_users[pool] == 0
+        if idle:
+            del _pool_users[pool]
+        terminate = idle and pool in _retired_pools
+        if terminate:
+            _retired_pools.discard(pool)
+    if terminate:
+        pool.terminate()
+
+
+def _retire_pool(pool):
+    """Stop handing work to a pool with a worker stuck on a pathological PDF
+
+    Tasks can't be cancelled one by one, so new documents go to a fresh
+    pool while the ones already running here finish; the last of them to
+    release it terminates it, stuck worker included.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+        _retired_pools.add(pool)
+
+
+def _count_pages(path):
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def _extract_page_range(path, start, stop):
+    """Extract pages [start, stop) of the PDF at path (runs in a worker process)"""
+    reader = PyPDF2.PdfReader(path)
+    return [(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def _source_size(source):
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    position = source.tell()
+    source.seek(0, io.SEEK_END)
+    size = source.tell()
+    source.seek(position)
+    return size
+
+
+def _extract_inline(source):
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    reader = PyPDF2.PdfReader(source)
+    pages = reader.pages[:Config.PDF_MAX_PAGES]
+    return [(page.extract_text() or "") for page in pages]
+
+
+def _extract_parallel(path):
     try:
-        pdf_file = io.BytesIO(file_bytes)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        
-        return text.strip()
+        pool = _acquire_pool()
+    except Exception as e:
+        raise ExtractionUnavailableError(f"PDF worker pool unavailable: {str(e)}")
+    try:
+        return _extract_on_pool(pool, path)
+    finally:
+        _release_pool(pool)
+
+
+def _submit(pool, fn, args):
+    try:
+        return pool.apply_async(fn, args)
+    except Exception as e:
+        raise ExtractionUnavailableError(f"PDF worker pool unavailable: {str(e)}")
+
+
+def _extract_on_pool(pool, path):
+    deadline = time.monotonic() + Config.PDF_EXTRACT_TIMEOUT
+
+    def remaining():
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise multiprocessing.TimeoutError()
+        return left
+
+    try:
+        page_count = _submit(pool, _count_pages, (path,)).get(remaining())
+        if page_count > Config.PDF_MAX_PAGES:
+            print(f"PDF has {page_count} pages, extracting the first {Config.PDF_MAX_PAGES}")
+            page_count = Config.PDF_MAX_PAGES
+
+        step = Config.PDF_PAGES_PER_TASK
+        results = [
+            _submit(pool, _extract_page_range, (path, start, min(start + step, page_count)))
+            for start in range(0, page_count, step)
+        ]
+        pages = []
+        for result in results:
+            pages.extend(result.get(remaining()))
+        return pages
+    except multiprocessing.TimeoutError:
+        _retire_pool(pool)
+        raise ExtractionUnavailableError(f"PDF extraction took longer than {Config.PDF_EXTRACT_TIMEOUT}s")
+
+
+def extract_pages_from_pdf(source):
+    """Extract text per page from PDF bytes, a seekable file object or a file path
+
+    Page ranges are extracted in parallel in a process pool, within the
+    page, byte and wall-clock limits from Config.
+    """
+    started = time.perf_counter()
+    try:
+        pages = _extract_pages(source)
+    except Exception:
+        metrics.PDF_EXTRACT_ERRORS.inc()
+        raise
+    metrics.PDF_EXTRACT_SECONDS.observe(time.perf_counter() - started)
+    metrics.PDF_PAGES.observe(len(pages))
+    return pages
+
+
+def _extract_pages(source):
+    size = _source_size(source)
+    if size > Config.PDF_MAX_BYTES:
+        raise ExtractionLimitError(f"PDF is larger than {Config.PDF_MAX_BYTES} bytes")
+
+    if Config.PDF_EXTRACT_WORKERS <= 0:
+        return _extract_inline(source)
+
+    if isinstance(source, str):
+        return _extract_parallel(source)
+
+    # Workers open the PDF themselves, so give them a file instead of pickled bytes
+    if not isinstance(source, (bytes, bytearray)):
+        source.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        if isinstance(source, (bytes, bytearray)):
+            tmp.write(source)
+        else:
+            while True:
+                chunk = source.read(1024 * 1024)
+                if not chunk:
+                    break
+                tmp.write(chunk)
+    try:
+        return _extract_parallel(tmp.name)
+    finally:
+        os.remove(tmp.name)
+
+
+def extract_pages_cached(source, sha256=None):
+    """Like extract_pages_from_pdf, but served from the text cache when possible
+
+    sha256 is the digest of the PDF bytes; it is computed from source if
+    not given (hashing is far cheaper than parsing).
+    """
+    cache = get_text_cache()
+    if cache is None:
+        return extract_pages_from_pdf(source)
+    if sha256 is None:
+        sha256 = hash_source(source)
+    pages = cache.get(sha256)
+    if pages is None:
+        pages = extract_pages_from_pdf(source)
+        cache.put(sha256, pages)
+    return pages
+
+
+def get_cached_pages(sha256):
+    """Return cached page texts for a PDF digest without touching the PDF, or None"""
+    cache = get_text_cache()
+    return cache.get(sha256) if cache is not None else None
+
+
+def get_cached_text(sha256):
+    """Return cached text for a PDF digest without touching the PDF, or None"""
+    pages = get_cached_pages(sha256)
+    if pages is None:
+        return None
+    return "\n".join(pages).strip()
+
+
+def extract_page_texts(file_bytes, sha256=None):
+    """Text of each page of a PDF; an empty list if it can't be parsed
+
+    ExtractionUnavailableError is raised rather than swallowed: the PDF
+    may be fine, and the caller should try again later.
+    """
+    try:
+        return extract_pages_cached(file_bytes, sha256)
+    except ExtractionUnavailableError:
+        raise
     except Exception as e:
         print(f"Error extracting text from PDF: {str(e)}")
-        return ""
\ No newline at end of file
+        return []
+
+
+def extract_text_from_pdf(file_bytes, sha256=None):
+    """Extract text from PDF file bytes, a seekable file object or a file path"""
+    return "\n".join(extract_page_texts(file_bytes, sha256)).strip()
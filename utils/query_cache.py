@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _estimate_size(results):
+    """Rough memory footprint of a search result list, in bytes"""
+    size = 64
+    for doc in results:
+        size += 128
+        for value in doc.values():
+            if isinstance(value, str):
+                size += len(value)
+            elif isinstance(value, list):
+                size += sum(len(item) for item in value if isinstance(item, str))
+    return size
+
+
+class SharedGeneration:
+    """An invalidation counter in SQLite, seen by every process using the same file"""
+
+    def __init__(self, db_path, name="search"):
+        self.db_path = db_path
+        self.name = name
+        self._local = threading.local()
+
+    def _conn(self):
+        """One connection per thread, opened again after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_generations (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self):
+        row = self._conn().execute(
+            "SELECT value FROM cache_generations WHERE name = ?", (self.name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self):
+        self._conn().execute(
+            "INSERT INTO cache_generations (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (self.name,)
+        )
+
+
+class QueryCache:
+    """LRU + TTL cache for search results, bounded by entry count and bytes
+
+    Every index write bumps a generation counter; entries stored under an
+    older generation are treated as misses. With `generation_db` the counter
+    lives in that SQLite file, so a write in one worker process invalidates
+    the caches of all of them; otherwise it only covers this process.
+    """
+
+    def __init__(self, max_entries=512, ttl=60, max_bytes=16 * 1024 * 1024, generation_db=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, generation, size, results)
+        self._bytes = 0
+        self._shared = SharedGeneration(generation_db) if generation_db else None
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def generation(self):
+        """Current generation; results computed under an older one are stale"""
+        if self._shared is None or self.ttl <= 0:
+            return self._generation
+        try:
+            return self._shared.get()
+        except sqlite3.Error as e:
+            # Can't tell whether another process wrote; don't serve from the cache
+            print(f"Error reading search cache generation: {str(e)}")
+            return None
+
+    @staticmethod
+    def make_key(query, top, filters=None, skip=0):
+        """Normalize a query so equivalent searches share an entry"""
+        normalized = " ".join(query.lower().split())
+        return (normalized, top, skip, tuple(sorted((filters or {}).items())))
+
+    def get(self, key):
+        current = self.generation
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, generation, size, results = entry
+                if current is not None and generation == current and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return results
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, results, generation):
+        """Store results computed while `generation` was current"""
+        size = _estimate_size(results)
+        if self.ttl <= 0 or size > self.max_bytes or generation is None:
+            return
+        current = self.generation
+        with self._lock:
+            if generation != current:
+                return  # the index changed while the search ran
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, generation, size, results)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def invalidate(self):
+        """Bump the generation so every cached result is stale"""
+        if self._shared is not None and self.ttl > 0:
+            try:
+                self._shared.bump()
+            except sqlite3.Error as e:
+                print(f"Error bumping search cache generation: {str(e)}")
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        generation = self.generation
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'generation': generation,
+                'ttl': self.ttl
+            }
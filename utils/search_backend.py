@@ -0,0 +1,238 @@
+import base64
+from markupsafe import escape
+from config import Config
+from utils.metrics import backend_call
+from utils.query_cache import QueryCache
+
+# Shared by every backend instance in the process
+query_cache = QueryCache(
+    max_entries=Config.SEARCH_CACHE_ENTRIES,
+    ttl=Config.SEARCH_CACHE_TTL,
+    max_bytes=Config.SEARCH_CACHE_MAX_BYTES,
+    generation_db=Config.SEARCH_CACHE_DB_PATH
+)
+
+
+# Backends ask for matches delimited by these instead of HTML tags, since
+# snippets are raw PDF text; mark_snippet escapes the text, then adds <mark>
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+
+def mark_snippet(snippet):
+    """HTML for a snippet delimited with HIGHLIGHT_START/HIGHLIGHT_END: escaped text, matches in <mark>"""
+    return str(escape(snippet)).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
+
+def split_pages(content, max_chars):
+    """Split document text into (page_number, text) chunks
+
+    content is a list of page texts, or a string for a single page. Pages
+    longer than max_chars are cut into windows at whitespace, so joining a
+    page's windows gives its text back. Blank chunks are dropped.
+    """
+    pages = [content] if isinstance(content, str) else content
+    chunks = []
+    for number, text in enumerate(pages, start=1):
+        start = 0
+        while start < len(text):
+            end = start + max_chars
+            if end < len(text):
+                cut = max(text.rfind(' ', start, end), text.rfind('\n', start, end))
+                if cut > start:
+                    end = cut + 1
+            window = text[start:end]
+            if window.strip():
+                chunks.append((number, window))
+            start = end
+    return chunks
+
+
+class SearchBackend:
+    """Interface shared by the Azure AI Search and local search backends
+
+    Every file is indexed as chunks (a page, or a window of a long page)
+    carrying the file's filename, owner, folder, container and filepath
+    plus the page number and the chunk's ordinal within the file.
+
+    search_documents groups chunk hits back into one dict per file with
+    filename, owner, folder, container, filepath, score, highlights
+    (HTML-escaped snippets with <mark> tags, see mark_snippet) and pages, the best-matching pages, each a
+    dict with page, score and highlights. Index operations return
+    (success, message) like the rest of the app.
+
+    Subclasses implement the underscored methods; the public ones put the
+    query cache in front of searches and invalidate it on every write.
+    """
+
+    @staticmethod
+    def document_key(container, filepath):
+        """Stable document key for a blob (URL-safe base64 of container/filepath)"""
+        return base64.urlsafe_b64encode(f"{container}/{filepath}".encode("utf-8")).decode("ascii")
+
+    def chunk_document(self, filename, content, owner, folder, container, filepath):
+        """Split one file into the chunk documents that are sent to the index"""
+        key = self.document_key(container, filepath)
+        return [
+            {
+                'id': f"{key}-{ordinal}",
+                'filename': filename,
+                'content': text,
+                'owner': owner,
+                'folder': folder,
+                'container': container,
+                'filepath': filepath,
+                'page': page,
+                'chunk': ordinal
+            }
+            for ordinal, (page, text) in enumerate(split_pages(content, Config.INDEX_CHUNK_CHARS))
+        ]
+
+    def search_documents(self, query, top=10, filters=None, skip=0):
+        """Search documents; filters may restrict owner, folder and container
+
+        skip offsets into the ranked files so callers can page through them.
+        """
+        key = query_cache.make_key(query, top, filters, skip)
+        results = query_cache.get(key)
+        if results is not None:
+            return results
+
+        generation = query_cache.generation
+        try:
+            results = self._search_documents(query, top, filters, skip)
+        except Exception as e:
+            print(f"Search error: {str(e)}")
+            return []
+        query_cache.put(key, results, generation)
+        return results
+
+    def _search_documents(self, query, top, filters, skip):
+        """Rank files by their best chunk, keeping each file's best pages
+
+        Chunk hits come back best first, so the first skip + top distinct
+        files are exactly the top files; hits are fetched in batches until
+        there are that many (or SEARCH_MAX_CHUNKS have been scanned).
+        """
+        wanted = skip + top
+        batch = min(max(wanted * 4, 50), Config.SEARCH_MAX_CHUNKS)
+        files = {}
+        offset = 0
+        while offset < Config.SEARCH_MAX_CHUNKS:
+            with backend_call("search", "search"):
+                hits = self._search_chunks(query, batch, filters, offset)
+            for hit in hits:
+                result = files.get((hit['container'], hit['filepath']))
+                if result is None:
+                    if len(files) >= wanted:
+                        continue
+                    result = files[(hit['container'], hit['filepath'])] = {
+                        'filename': hit['filename'],
+                        'owner': hit['owner'],
+                        'folder': hit['folder'],
+                        'container': hit['container'],
+                        'filepath': hit['filepath'],
+                        'score': hit['score'],
+                        'highlights': [],
+                        'pages': []
+                    }
+                pages = result['pages']
+                if len(pages) < Config.SEARCH_PAGES_PER_RESULT and all(p['page'] != hit['page'] for p in pages):
+                    pages.append({'page': hit['page'], 'score': hit['score'], 'highlights': hit['highlights']})
+                    result['highlights'].extend(hit['highlights'])
+            offset += len(hits)
+            if len(hits) < batch or len(files) >= wanted:
+                break
+        return list(files.values())[skip:skip + top]
+
+    def get_document_pages(self, container, filepath):
+        """Return the indexed text of a blob as a list of page texts, or None if it isn't indexed"""
+        try:
+            with backend_call("search", "get_document"):
+                chunks = self._get_document_chunks(container, filepath)
+        except Exception as e:
+            print(f"Error reading document: {str(e)}")
+            return None
+        if not chunks:
+            return None
+        pages = [''] * max(chunk['page'] or 1 for chunk in chunks)
+        for chunk in chunks:
+            pages[(chunk['page'] or 1) - 1] += chunk['content']
+        return pages
+
+    def index_document(self, filename, content, owner, folder, container, filepath):
+        """Index one file from its page texts (re-indexing replaces all of its chunks)"""
+        chunks = self.chunk_document(filename, content, owner, folder, container, filepath)
+        failures = self._index_chunks({(container, filepath): chunks})
+        if failures:
+            return False, f"Error indexing document: {failures[(container, filepath)]}"
+        return True, f"Document indexed as {len(chunks)} chunks"
+
+    def index_documents(self, documents):
+        """Index a batch of files in one request
+
+        Each document is a dict with filename, content (page texts), owner,
+        folder, container and filepath. Returns {(container, filepath): error}
+        for the ones that failed.
+        """
+        files = {
+            (document['container'], document['filepath']): self.chunk_document(**document)
+            for document in documents
+        }
+        return self._index_chunks(files)
+
+    def _index_chunks(self, files):
+        with backend_call("search", "index") as call:
+            failures = self._replace_chunks(files)
+            call.bytes = sum(len(chunk['content'].encode('utf-8')) for chunks in files.values() for chunk in chunks)
+            if failures:
+                call.fail()
+        query_cache.invalidate()
+        return failures
+
+    def delete_document(self, doc_id):
+        with backend_call("search", "delete") as call:
+            result = self._delete_document(doc_id)
+            if not result[0]:
+                call.fail()
+        query_cache.invalidate()
+        return result
+
+    def delete_document_by_filepath(self, container, filepath):
+        """Delete every chunk of a file"""
+        with backend_call("search", "delete") as call:
+            result = self._delete_document_by_filepath(container, filepath)
+            if not result[0]:
+                call.fail()
+        query_cache.invalidate()
+        return result
+
+    def delete_documents_by_filepaths(self, container, filepaths):
+        """Delete every chunk of many files; returns {filepath: error} for failures"""
+        with backend_call("search", "delete") as call:
+            failures = self._delete_documents_by_filepaths(container, filepaths)
+            if failures:
+                call.fail()
+        query_cache.invalidate()
+        return failures
+
+    def _search_chunks(self, query, top, filters, skip):
+        """Ranked chunk hits: file fields plus page, score and highlights"""
+        raise NotImplementedError
+
+    def _get_document_chunks(self, container, filepath):
+        """A file's chunks (dicts with page and content) in ordinal order"""
+        raise NotImplementedError
+
+    def _replace_chunks(self, files):
+        """Replace all chunks of each file in {(container, filepath): chunks}; returns failures"""
+        raise NotImplementedError
+
+    def _delete_document(self, doc_id):
+        raise NotImplementedError
+
+    def _delete_document_by_filepath(self, container, filepath):
+        raise NotImplementedError
+
+    def _delete_documents_by_filepaths(self, container, filepaths):
+        raise NotImplementedError
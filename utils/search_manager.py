@@ -1,4 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import ResourceNotFoundError
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
@@ -9,39 +11,128 @@ from azure.search.documents.indexes.models import (
     SearchFieldDataType
 )
 from config import Config
-import uuid
+from utils.http_pool import make_transport
+from utils.search_backend import HIGHLIGHT_END, HIGHLIGHT_START, SearchBackend, mark_snippet
+import os
+import threading
 
-class SearchManager:
-    def __init__(self):
+_search_manager = None
+_search_manager_pid = None
+_search_manager_lock = threading.Lock()
+
+
+def get_search_manager():
+    """Process-wide search backend selected by Config.SEARCH_BACKEND
+
+    Created on first use and again after a fork.
+    """
+    global _search_manager, _search_manager_pid
+    with _search_manager_lock:
+        if _search_manager is None or _search_manager_pid != os.getpid():
+            if Config.SEARCH_BACKEND == "local":
+                from utils.local_search import LocalSearchManager
+                _search_manager = LocalSearchManager(Config.LOCAL_SEARCH_DB_PATH)
+            else:
+                _search_manager = SearchManager(ensure_index=not SearchManager._index_checked)
+            _search_manager_pid = os.getpid()
+        return _search_manager
+
+
+def _odata_string(value):
+    escaped = str(value).replace("'", "''")
+    return f"'{escaped}'"
+
+
+def build_odata_filter(filters):
+    """Turn {'owner': 'alice', ...} into an OData filter expression"""
+    if not filters:
+        return None
+    clauses = []
+    for field, value in filters.items():
+        clauses.append(f"{field} eq {_odata_string(value)}")
+    return " and ".join(clauses)
+
+
+def build_files_filter(container, filepaths):
+    """OData filter matching every chunk of the given files in one container"""
+    files = " or ".join(f"filepath eq {_odata_string(filepath)}" for filepath in filepaths)
+    return f"container eq {_odata_string(container)} and ({files})"
+
+
+class SearchManager(SearchBackend):
+    """Search backend on Azure AI Search"""
+
+    # Set once the index is known to exist, so it is checked once per deployment start
+    _index_checked = False
+
+    # Files per chunk lookup; keeps the OData filter well under the service's limits
+    FILES_PER_LOOKUP = 50
+
+    # Files whose chunk counts are read at once
+    LOOKUP_WORKERS = 8
+
+    def __init__(self, ensure_index=True, index_name=None):
         self.endpoint = Config.AZURE_SEARCH_ENDPOINT
         self.key = Config.AZURE_SEARCH_API_KEY
-        self.index_name = Config.AZURE_SEARCH_INDEX_NAME
+        # AZURE_SEARCH_INDEX_NAME may also be an alias (see reindex.py)
+        self.index_name = index_name or Config.AZURE_SEARCH_INDEX_NAME
         
         self.credential = AzureKeyCredential(self.key)
         self.index_client = SearchIndexClient(
             endpoint=self.endpoint,
-            credential=self.credential
+            credential=self.credential,
+            transport=make_transport()
         )
         
         # Create index if it doesn't exist
-        self._create_index_if_not_exists()
+        if ensure_index:
+            self._create_index_if_not_exists()
+            if index_name is None:
+                SearchManager._index_checked = True
         
         # Initialize search client
         self.search_client = SearchClient(
             endpoint=self.endpoint,
             index_name=self.index_name,
-            credential=self.credential
+            credential=self.credential,
+            transport=make_transport()
         )
     
+    @staticmethod
+    def _chunk_fields():
+        # Added with chunked indexing; older indexes get them on the next check
+        return [
+            SimpleField(name="page", type=SearchFieldDataType.Int32, filterable=True),
+            SimpleField(name="chunk", type=SearchFieldDataType.Int32, sortable=True),
+            # Set on a file's first chunk only: how many chunks the file has
+            SimpleField(name="chunks", type=SearchFieldDataType.Int32),
+        ]
+
     def _create_index_if_not_exists(self):
-        """Create the search index if it doesn't exist"""
+        """Create the search index if it doesn't exist
+
+        index_name may be an alias (see reindex.py); then the index it points
+        at is checked instead, and nothing is created under the alias name.
+        """
+        index_name = self.index_name
         try:
             # Check if index exists
-            self.index_client.get_index(self.index_name)
-            print(f"Index '{self.index_name}' already exists")
-        except Exception:
+            index = self.index_client.get_index(index_name)
+            print(f"Index '{index_name}' already exists")
+        except ResourceNotFoundError:
+            index = None
+        if index is None:
+            try:
+                targets = self.index_client.get_alias(index_name).indexes
+            except ResourceNotFoundError:
+                targets = []
+            if targets:
+                index_name = targets[0]
+                index = self.index_client.get_index(index_name)
+                print(f"Alias '{self.index_name}' points at index '{index_name}'")
+        if index is None:
             # Index doesn't exist, create it
-            print(f"Creating index '{self.index_name}'...")
+            print(f"Creating index '{index_name}'...")
             
             fields = [
                 SimpleField(name="id", type=SearchFieldDataType.String, key=True),
@@ -51,69 +142,166 @@ class SearchManager:
                 SimpleField(name="folder", type=SearchFieldDataType.String, filterable=True),
                 SimpleField(name="container", type=SearchFieldDataType.String, filterable=True),
                 SimpleField(name="filepath", type=SearchFieldDataType.String, filterable=True),  # ADDED filterable=True
-            ]
+            ] + self._chunk_fields()
             
-            index = SearchIndex(name=self.index_name, fields=fields)
+            index = SearchIndex(name=index_name, fields=fields)
             self.index_client.create_index(index)
-            print(f"Index '{self.index_name}' created successfully")
-    
-    def index_document(self, filename, content, owner, folder, container, filepath):
-        """Index a single document"""
-        try:
-            doc_id = str(uuid.uuid4())
-            
-            document = {
-                "id": doc_id,
-                "filename": filename,
-                "content": content,
-                "owner": owner,
-                "folder": folder,
-                "container": container,
-                "filepath": filepath
-            }
-            
-            result = self.search_client.upload_documents(documents=[document])
-            return True, f"Document indexed with ID: {doc_id}"
-        except Exception as e:
-            return False, f"Error indexing document: {str(e)}"
+            print(f"Index '{index_name}' created successfully")
+            return
+
+        existing = {field.name for field in index.fields}
+        missing = [field for field in self._chunk_fields() if field.name not in existing]
+        if missing:
+            index.fields.extend(missing)
+            self.index_client.create_or_update_index(index)
+            print(f"Added {', '.join(field.name for field in missing)} to index '{index_name}'")
     
-    def search_documents(self, query, top=10):
-        """Search for documents with highlighted snippets"""
+    def _chunk_count(self, container, filepath):
+        """Number of chunks a file has in the index (0 if none), or None if its first chunk doesn't say"""
         try:
+            first = self.search_client.get_document(
+                key=f"{self.document_key(container, filepath)}-0", selected_fields=["chunks"]
+            )
+        except ResourceNotFoundError:
+            return 0
+        return first.get("chunks")
+
+    def _indexed_chunk_ids(self, container, filepaths):
+        """Return {chunk id: filepath} for every indexed chunk of the given files
+
+        Chunk ids are "<key>-<ordinal>", so a file's ids follow from the count
+        stored on its first chunk: one key lookup per file instead of a
+        filtered search. Files indexed before the count was stored are
+        looked up by search.
+        """
+        filepaths = list(filepaths)
+        if len(filepaths) == 1:
+            counts = [self._chunk_count(container, filepaths[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.LOOKUP_WORKERS, len(filepaths))) as executor:
+                counts = list(executor.map(lambda filepath: self._chunk_count(container, filepath), filepaths))
+
+        ids = {}
+        unknown = []
+        for filepath, count in zip(filepaths, counts):
+            if count is None:
+                unknown.append(filepath)
+                continue
+            key = self.document_key(container, filepath)
+            ids.update((f"{key}-{ordinal}", filepath) for ordinal in range(count))
+        if unknown:
+            ids.update(self._chunk_ids(container, unknown))
+        return ids
+
+    def _chunk_ids(self, container, filepaths):
+        """Return {chunk id: filepath} for every indexed chunk of the given files, by search"""
+        filepaths = list(filepaths)
+        ids = {}
+        for i in range(0, len(filepaths), self.FILES_PER_LOOKUP):
             results = self.search_client.search(
-                search_text=query,
-                top=top,
-                include_total_count=True,
-                highlight_fields="content-3",  # Get 3 highlights from content field
-                highlight_pre_tag="<mark>",
-                highlight_post_tag="</mark>"
+                search_text="*",
+                filter=build_files_filter(container, filepaths[i:i + self.FILES_PER_LOOKUP]),
+                select=["id", "filepath"]
             )
-            
-            documents = []
             for result in results:
-                doc = {
-                    'filename': result['filename'],
-                    'owner': result['owner'],
-                    'folder': result['folder'],
-                    'container': result['container'],
-                    'filepath': result['filepath'],
-                    'score': result['@search.score']
-                }
-                
-                # Add highlights if available
-                if '@search.highlights' in result and 'content' in result['@search.highlights']:
-                    doc['highlights'] = result['@search.highlights']['content']
-                else:
-                    doc['highlights'] = []
-                
-                documents.append(doc)
-            
-            return documents
+                ids[result["id"]] = result["filepath"]
+        return ids
+
+    def _get_document_chunks(self, container, filepath):
+        results = self.search_client.search(
+            search_text="*",
+            filter=build_files_filter(container, [filepath]),
+            select=["page", "content"],
+            order_by=["chunk asc"]
+        )
+        return [{'page': result.get("page"), 'content': result.get("content") or ""} for result in results]
+    
+    def _replace_chunks(self, files):
+        """Upload the new chunks, then delete chunks the files no longer have
+
+        Uploading first means a re-indexed file never disappears from search.
+        """
+        failures = {}
+        by_container = {}
+        for container, filepath in files:
+            by_container.setdefault(container, []).append(filepath)
+        try:
+            stale = {}
+            for container, filepaths in by_container.items():
+                for chunk_id, filepath in self._indexed_chunk_ids(container, filepaths).items():
+                    stale[chunk_id] = (container, filepath)
         except Exception as e:
-            print(f"Search error: {str(e)}")
-            return []
+            print(f"Error indexing documents: {str(e)}")
+            return {location: str(e) for location in files}
+
+        locations = {}
+        chunks = []
+        for location, file_chunks in files.items():
+            if file_chunks:
+                # Lets the next replace or delete find every chunk without a search
+                file_chunks[0]['chunks'] = len(file_chunks)
+            for chunk in file_chunks:
+                locations[chunk['id']] = location
+                stale.pop(chunk['id'], None)
+                chunks.append(chunk)
+
+        for i in range(0, len(chunks), Config.INDEX_BATCH_SIZE):
+            batch = chunks[i:i + Config.INDEX_BATCH_SIZE]
+            try:
+                for result in self.search_client.merge_or_upload_documents(documents=batch):
+                    if not result.succeeded:
+                        failures[locations[result.key]] = result.error_message or f"status {result.status_code}"
+            except Exception as e:
+                print(f"Error indexing documents: {str(e)}")
+                for chunk in batch:
+                    failures[locations[chunk['id']]] = str(e)
+
+        # Leftovers from a longer earlier version (or an unchunked document);
+        # files whose upload failed keep their old chunks
+        stale_ids = [chunk_id for chunk_id, location in stale.items() if location not in failures]
+        for i in range(0, len(stale_ids), Config.INDEX_BATCH_SIZE):
+            batch = stale_ids[i:i + Config.INDEX_BATCH_SIZE]
+            try:
+                self.search_client.delete_documents(documents=[{"id": chunk_id} for chunk_id in batch])
+            except Exception as e:
+                print(f"Error deleting stale chunks: {str(e)}")
+        return failures
+    
+    def _search_chunks(self, query, top, filters, skip):
+        """Search for chunks with highlighted snippets"""
+        results = self.search_client.search(
+            search_text=query,
+            filter=build_odata_filter(filters),
+            top=top,
+            skip=skip or None,
+            highlight_fields="content-3",  # Get 3 highlights from content field
+            highlight_pre_tag=HIGHLIGHT_START,
+            highlight_post_tag=HIGHLIGHT_END
+        )
+        
+        documents = []
+        for result in results:
+            doc = {
+                'filename': result['filename'],
+                'owner': result['owner'],
+                'folder': result['folder'],
+                'container': result['container'],
+                'filepath': result['filepath'],
+                'page': result.get('page'),
+                'score': result['@search.score']
+            }
+            
+            # Add highlights if available
+            if '@search.highlights' in result and 'content' in result['@search.highlights']:
+                doc['highlights'] = [mark_snippet(snippet) for snippet in result['@search.highlights']['content']]
+            else:
+                doc['highlights'] = []
+            
+            documents.append(doc)
+        
+        return documents
     
-    def delete_document(self, doc_id):
+    def _delete_document(self, doc_id):
         """Delete a document from the index"""
         try:
             self.search_client.delete_documents(documents=[{"id": doc_id}])
@@ -121,24 +309,34 @@ class SearchManager:
         except Exception as e:
             return False, f"Error deleting document: {str(e)}"
     
-    def delete_document_by_filepath(self, container, filepath):
-        """Delete a document from the index by container and filepath"""
+    def _delete_document_by_filepath(self, container, filepath):
+        """Delete every chunk of a file from the index"""
+        failures = self._delete_documents_by_filepaths(container, [filepath])
+        if failures:
+            return False, f"Error deleting document: {failures[filepath]}"
+        return True, "Document deleted from index"
+
+    def _delete_documents_by_filepaths(self, container, filepaths):
+        """Delete the chunks of many files with batched delete actions
+
+        Returns a dict of filepath -> error for documents that failed.
+        """
+        failures = {}
         try:
-            # Search for the document first to get its ID
-            results = self.search_client.search(
-                search_text="*",
-                filter=f"container eq '{container}' and filepath eq '{filepath}'",
-                top=1
-            )
-            
-            for result in results:
-                doc_id = result['id']
-                self.search_client.delete_documents(documents=[{"id": doc_id}])
-                print(f"Deleted document {doc_id} from search index")
-                return True, "Document deleted from index"
-            
-            # Document not found in index (might not have been indexed)
-            return True, "Document not in index (no action needed)"
+            ids = self._indexed_chunk_ids(container, filepaths)
         except Exception as e:
             print(f"Error deleting from search index: {str(e)}")
-            return False, f"Error deleting document: {str(e)}"
+            return {filepath: str(e) for filepath in filepaths}
+        id_list = list(ids)
+        for i in range(0, len(id_list), Config.INDEX_BATCH_SIZE):
+            batch = id_list[i:i + Config.INDEX_BATCH_SIZE]
+            try:
+                results = self.search_client.delete_documents(documents=[{"id": chunk_id} for chunk_id in batch])
+                for result in results:
+                    if not result.succeeded and result.status_code != 404:
+                        failures[ids[result.key]] = result.error_message or f"status {result.status_code}"
+            except Exception as e:
+                print(f"Error deleting from search index: {str(e)}")
+                for chunk_id in batch:
+                    failures[ids[chunk_id]] = str(e)
+        return failures
@@ -0,0 +1,163 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class SessionStore:
+    """Server-side sessions in SQLite, keyed by a random session id
+
+    Rows carry their expiry time; an index on it keeps the sweeper's
+    delete of expired sessions cheap however many sessions there are.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._sweeper = None
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at);
+        """)
+
+    def _conn(self):
+        """One connection per thread; SQLite handles locking between processes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid):
+        """Return (data, expires_at) for a live session, or None"""
+        return self._conn().execute(
+            "SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+
+    def save(self, sid, data, expires_at):
+        self._conn().execute(
+            "INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+            (sid, data, expires_at)
+        )
+
+    def touch(self, sid, expires_at):
+        self._conn().execute("UPDATE sessions SET expires_at = ? WHERE id = ?", (expires_at, sid))
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def sweep(self):
+        """Delete expired sessions; returns how many were removed"""
+        return self._conn().execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def start_sweeper(self, interval):
+        """Sweep every `interval` seconds on a daemon thread (once per process)"""
+        if not interval:
+            return
+        with self._sweeper_lock:
+            if self._sweeper is not None and self._sweeper_pid == os.getpid():
+                return
+
+            def run():
+                while not self._stop_event.wait(interval):
+                    try:
+                        self.sweep()
+                    except Exception as e:
+                        print(f"Error sweeping sessions: {str(e)}")
+
+            self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+            self._sweeper.start()
+            self._sweeper_pid = os.getpid()
+
+    def stop_sweeper(self):
+        self._stop_event.set()
+
+
+class StoredSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it was changed"""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=0.0):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+
+
+class SqliteSessionInterface(SessionInterface):
+    """Flask session interface backed by SessionStore
+
+    Reading a session is one primary-key lookup. Requests only write when
+    the session changed, or to extend its expiry once half of the lifetime
+    has passed, so most requests don't write at all.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, db_path, sweep_interval=0):
+        self.store = SessionStore(db_path)
+        self.sweep_interval = sweep_interval
+
+    def open_session(self, app, request):
+        self.store.start_sweeper(self.sweep_interval)
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            row = self.store.load(sid)
+            if row is not None:
+                try:
+                    return StoredSession(self.serializer.loads(row[0]), sid=sid, expires_at=row[1])
+                except ValueError:
+                    pass  # unreadable row; start over
+        return StoredSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        if session.modified or session.new:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), now + lifetime)
+        elif session.expires_at - now < lifetime / 2:
+            # Sliding expiry, written at most once per half lifetime
+            self.store.touch(session.sid, now + lifetime)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
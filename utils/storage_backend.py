@@ -0,0 +1,179 @@
+import time
+from config import Config
+from utils.metrics import backend_call, record_call
+
+
+def make_storage_backend():
+    """Storage backend selected by Config.STORAGE_BACKEND, with every call timed"""
+    if Config.STORAGE_BACKEND == "local":
+        from utils.local_storage import LocalDiskStorage
+        return InstrumentedStorage(LocalDiskStorage(Config.LOCAL_STORAGE_ROOT))
+    from utils.azure_storage import AzureBlobStorage
+    return InstrumentedStorage(AzureBlobStorage(Config.AZURE_STORAGE_CONNECTION_STRING))
+
+
+class StorageBackend:
+    """Interface shared by the Azure Blob Storage and local disk backends
+
+    Blobs are addressed by (container, name) where name may contain "/".
+    Listings return dicts with name, size and created; get_properties adds
+    etag, last_modified and content (see put_reference). Missing blobs and containers raise
+    azure.core.exceptions.ResourceNotFoundError, existing containers
+    ResourceExistsError, so BlobManager handles both backends the same way.
+    """
+
+    def list_containers(self):
+        """Return every container name"""
+        raise NotImplementedError
+
+    def create_container(self, container):
+        raise NotImplementedError
+
+    def list_blobs(self, container, prefix=None):
+        """Yield every blob under prefix (recursively)"""
+        raise NotImplementedError
+
+    def list_all(self):
+        """Return {container: [blobs]} for every container"""
+        return {container: list(self.list_blobs(container)) for container in self.list_containers()}
+
+    def walk(self, container, prefix=None):
+        """List one level under prefix; returns (folder_paths, blobs)"""
+        raise NotImplementedError
+
+    def list_page(self, container, prefix, page_size, token=None, delimiter=False):
+        """Return (blobs, next_token) for one page of a listing
+
+        With delimiter=True only the blobs directly under prefix are listed.
+        """
+        raise NotImplementedError
+
+    def get_properties(self, container, name):
+        raise NotImplementedError
+
+    def put_blob(self, container, name, data):
+        """Write a small blob in one call (bytes or a readable file), replacing any existing one"""
+        raise NotImplementedError
+
+    def put_reference(self, container, name, content_container, content_name, size, sha256):
+        """Make name an entry for content stored once elsewhere (deduplicated uploads)
+
+        Listings report the referenced content's size. If reading name does
+        not return the content by itself, get_properties reports
+        content=(content_container, content_name) so callers can read that.
+        """
+        raise NotImplementedError
+
+    def open_writer(self, container, name, max_size=None, spool=None):
+        """Return a writer with write(chunk), commit() and abort() for streamed uploads"""
+        raise NotImplementedError
+
+    def download(self, container, name):
+        """Return the whole blob as bytes"""
+        raise NotImplementedError
+
+    def stream(self, container, name, offset=None, length=None, etag=None):
+        """Return an iterator over the blob's bytes (or a byte range of it)
+
+        If etag is given and the blob has changed since, raises
+        azure.core.exceptions.ResourceModifiedError.
+        """
+        raise NotImplementedError
+
+    def local_path(self, container, name):
+        """Path of the blob on local disk if it can be served directly, else None"""
+        return None
+
+    def url(self, container, name):
+        """Public URL of the blob, or None if the backend has none"""
+        return None
+
+    def delete_blob(self, container, name):
+        raise NotImplementedError
+
+    def delete_blobs(self, container, names):
+        """Delete a batch of blobs; returns {name: reason} for the ones that failed
+
+        Blobs that are already gone count as deleted.
+        """
+        raise NotImplementedError
+
+
+class InstrumentedWriter:
+    """Upload writer that times commits; everything else goes to the wrapped writer"""
+
+    def __init__(self, writer):
+        self._writer = writer
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+    def commit(self, *args, **kwargs):
+        with backend_call("storage", "upload") as call:
+            size = self._writer.commit(*args, **kwargs)
+            call.bytes = size
+        return size
+
+
+class InstrumentedStorage:
+    """Wraps a StorageBackend so every call is recorded in utils.metrics
+
+    Calls that return iterators (list_blobs, stream) are timed until the
+    iterator is exhausted, and streams count the bytes they yield.
+    """
+
+    ITERATOR_METHODS = ('list_blobs', 'stream')
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if name in self.ITERATOR_METHODS:
+                return self._timed_iter(name, attr, args, kwargs)
+            with backend_call("storage", name) as tracked:
+                result = attr(*args, **kwargs)
+                if name == 'download':
+                    tracked.bytes = len(result)
+                elif name == 'put_blob':
+                    data = args[2] if len(args) > 2 else kwargs['data']
+                    # File-like data is read by the backend; its size isn't known here
+                    if isinstance(data, (bytes, bytearray, memoryview)):
+                        tracked.bytes = memoryview(data).nbytes
+            if name == 'open_writer':
+                return InstrumentedWriter(result)
+            return result
+        return call
+
+    @staticmethod
+    def _timed_iter(name, method, args, kwargs):
+        # Backends that check arguments up front raise here; generator backends
+        # (local list_blobs) raise on the first next() instead, counted by _drain
+        started = time.perf_counter()
+        try:
+            iterator = method(*args, **kwargs)
+        except Exception:
+            record_call("storage", name, time.perf_counter() - started, failed=True)
+            raise
+        return InstrumentedStorage._drain(name, iterator, started)
+
+    @staticmethod
+    def _drain(name, iterator, started):
+        failed = False
+        nbytes = 0
+        try:
+            for item in iterator:
+                if name == 'stream':
+                    nbytes += len(item)
+                yield item
+        except GeneratorExit:
+            raise  # the caller stopped early; not a failure
+        except Exception:
+            failed = True
+            raise
+        finally:
+            record_call("storage", name, time.perf_counter() - started, failed, nbytes)
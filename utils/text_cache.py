@@ -0,0 +1,133 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import zlib
+from config import Config
+
+
+def hash_source(source):
+    """sha256 hex digest of PDF bytes, a seekable file object or a file path"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+        return digest.hexdigest()
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    position = source.tell()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(1024 * 1024), b""):
+        digest.update(chunk)
+    source.seek(position, io.SEEK_SET)
+    return digest.hexdigest()
+
+
+class TextCache:
+    """Extracted PDF text on local disk, keyed by the sha256 of the PDF bytes
+
+    Each entry is the page list as zlib-compressed JSON. Reads bump the
+    file's mtime, and when the cache grows past max_bytes the least
+    recently used entries are removed until it is back under 90%.
+    """
+
+    SUFFIX = ".json.z"
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._bytes = sum(size for _, _, size in self._entries())
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, sha256):
+        # Two-character shards keep directories small
+        return os.path.join(self.cache_dir, sha256[:2], sha256 + self.SUFFIX)
+
+    def _entries(self):
+        """Yield (path, mtime, size) for every cached entry"""
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(self.SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_mtime, stat.st_size
+
+    def get(self, sha256):
+        """Return the cached page list, or None"""
+        path = self._path(sha256)
+        try:
+            with open(path, "rb") as f:
+                pages = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, zlib.error, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def put(self, sha256, pages):
+        path = self._path(sha256)
+        data = zlib.compress(json.dumps(pages).encode("utf-8"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers in other processes never see half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._bytes += len(data)
+            over = self._bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is under 90% of max_bytes"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            target = self.max_bytes * 0.9
+            for path, _, size in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+_text_cache = None
+_text_cache_lock = threading.Lock()
+
+
+def get_text_cache():
+    """Process-wide TextCache, or None when Config.TEXT_CACHE_ENABLED is off"""
+    global _text_cache
+    if not Config.TEXT_CACHE_ENABLED:
+        return None
+    with _text_cache_lock:
+        if _text_cache is None:
+            _text_cache = TextCache(Config.TEXT_CACHE_DIR, Config.TEXT_CACHE_MAX_BYTES)
+        return _text_cache
@@ -0,0 +1,164 @@
+import base64
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from azure.storage.blob import BlobBlock, ContentSettings
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload stream exceeds the configured size limit"""
+
+
+class BlockUploader:
+    """Stage fixed-size blocks of a blob concurrently while the data is still arriving"""
+
+    def __init__(self, blob_client, block_size, max_concurrency, max_size=None, spool=None):
+        self.blob_client = blob_client
+        self.block_size = block_size
+        self.max_size = max_size
+        self.spool = spool
+        self.size = 0
+        self._buffer = bytearray()
+        self._block_ids = []
+        self._futures = []
+        self._prefix = uuid.uuid4().hex[:16]
+        # At most max_concurrency blocks are held in memory while in flight
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def write(self, data):
+        """Add a chunk of the upload, staging full blocks as they fill up"""
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise UploadTooLargeError(f"File exceeds the {self.max_size // (1024 * 1024)} MB limit")
+
+        if self.spool is not None:
+            self.spool.write(data)
+
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._stage(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+
+    def _stage(self, block):
+        self._raise_failed()
+        block_id = base64.b64encode(f"{self._prefix}-{len(self._block_ids):08d}".encode()).decode()
+        self._block_ids.append(block_id)
+
+        self._slots.acquire()
+        future = self._executor.submit(self.blob_client.stage_block, block_id, block, length=len(block))
+        future.add_done_callback(lambda f: self._slots.release())
+        self._futures.append(future)
+
+    def _raise_failed(self):
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+    def commit(self, content_type="application/pdf"):
+        """Stage the remaining data and commit the block list; returns the blob size"""
+        try:
+            # An empty file commits an empty block list, which makes a zero-length blob
+            if self._buffer:
+                self._stage(bytes(self._buffer))
+                self._buffer.clear()
+            for future in self._futures:
+                future.result()
+            self.blob_client.commit_block_list(
+                [BlobBlock(block_id=block_id) for block_id in self._block_ids],
+                content_settings=ContentSettings(content_type=content_type)
+            )
+            if self.spool is not None:
+                self.spool.seek(0)
+            return self.size
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def abort(self):
+        """Stop staging; uncommitted blocks are discarded by the storage service"""
+        for future in self._futures:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+
+
+class MultipartPart:
+    """One part of a streamed multipart body"""
+
+    def __init__(self, stream, name, filename=None):
+        self._stream = stream
+        self.name = name
+        self.filename = filename
+        self.finished = False
+
+    def chunks(self):
+        """Yield the part's body as it is read from the request"""
+        return self._stream._part_data(self)
+
+    def read(self):
+        """Read a (small) form field completely"""
+        return b"".join(self.chunks()).decode("utf-8", "replace")
+
+    def drain(self):
+        for _ in self.chunks():
+            pass
+
+
+class MultipartStream:
+    """Incremental multipart/form-data parser over a request stream
+
+    Unlike request.files, nothing is buffered: each file part is exposed as
+    an iterator of chunks that must be consumed before the next part.
+    """
+
+    def __init__(self, stream, boundary, read_size=64 * 1024, max_form_memory_size=None):
+        self._input = stream
+        self._read_size = read_size
+        self._decoder = MultipartDecoder(boundary.encode(), max_form_memory_size)
+        self._pending = None
+        self._eof = False
+
+    def _next_event(self):
+        while True:
+            event = self._decoder.next_event()
+            if not isinstance(event, NeedData):
+                return event
+            if self._eof:
+                return Epilogue(data=b"")
+            chunk = self._input.read(self._read_size)
+            if not chunk:
+                self._eof = True
+                self._decoder.receive_data(None)
+            else:
+                self._decoder.receive_data(chunk)
+
+    def _part_data(self, part):
+        while not part.finished:
+            event = self._next_event()
+            if isinstance(event, Data):
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    part.finished = True
+            else:
+                # Truncated body: hand the event to parts() and stop
+                self._pending = event
+                part.finished = True
+
+    def parts(self):
+        """Yield MultipartPart objects in the order they appear in the body"""
+        current = None
+        while True:
+            if current is not None and not current.finished:
+                current.drain()
+
+            event = self._pending or self._next_event()
+            self._pending = None
+            if isinstance(event, Epilogue):
+                return
+            if isinstance(event, File):
+                current = MultipartPart(self, event.name, event.filename)
+                yield current
+            elif isinstance(event, Field):
+                current = MultipartPart(self, event.name)
+                yield current
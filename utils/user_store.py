@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+
+class UserStore:
+    """Users in an indexed SQLite table with an in-memory read cache
+
+    The cache is dropped whenever the database changes, including changes
+    made by other worker processes (detected through PRAGMA data_version).
+    """
+
+    MAX_CACHED = 10000
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._passwords = {}
+        self._count = None
+        self._generation = 0
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.data_version = None
+        return conn
+
+    def _invalidate(self):
+        with self._cache_lock:
+            self._generation += 1
+            self._passwords.clear()
+            self._count = None
+
+    def _check_version(self):
+        """Drop the cache if another connection committed since we last looked"""
+        conn = self._conn()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._local.data_version:
+            if self._local.data_version is not None:
+                self._invalidate()
+            self._local.data_version = version
+
+    def get_password(self, username):
+        """Return the stored password for username, or None"""
+        self._check_version()
+        with self._cache_lock:
+            if username in self._passwords:
+                return self._passwords[username]
+            generation = self._generation
+        row = self._conn().execute(
+            "SELECT password FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        password = row[0] if row else None
+        with self._cache_lock:
+            # Don't cache a value read before a concurrent invalidation
+            if generation == self._generation:
+                if len(self._passwords) >= self.MAX_CACHED:
+                    self._passwords.clear()
+                self._passwords[username] = password
+        return password
+
+    def exists(self, username):
+        return self.get_password(username) is not None
+
+    def add_user(self, username, password):
+        """Insert a user; returns False if the username is taken"""
+        try:
+            self._conn().execute(
+                "INSERT INTO users (username, password, created_at) VALUES (?, ?, ?)",
+                (username, password, time.time())
+            )
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            self._invalidate()
+        return True
+
+    def count(self):
+        self._check_version()
+        with self._cache_lock:
+            if self._count is not None:
+                return self._count
+            generation = self._generation
+        count = self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        with self._cache_lock:
+            if generation == self._generation:
+                self._count = count
+        return count
+
+    def all_users(self):
+        """Return {username: password} for every user"""
+        rows = self._conn().execute("SELECT username, password FROM users ORDER BY username").fetchall()
+        return dict(rows)
+
+    def migrate_from_json(self, json_path):
+        """Import users from the old users.json file once; returns how many were added"""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return 0
+        if not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, "r") as f:
+                content = f.read().strip()
+            users = json.loads(content) if content else {}
+        except json.JSONDecodeError:
+            users = {}
+
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO users (username, password, created_at) VALUES (?, ?, ?)",
+                [(username, password, now) for username, password in users.items()]
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (str(now),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._invalidate()
+        return cursor.rowcount
+
+
+_user_store = None
+_user_store_pid = None
+_user_store_lock = threading.Lock()
+
+
+def get_user_store():
+    """Process-wide UserStore; imports users.json the first time it is opened"""
+    global _user_store, _user_store_pid
+    with _user_store_lock:
+        if _user_store is None or _user_store_pid != os.getpid():
+            store = UserStore(Config.USERS_DB_PATH)
+            migrated = store.migrate_from_json(Config.USERS_FILE)
+            if migrated:
+                print(f"Imported {migrated} users from {Config.USERS_FILE}")
+            _user_store = store
+            _user_store_pid = os.getpid()
+        return _user_store